@@ -0,0 +1,446 @@
+"""
+Alert Dispatcher Module
+
+This module delivers security alerts (intruders, ARP spoofing, IP conflicts) to the
+outside world - webhooks, syslog, an SMTP relay - without slowing down the scan and
+without paging anybody 1,440 times a day about the same device.
+
+    emit/submit (any thread, never blocks)
+        -> dedupe: the same alert for the same MAC passes once per `dedupe_seconds`,
+           repeats are only counted and reported with the next one ("suppressed")
+        -> one bounded pending queue per sink, coalesced by (alert, MAC)
+        -> one worker thread per sink: collects for `window` seconds, sends one batch,
+           backs off exponentially while the sink fails (the batch is kept and retried)
+
+When a sink's queue is full, a new alert for an already pending (alert, MAC) only bumps
+its count; anything else pushes out the oldest pending alert of the lowest severity.
+A dead webhook therefore costs a bounded amount of memory and never blocks the others.
+
+Usage:
+    from alert_dispatcher import AlertDispatcher, WebhookSink, SyslogSink
+
+    dispatcher = AlertDispatcher([WebhookSink("http://127.0.0.1:8080/hook"), SyslogSink("/dev/log")])
+    dispatcher.start()
+    dispatcher.emit("intruder", ip="192.168.1.66", mac="aa:bb:cc:dd:ee:ff")
+    dispatcher.close()
+"""
+
+import collections
+import json
+import random
+import socket
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import cerberus_logger
+import cerberus_metrics as metrics
+
+logger = cerberus_logger.get_logger("cerberus.alert_dispatcher")
+
+ALERTS_SENT = metrics.counter("cerberus_alerts_sent_total", "Alerts delivered, per sink.")
+ALERTS_SUPPRESSED = metrics.counter("cerberus_alerts_suppressed_total", "Repeated alerts suppressed by dedupe.")
+ALERTS_COALESCED = metrics.counter("cerberus_alerts_coalesced_total", "Alerts merged into a pending one.")
+ALERTS_DROPPED = metrics.counter("cerberus_alerts_dropped_total", "Alerts dropped because a sink queue was full.")
+SINK_FAILURES = metrics.counter("cerberus_alert_sink_failures_total", "Failed alert batch deliveries.")
+
+# Event name -> default severity. Events which already carry a "severity" keep it.
+ALERT_EVENTS = {
+    "intruder": "high",
+    "gateway_impersonation": "critical",
+    "duplicate_ip": "high",
+    "rapid_rebind": "high",
+    "mac_flood": "high",
+    "mac_moved": "medium",
+}
+
+SEVERITY_RANK = {"low": 0, "medium": 1, "high": 2, "critical": 3}
+
+AlertKey = Tuple[str, str]
+
+
+def alert_key(alert: dict) -> AlertKey:
+    """Dedupe / coalesce key: the alert kind and the MAC (the IP if there is no MAC)."""
+    return alert["event"], alert.get("mac") or alert.get("ip") or ""
+
+
+def format_alert(alert: dict) -> str:
+    """One human readable line, for syslog and email."""
+    text = f"{alert['event'].upper()} [{alert.get('severity', 'high')}] {alert.get('ip') or '-'} {alert.get('mac') or '-'}"
+    if alert.get("vendor"):
+        text += f" ({alert['vendor']})"
+    if alert.get("old_mac"):
+        text += f" was {alert['old_mac']}"
+    if alert.get("segment"):
+        text += f" on {alert['segment']}"
+    repeats = alert.get("count", 1) - 1 + alert.get("suppressed", 0)
+    if repeats > 0:
+        text += f" (+{repeats} repeats)"
+    return text
+
+# ========================= Sinks =========================
+
+class AlertSink:
+    """Base class: send() delivers one batch or raises. It runs in the sink's own worker thread."""
+
+    name = "sink"
+
+    def send(self, alerts: List[dict]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class WebhookSink(AlertSink):
+    """POSTs every batch as JSON: {"source": "cerberus", "host": ..., "alerts": [...]}."""
+
+    name = "webhook"
+
+    def __init__(self, url: str, timeout: float = 5.0, headers: Optional[Dict[str, str]] = None):
+        self.url = url
+        self.timeout = timeout
+        self.headers = {"Content-Type": "application/json", "User-Agent": "cerberus"}
+        self.headers.update(headers or {})
+
+    def send(self, alerts: List[dict]) -> None:
+        # urllib sirf pehli delivery pe import hota hai, startup pe nahi.
+        import urllib.request
+
+        body = json.dumps({"source": "cerberus", "host": socket.gethostname(), "alerts": alerts},
+                          separators=(",", ":"), default=str).encode("utf-8")
+        request = urllib.request.Request(self.url, data=body, headers=self.headers, method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if not 200 <= response.status < 300:
+                raise OSError(f"webhook answered HTTP {response.status}")
+
+
+class SyslogSink(AlertSink):
+    """
+    RFC 3164 syslog datagrams, one per alert: "/dev/log" (local) or (host, port) (UDP).
+    Severity maps to crit / err / warning, facility defaults to authpriv (security).
+    """
+
+    name = "syslog"
+
+    FACILITY_AUTHPRIV = 10
+    LEVELS = {"critical": 2, "high": 3, "medium": 4, "low": 5}
+
+    def __init__(self, address: Union[str, Tuple[str, int]] = "/dev/log", facility: int = FACILITY_AUTHPRIV,
+                 tag: str = "cerberus"):
+        self.address = address
+        self.facility = facility
+        self.tag = tag
+        self._sock = None
+
+    def _socket(self):
+        if self._sock is None:
+            family = socket.AF_UNIX if isinstance(self.address, str) else socket.AF_INET
+            self._sock = socket.socket(family, socket.SOCK_DGRAM)
+        return self._sock
+
+    def send(self, alerts: List[dict]) -> None:
+        sock = self._socket()
+        stamp = time.strftime("%b %d %H:%M:%S")
+        host = socket.gethostname()
+        try:
+            for alert in alerts:
+                priority = self.facility * 8 + self.LEVELS.get(alert.get("severity"), 4)
+                message = f"<{priority}>{stamp} {host} {self.tag}: {format_alert(alert)}"
+                sock.sendto(message.encode("utf-8", "replace")[:2048], self.address)
+        except OSError:
+            # Socket reset karo, syslogd restart hua ho toh agli baar naya socket banega.
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+class SmtpSink(AlertSink):
+    """One email per batch through an SMTP relay (eg, the local MTA on localhost:25)."""
+
+    name = "smtp"
+
+    def __init__(self, recipients: Sequence[str], host: str = "localhost", port: int = 25,
+                 sender: Optional[str] = None, starttls: bool = False, username: Optional[str] = None,
+                 password: Optional[str] = None, timeout: float = 10.0):
+        self.recipients = list(recipients)
+        self.host = host
+        self.port = port
+        self.sender = sender or f"cerberus@{socket.gethostname()}"
+        self.starttls = starttls
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+
+    def build_message(self, alerts: List[dict]):
+        from email.message import EmailMessage
+
+        kinds = collections.Counter(alert["event"] for alert in alerts)
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = ", ".join(self.recipients)
+        message["Subject"] = f"[Cerberus] {len(alerts)} alert(s): " + ", ".join(
+            f"{count} {kind}" for kind, count in kinds.most_common())
+        body = "\n".join(format_alert(alert) for alert in alerts)
+        body += "\n\n" + json.dumps(alerts, indent=2, default=str)
+        message.set_content(body)
+        return message
+
+    def send(self, alerts: List[dict]) -> None:
+        import smtplib
+
+        message = self.build_message(alerts)
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password or "")
+            smtp.send_message(message, from_addr=self.sender, to_addrs=self.recipients)
+
+# ========================= Dispatcher =========================
+
+class _SinkWorker:
+    """Pending queue + worker thread of one sink."""
+
+    def __init__(self, dispatcher: "AlertDispatcher", sink: AlertSink):
+        self.dispatcher = dispatcher
+        self.sink = sink
+        self.name = getattr(sink, "name", type(sink).__name__)
+        self.pending: "collections.OrderedDict[AlertKey, dict]" = collections.OrderedDict()
+        self.cond = threading.Condition()
+        self.window_start = None
+        self.retry_at = 0.0
+        self.failures = 0
+        self.sent = 0
+        self.dropped = 0
+        self.closing = False
+        self.thread = threading.Thread(target=self._run, name=f"cerberus-alert-{self.name}", daemon=True)
+
+    # ------------------------- Queue -------------------------
+
+    def offer(self, alert: dict) -> None:
+        key = alert_key(alert)
+        with self.cond:
+            if self._merge(key, alert):
+                ALERTS_COALESCED.inc(sink=self.name)
+                return
+            if len(self.pending) >= self.dispatcher.queue_size:
+                self._drop_one()
+            if not self.pending:
+                self.window_start = self.dispatcher.clock()
+            self.pending[key] = alert
+            self.cond.notify()
+
+    def _merge(self, key: AlertKey, alert: dict) -> bool:
+        existing = self.pending.get(key)
+        if existing is None:
+            return False
+        merged = dict(alert)
+        merged["count"] = existing.get("count", 1) + alert.get("count", 1)
+        merged["suppressed"] = existing.get("suppressed", 0) + alert.get("suppressed", 0)
+        merged["first_ts"] = existing.get("first_ts", existing.get("ts"))
+        self.pending[key] = merged
+        return True
+
+    def _drop_one(self) -> None:
+        # Sabse kam severity wala sabse purana alert nikalo, critical wale bache rahe.
+        victim = min(self.pending, key=lambda k: SEVERITY_RANK.get(self.pending[k].get("severity"), 2))
+        del self.pending[victim]
+        self.dropped += 1
+        ALERTS_DROPPED.inc(sink=self.name)
+
+    def _take_batch(self) -> List[dict]:
+        batch = []
+        while self.pending and len(batch) < self.dispatcher.max_batch:
+            batch.append(self.pending.popitem(last=False)[1])
+        self.window_start = self.dispatcher.clock() if self.pending else None
+        return batch
+
+    def _requeue(self, batch: List[dict]) -> None:
+        """Puts a failed batch back in front, merging with whatever arrived meanwhile."""
+        newer = self.pending
+        self.pending = collections.OrderedDict()
+        for alert in batch + list(newer.values()):
+            key = alert_key(alert)
+            if not self._merge(key, alert):
+                self.pending[key] = alert
+        while len(self.pending) > self.dispatcher.queue_size:
+            self._drop_one()
+        if self.window_start is None:
+            self.window_start = self.dispatcher.clock()
+
+    # ------------------------- Worker -------------------------
+
+    def _run(self) -> None:
+        clock = self.dispatcher.clock
+        while True:
+            with self.cond:
+                while not self.pending and not self.closing:
+                    self.cond.wait()
+                if not self.pending:
+                    return
+                # Window bhar alerts jama karo (aur backoff chal raha ho toh uska wait bhi).
+                while not self.closing:
+                    due = max(self.window_start + self.dispatcher.window, self.retry_at)
+                    wait = due - clock()
+                    if wait <= 0:
+                        break
+                    self.cond.wait(wait)
+                batch = self._take_batch()
+                closing = self.closing
+
+            try:
+                self.sink.send(batch)
+            except Exception as e:
+                SINK_FAILURES.inc(sink=self.name)
+                with self.cond:
+                    self.failures += 1
+                    if closing:
+                        self.dropped += len(batch)
+                        ALERTS_DROPPED.inc(len(batch), sink=self.name)
+                        logger.error(f"Alert sink '{self.name}' failed during shutdown, "
+                                     f"{len(batch)} alerts lost: {e}.")
+                        continue
+                    delay = self.dispatcher.backoff_delay(self.failures)
+                    self.retry_at = clock() + delay
+                    self._requeue(batch)
+                logger.warning(f"Alert sink '{self.name}' failed ({e}), retrying {len(batch)} alerts "
+                               f"in {delay:.1f}s.")
+                continue
+
+            with self.cond:
+                if self.failures:
+                    logger.info(f"Alert sink '{self.name}' recovered after {self.failures} failures.")
+                self.failures = 0
+                self.retry_at = 0.0
+                self.sent += len(batch)
+            ALERTS_SENT.inc(len(batch), sink=self.name)
+
+    def close(self) -> None:
+        with self.cond:
+            self.closing = True
+            self.cond.notify()
+
+
+class AlertDispatcher:
+    """
+    Batched, deduplicated, rate-limited alert delivery to several sinks. emit() and
+    submit() are thread-safe and never block.
+    """
+
+    def __init__(self, sinks: Iterable[AlertSink], window: float = 5.0, dedupe_seconds: float = 900.0,
+                 queue_size: int = 256, max_batch: int = 100, backoff: float = 1.0, max_backoff: float = 300.0,
+                 alert_events: Optional[Dict[str, str]] = None, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            sinks: Where alerts go, each gets its own queue and worker thread
+            window: Seconds alerts are collected before one batch is sent
+            dedupe_seconds: The same (alert, MAC) is passed on at most once per this many seconds
+            queue_size: Max pending alerts per sink (coalesced / dropped beyond this)
+            max_batch: Max alerts per delivery
+            backoff: First retry delay after a failed delivery, doubled on every further failure
+            max_backoff: Upper bound of the retry delay
+            alert_events: {event name: default severity} of the events which are alerts
+        """
+        self.window = window
+        self.dedupe_seconds = dedupe_seconds
+        self.queue_size = max(1, queue_size)
+        self.max_batch = max(1, max_batch)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.alert_events = dict(ALERT_EVENTS if alert_events is None else alert_events)
+        self.clock = clock
+
+        self.workers = [_SinkWorker(self, sink) for sink in sinks]
+        self._last_passed: Dict[AlertKey, float] = {}
+        self._suppressed: Dict[AlertKey, int] = {}
+        self._lock = threading.Lock()
+        self._started = False
+
+    def backoff_delay(self, failures: int) -> float:
+        """Exponential back-off with +-10% jitter, so several Cerberus don't retry in lockstep."""
+        delay = min(self.max_backoff, self.backoff * (2 ** min(failures - 1, 32)))
+        return delay * random.uniform(0.9, 1.1)
+
+    # ------------------------- Intake -------------------------
+
+    def emit(self, event: str, **fields) -> bool:
+        """emit_event() style entry point. Non-alert events are ignored."""
+        if event not in self.alert_events:
+            return False
+        alert = {"ts": round(time.time(), 3), "event": event}
+        alert.update(fields)
+        return self.submit(alert)
+
+    def submit(self, alert: dict) -> bool:
+        """
+        Queues one alert dict ({"event", "mac", "ip", ...}) for every sink.
+
+        Returns:
+            bool: False if it was suppressed as a repeat
+        """
+        alert.setdefault("severity", self.alert_events.get(alert["event"], "high"))
+        key = alert_key(alert)
+        now = self.clock()
+
+        with self._lock:
+            last = self._last_passed.get(key)
+            if last is not None and now - last < self.dedupe_seconds:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                ALERTS_SUPPRESSED.inc(alert=alert["event"])
+                return False
+            self._last_passed[key] = now
+            suppressed = self._suppressed.pop(key, 0)
+            if len(self._last_passed) > 65536:
+                self._prune(now)
+
+        alert = dict(alert, count=1)
+        if suppressed:
+            alert["suppressed"] = suppressed
+        for worker in self.workers:
+            worker.offer(alert)
+        return True
+
+    def submit_events(self, events: Iterable[dict]) -> int:
+        """Batch intake of event dicts (eg, a daemon sink batch), non-alert events are skipped."""
+        return sum(1 for event in events if event.get("event") in self.alert_events and self.submit(dict(event)))
+
+    def _prune(self, now: float) -> None:
+        expired = [key for key, last in self._last_passed.items() if now - last >= self.dedupe_seconds]
+        for key in expired:
+            del self._last_passed[key]
+            self._suppressed.pop(key, None)
+
+    # ------------------------- Lifecycle -------------------------
+
+    def start(self) -> "AlertDispatcher":
+        if not self._started:
+            self._started = True
+            for worker in self.workers:
+                worker.thread.start()
+        return self
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Sends what is pending (one attempt per sink, no window / back-off) and stops the workers."""
+        for worker in self.workers:
+            worker.close()
+        deadline = time.monotonic() + timeout
+        for worker in self.workers:
+            if self._started:
+                worker.thread.join(max(deadline - time.monotonic(), 0.0))
+                if worker.thread.is_alive():
+                    logger.warning(f"Alert sink '{worker.name}' did not finish within {timeout}s.")
+            worker.sink.close()
+
+    def stats(self) -> Dict[str, dict]:
+        """Per sink: sent, pending, dropped, consecutive failures."""
+        result = {}
+        for worker in self.workers:
+            with worker.cond:
+                result[worker.name] = {"sent": worker.sent, "pending": len(worker.pending),
+                                       "dropped": worker.dropped, "failures": worker.failures}
+        return result
@@ -0,0 +1,530 @@
+"""
+ARP Sweeper Module
+
+This module is the raw-socket ARP sweep engine of Cerberus. It replaces the scapy
+`srp` call in the scanner: one AF_PACKET socket, ARP requests written from a
+precomputed byte template where only the target IP is patched, and a receive loop
+running concurrently with the transmit which streams (ip, mac) replies as they arrive.
+
+Requests are paced by a token bucket (a burst goes out at once, longer sweeps at the
+configured rate) so cheap switches and Wi-Fi APs don't drop replies. The receive
+window is not a fixed timeout: every reply gives an RTT sample, a running SRTT/RTTVAR
+estimate (like TCP, RFC 6298) is kept per interface, and the sweep ends once no reply
+came for SRTT + 4 * RTTVAR after the last request - on a quiet LAN that is a few tens
+of milliseconds. The floor of that window is configurable (min_quiet) for segments
+whose power-saving clients answer late; `timeout` stays the upper bound.
+
+Known hosts which missed a sweep get a second chance (retry): unicast requests straight
+to their last MAC, a couple of rounds with exponential back-off.
+
+The socket is hidden behind a small transport object (send / recv / close), so the
+sweeper can be driven by a simulated LAN for testing and benchmarking.
+
+Usage:
+    from arp_sweeper import ArpSweeper
+
+    sweeper = ArpSweeper.for_interface("eth0", "192.168.1.0/24")
+    for ip, mac in sweeper.sweep():
+        print(ip, mac)
+"""
+
+import ipaddress
+import queue
+import select
+import socket
+import struct
+import threading
+import time
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+import cerberus_logger
+
+logger = cerberus_logger.get_logger("cerberus.arp_sweeper")
+
+# ========================= Frame Layout =========================
+
+ETH_P_ALL = 0x0003
+ETH_P_ARP = 0x0806
+ETH_P_IP = 0x0800
+
+ARP_REQUEST = 1
+ARP_REPLY = 2
+
+BROADCAST_MAC = b"\xff" * 6
+ZERO_MAC = b"\x00" * 6
+
+# Ethernet header (14) + ARP payload (28) = 42 bytes, padded to the 60 byte minimum.
+ARP_FRAME_LEN = 42
+MIN_FRAME_LEN = 60
+
+# Offset of the target protocol address inside the frame - sirf yahi patch hota hai.
+TARGET_IP_OFFSET = 38
+
+PACKET_OUTGOING = 4
+
+SO_ATTACH_FILTER = 26
+
+_ARP_FRAME = struct.Struct("!6s6sHHHBBH6s4s6s4s")
+
+
+def mac_to_bytes(mac: str) -> bytes:
+    """Converts 'aa:bb:cc:dd:ee:ff' (or '-' separated) into 6 raw bytes."""
+    return bytes.fromhex(mac.replace(":", "").replace("-", ""))
+
+
+def bytes_to_mac(raw: bytes) -> str:
+    """Converts 6 raw bytes into the 'aa:bb:cc:dd:ee:ff' form used everywhere else."""
+    return raw.hex(":")
+
+
+def parse_arp(frame: bytes) -> Optional[Tuple[int, bytes, bytes, bytes, bytes]]:
+    """
+    Parses an Ethernet/ARP frame.
+
+    Returns:
+        Tuple: (opcode, sender_mac, sender_ip, target_mac, target_ip) as raw bytes,
+               or None if the frame is not an IPv4-over-Ethernet ARP packet.
+    """
+    if len(frame) < ARP_FRAME_LEN:
+        return None
+
+    (_dst, _src, ethertype, htype, ptype, hlen, plen, op,
+     sha, spa, tha, tpa) = _ARP_FRAME.unpack_from(frame)
+
+    if ethertype != ETH_P_ARP or htype != 1 or ptype != ETH_P_IP or hlen != 6 or plen != 4:
+        return None
+
+    return op, sha, spa, tha, tpa
+
+
+def build_arp_frame(src_mac: bytes, src_ip: bytes, dst_mac: bytes = BROADCAST_MAC,
+                    target_ip: bytes = b"\x00" * 4, op: int = ARP_REQUEST) -> bytearray:
+    """Builds one padded Ethernet/ARP frame. Used once per sweep to make the template."""
+    frame = bytearray(MIN_FRAME_LEN)
+    _ARP_FRAME.pack_into(
+        frame, 0,
+        dst_mac, src_mac, ETH_P_ARP,
+        1, ETH_P_IP, 6, 4, op,
+        src_mac, src_ip,
+        ZERO_MAC if op == ARP_REQUEST else dst_mac, target_ip
+    )
+    return frame
+
+def network_host_range(network) -> Tuple[int, int]:
+    """(first, last) host address of a network as integers, like hosts() (/31 and /32 included)."""
+    network = ipaddress.ip_network(network, strict=False)
+    first = int(network.network_address)
+    last = int(network.broadcast_address)
+    if network.prefixlen < 31:
+        first, last = first + 1, last - 1
+    return first, last
+
+
+def interface_addresses(interface: str) -> Tuple[str, str]:
+    """(MAC, IPv4 address) of an interface."""
+    import netifaces
+
+    addrs = netifaces.ifaddresses(interface)
+    return addrs[netifaces.AF_LINK][0]["addr"], addrs[netifaces.AF_INET][0]["addr"]
+
+# ========================= Pacing =========================
+
+class TokenBucket:
+    """
+    Token bucket rate limiter: `burst` requests may go out back to back, after that
+    `rate` per second. take() sleeps when the bucket is empty - at least `min_sleep`,
+    so at high rates we sleep once per batch, not once per frame.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None, min_sleep: float = 0.001,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(burst) if burst else max(1.0, self.rate / 50)
+        self.min_sleep = min_sleep
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = self.capacity
+        self.updated = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, amount: float = 1.0) -> float:
+        """Takes `amount` tokens, sleeping until they are there. Returns the seconds slept."""
+        self._refill()
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return 0.0
+
+        wait = max((amount - self.tokens) / self.rate, self.min_sleep)
+        self.sleep(wait)
+        self._refill()
+        # Thoda negative ho sakta hai (debt), agla take utna der se milega.
+        self.tokens -= amount
+        return wait
+
+
+# Default floor of the quiet window, sirf scheduler jitter ke liye. Dozing Wi-Fi clients
+# which answer later are caught by the unicast retry (or raise the floor per deployment).
+MIN_QUIET = 0.02
+
+
+class RttEstimator:
+    """
+    Smoothed round trip time of ARP replies (RFC 6298 SRTT / RTTVAR). Thread-safe,
+    shared by every sweep on one interface so later sweeps start with a good estimate.
+    """
+
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+    K = 4
+
+    def __init__(self, min_quiet: float = MIN_QUIET):
+        """
+        Args:
+            min_quiet: Floor of the quiet interval (seconds), see MIN_QUIET
+        """
+        self.min_quiet = min_quiet
+        self.srtt = None
+        self.rttvar = None
+        self.samples = 0
+        self._lock = threading.Lock()
+
+    def update(self, rtt: float) -> None:
+        with self._lock:
+            if self.srtt is None:
+                self.srtt = rtt
+                self.rttvar = rtt / 2
+            else:
+                self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+                self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+            self.samples += 1
+
+    def quiet_interval(self) -> Optional[float]:
+        """How long no reply must come before the sweep is over (None = no estimate yet)."""
+        with self._lock:
+            if self.srtt is None:
+                return None
+            return max(self.min_quiet, self.srtt + self.K * self.rttvar)
+
+
+_rtt_estimators = {}
+_rtt_lock = threading.Lock()
+
+
+def rtt_estimator(interface: str, min_quiet: Optional[float] = None) -> RttEstimator:
+    """The running RTT estimate of an interface, with its quiet floor set to `min_quiet` if given."""
+    with _rtt_lock:
+        estimator = _rtt_estimators.get(interface)
+        if estimator is None:
+            estimator = _rtt_estimators[interface] = RttEstimator()
+        if min_quiet is not None:
+            estimator.min_quiet = min_quiet
+        return estimator
+
+# ========================= Transports =========================
+
+class RawSocketTransport:
+    """
+    AF_PACKET transport (Linux only). One socket is used for both transmit and receive.
+    """
+
+    def __init__(self, interface: str, protocol: int = ETH_P_ARP, rcvbuf: int = 4 * 1024 * 1024):
+        self.interface = interface
+        self.sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(protocol))
+        self.sock.bind((interface, protocol))
+
+        # Bade network pe replies burst me aate hai, isliye receive buffer bada rakha hai.
+        try:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        except OSError as e:
+            logger.debug(f"Could not raise SO_RCVBUF: {e}.")
+
+    def attach_filter(self, program) -> bool:
+        """
+        Attaches a classic BPF program, so the kernel drops unwanted frames before they
+        are copied to us. `program` is a list of (code, jt, jf, k) tuples.
+        Returns False (and keeps receiving everything) if the kernel refuses it.
+        """
+        import ctypes
+
+        raw = b"".join(struct.pack("HBBI", *instruction) for instruction in program)
+        buffer = ctypes.create_string_buffer(raw)
+        fprog = struct.pack("HL", len(program), ctypes.addressof(buffer))
+        try:
+            self.sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+        except OSError as e:
+            logger.debug(f"Could not attach BPF filter on {self.interface}: {e}.")
+            return False
+        return True
+
+    def send(self, frame: bytes) -> None:
+        self.sock.send(frame)
+
+    def recv(self, timeout: float) -> Optional[bytes]:
+        """Returns one received frame, or None if nothing arrived within `timeout` seconds."""
+        readable, _, _ = select.select([self.sock], [], [], max(timeout, 0))
+        if not readable:
+            return None
+
+        frame, address = self.sock.recvfrom(65535)
+        # Packet sockets also see our own transmitted frames - unko ignore karo.
+        if address[2] == PACKET_OUTGOING:
+            return None
+        return frame
+
+    def close(self) -> None:
+        self.sock.close()
+
+# ========================= Sweep Engine =========================
+
+class ArpSweeper:
+    """
+    ARP sweep engine. A sweep transmits one request per target from a precomputed
+    template while a receiver thread collects replies and streams them back.
+    """
+
+    _DONE = object()
+
+    def __init__(self, network: str, src_mac: str, src_ip: str, transport, timeout: float = 3.0,
+                 rate: Optional[float] = None, burst: Optional[float] = None, rtt: Optional[RttEstimator] = None):
+        """
+        Args:
+            network: Network to sweep in CIDR notation (eg, 192.168.1.0/24)
+            src_mac: MAC address of the sending interface
+            src_ip: IPv4 address of the sending interface
+            transport: Object with send(frame), recv(timeout) and close()
+            timeout: Max seconds to keep listening after the last request was sent. The sweep
+                     ends earlier once replies stopped for the RTT based quiet interval.
+            rate: Max requests per second, None = as fast as the socket takes them
+            burst: Requests which may go out back to back before `rate` applies
+            rtt: Shared RTT estimate (see rtt_estimator), default a fresh one for this sweeper
+        """
+        self.network = ipaddress.ip_network(network, strict=False)
+        self.src_mac = mac_to_bytes(src_mac)
+        self.src_ip = socket.inet_aton(src_ip)
+        self.transport = transport
+        self.timeout = timeout
+        self.rate = rate
+        self.burst = burst
+        self.rtt = rtt or RttEstimator()
+
+        self._sent_at = {}    # target IP (4 bytes) -> send time, for RTT samples
+        self._tx_finished = None
+
+        self._template = bytes(build_arp_frame(self.src_mac, self.src_ip))
+
+        # Numbers of the last finished sweep: sent, replies, tx_seconds, rx_seconds, total_seconds.
+        self.last_stats = {}
+
+    @classmethod
+    def for_interface(cls, interface: str, network: str, timeout: float = 3.0, rate: Optional[float] = None,
+                      burst: Optional[float] = None, min_quiet: Optional[float] = None) -> "ArpSweeper":
+        """
+        Creates a sweeper bound to a real interface using an AF_PACKET socket. `min_quiet`
+        sets the floor of the interface's quiet interval (default MIN_QUIET).
+        """
+        src_mac, src_ip = interface_addresses(interface)
+        return cls(network, src_mac, src_ip, RawSocketTransport(interface), timeout=timeout, rate=rate,
+                   burst=burst, rtt=rtt_estimator(interface, min_quiet))
+
+    def close(self) -> None:
+        self.transport.close()
+
+    # ------------------------- Transmit -------------------------
+
+    def _targets(self, targets: Optional[Iterable[str]],
+                 host_range: Optional[Tuple[int, int]] = None) -> Iterator[bytes]:
+        if targets is not None:
+            for ip in targets:
+                yield socket.inet_aton(ip)
+            return
+
+        first, last = host_range or network_host_range(self.network)
+        pack = struct.Struct("!I").pack
+        for value in range(first, last + 1):
+            yield pack(value)
+
+    def _transmit(self, targets: Iterable[bytes], stop: threading.Event,
+                  unicast: Optional[Dict[bytes, bytes]] = None) -> int:
+        frame = bytearray(self._template)
+        send = self.transport.send
+        take = TokenBucket(self.rate, self.burst).take if self.rate else None
+        sent_at = self._sent_at
+        clock = time.monotonic
+        sent = 0
+
+        for target_ip in targets:
+            if stop.is_set():
+                break
+            if take is not None:
+                take()
+            if unicast is not None:
+                frame[0:6] = unicast.get(target_ip, BROADCAST_MAC)
+            frame[TARGET_IP_OFFSET:TARGET_IP_OFFSET + 4] = target_ip
+            try:
+                sent_at[target_ip] = clock()
+                send(frame)
+                sent += 1
+            except OSError as e:
+                logger.debug("ARP send failed for %s: %s.", socket.inet_ntoa(target_ip), e)
+
+        return sent
+
+    # ------------------------- Receive -------------------------
+
+    def _receive(self, results: queue.Queue, tx_done: threading.Event, stop: threading.Event,
+                 accept_range: Optional[Tuple[int, int]] = None) -> None:
+        if accept_range is None:
+            first, last = int(self.network.network_address), int(self.network.broadcast_address)
+        else:
+            first, last = accept_range
+        unpack_ip = struct.Struct("!I").unpack
+        recv = self.transport.recv
+        sent_at = self._sent_at
+        rtt = self.rtt
+        clock = time.monotonic
+        seen = set()
+        last_reply = None
+        deadline = None
+
+        try:
+            while not stop.is_set():
+                if tx_done.is_set():
+                    if deadline is None:
+                        deadline = self._tx_finished + self.timeout
+                    # Sab targets ne jawab de diya (probe) toh rukne ka koi matlab nahi.
+                    if not sent_at:
+                        break
+                    end = deadline
+                    quiet = rtt.quiet_interval()
+                    if quiet is not None:
+                        end = min(deadline, max(self._tx_finished, last_reply or 0.0) + quiet)
+                    wait = end - clock()
+                    if wait <= 0:
+                        break
+                else:
+                    wait = 0.05
+
+                frame = recv(min(wait, 0.05))
+                if frame is None:
+                    continue
+
+                arp = parse_arp(frame)
+                if arp is None or arp[0] != ARP_REPLY:
+                    continue
+
+                _op, sha, spa, _tha, _tpa = arp
+                if not first <= unpack_ip(spa)[0] <= last or (spa, sha) in seen:
+                    continue
+
+                now = clock()
+                last_reply = now
+                sent = sent_at.pop(spa, None)
+                if sent is not None:
+                    rtt.update(now - sent)
+
+                seen.add((spa, sha))
+                results.put((socket.inet_ntoa(spa), bytes_to_mac(sha)))
+        except Exception as e:
+            logger.error(f"ARP receive loop failed: {e}.")
+        finally:
+            results.put(self._DONE)
+
+    # ------------------------- Public API -------------------------
+
+    def sweep(self, targets: Optional[Iterable[str]] = None, host_range: Optional[Tuple[int, int]] = None,
+              unicast: Optional[Dict[str, str]] = None) -> Iterator[Tuple[str, str]]:
+        """
+        Sweeps the network (or only `targets`) and yields (ip, mac) tuples as replies arrive.
+
+        Args:
+            targets: Optional iterable of IPv4 addresses. Default is every host of the network.
+            host_range: Optional (first, last) integer addresses - sweep only this slice of the
+                        network and accept only replies from it (one shard of a sharded sweep)
+            unicast: Optional {ip: mac} - requests to these IPs go straight to the MAC instead of
+                     broadcast (see retry)
+        """
+        if unicast is not None:
+            unicast = {socket.inet_aton(ip): mac_to_bytes(mac) for ip, mac in unicast.items()}
+
+        results = queue.Queue()
+        tx_done = threading.Event()
+        stop = threading.Event()
+        sent = [0]
+        self._sent_at = {}
+        self._tx_finished = None
+
+        def transmitter():
+            try:
+                sent[0] = self._transmit(self._targets(targets, host_range), stop, unicast)
+            finally:
+                self._tx_finished = time.monotonic()
+                tx_done.set()
+
+        receiver = threading.Thread(target=self._receive, args=(results, tx_done, stop, host_range),
+                                    name="cerberus-arp-rx", daemon=True)
+        sender = threading.Thread(target=transmitter, name="cerberus-arp-tx", daemon=True)
+
+        started = time.monotonic()
+        receiver.start()
+        sender.start()
+
+        found = 0
+        try:
+            while True:
+                item = results.get()
+                if item is self._DONE:
+                    break
+                found += 1
+                yield item
+        finally:
+            stop.set()
+            sender.join()
+            receiver.join()
+            finished = time.monotonic()
+            tx_finished = self._tx_finished
+            self._sent_at = {}
+            self.last_stats = {
+                "sent": sent[0],
+                "replies": found,
+                "tx_seconds": tx_finished - started,
+                "rx_seconds": finished - tx_finished,
+                "total_seconds": finished - started,
+                "srtt": self.rtt.srtt,
+                "quiet_seconds": self.rtt.quiet_interval(),
+            }
+            logger.debug("ARP sweep of %s: %d requests, %d replies in %.3fs.",
+                         self.network, sent[0], found, finished - started)
+
+    def retry(self, hosts: Dict[str, str], attempts: int = 2, backoff: float = 0.1) -> Iterator[Tuple[str, str]]:
+        """
+        Second chance for known hosts which missed a sweep: unicast ARP requests straight to
+        their last known MAC (sleeping Wi-Fi clients often ignore broadcasts but answer these),
+        `attempts` rounds with exponential back-off, each round only for the still missing ones.
+
+        Args:
+            hosts: {ip: last known mac} of the hosts which did not answer
+            attempts: Retry rounds
+            backoff: Pause before the first round, doubled before every next one
+
+        Yields:
+            (ip, mac) of every host which answered a retry
+        """
+        remaining = dict(hosts)
+        totals = dict.fromkeys(("sent", "replies", "tx_seconds", "rx_seconds", "total_seconds"), 0)
+        try:
+            for attempt in range(attempts):
+                if not remaining:
+                    break
+                time.sleep(backoff * (2 ** attempt))
+                for ip, mac in self.sweep(targets=list(remaining), unicast=remaining):
+                    if remaining.pop(ip, None) is not None:
+                        yield ip, mac
+                for key in totals:
+                    totals[key] += self.last_stats[key]
+        finally:
+            # Saare rounds ka total, taaki metrics me retry ek hi "sweep" dikhe.
+            self.last_stats = dict(self.last_stats, **totals, recovered=len(hosts) - len(remaining))
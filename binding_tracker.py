@@ -0,0 +1,256 @@
+"""
+Binding Tracker Module
+
+This module checks every IP/MAC pair Cerberus sees (passive ARP frames, sweep replies,
+DHCP) for consistency, to catch ARP spoofing and address conflicts:
+
+    - gateway_impersonation: the router IP answering from a MAC other than the pinned one
+    - duplicate_ip: two different MACs claiming the same IP within a few seconds
+    - rapid_rebind: an IP changing MAC more than `rebind_limit` times within `rebind_window`
+    - mac_flood: one MAC claiming more than `max_ips_per_mac` IPs (bulk ARP poisoning)
+
+It keeps an indexed IP->MAC binding (with a short history per IP) and MAC->IP index.
+Keys are the raw 4 / 6 byte values straight from the frame, and an unchanged binding
+(the common case) costs a single dict lookup, so a passive ARP feed of thousands of
+frames per second is handled inline in the capture thread.
+
+Usage:
+    from binding_tracker import BindingTracker
+
+    tracker = BindingTracker(gateways={"192.168.1.1": None}, on_alert=print)
+    tracker.observe("192.168.1.1", "aa:bb:cc:dd:ee:ff")
+"""
+
+import collections
+import socket
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import cerberus_logger
+from arp_sweeper import bytes_to_mac, mac_to_bytes
+
+logger = cerberus_logger.get_logger("cerberus.binding_tracker")
+
+GATEWAY_IMPERSONATION = "gateway_impersonation"
+DUPLICATE_IP = "duplicate_ip"
+RAPID_REBIND = "rapid_rebind"
+MAC_FLOOD = "mac_flood"
+
+SEVERITY = {
+    GATEWAY_IMPERSONATION: "critical",
+    DUPLICATE_IP: "high",
+    RAPID_REBIND: "high",
+    MAC_FLOOD: "high",
+}
+
+_ZERO_IP = b"\x00\x00\x00\x00"
+
+
+class Binding:
+    """Current owner of one IP plus its recent previous owners."""
+
+    __slots__ = ("mac", "first_seen", "last_seen", "history", "rebinds")
+
+    def __init__(self, mac: bytes, now: float, history: int):
+        self.mac = mac
+        self.first_seen = now
+        self.last_seen = now
+        self.history = collections.deque(maxlen=history)    # (mac, first_seen, last_seen)
+        self.rebinds = collections.deque()
+
+
+class BindingTracker:
+    """
+    IP<->MAC binding index with spoofing / conflict detection. Thread-safe.
+    """
+
+    def __init__(self, gateways: Optional[Dict[str, Optional[str]]] = None,
+                 on_alert: Optional[Callable[[dict], None]] = None,
+                 conflict_window: float = 5.0, rebind_window: float = 60.0, rebind_limit: int = 3,
+                 max_ips_per_mac: int = 32, alert_cooldown: float = 60.0, history: int = 8,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            gateways: {router_ip: pinned_mac}. A None MAC is pinned on the first sighting.
+            on_alert: Called with every alert dict
+            conflict_window: Two MACs on one IP within this many seconds = duplicate IP
+            rebind_window: Window (seconds) for counting rebinds of one IP
+            rebind_limit: More rebinds than this within rebind_window = rapid rebind
+            max_ips_per_mac: More IPs than this on one (non-gateway) MAC = MAC flood
+            alert_cooldown: Same alert for the same IP is not repeated within this many seconds
+            history: Previous owners remembered per IP
+        """
+        self.on_alert = on_alert
+        self.conflict_window = conflict_window
+        self.rebind_window = rebind_window
+        self.rebind_limit = rebind_limit
+        self.max_ips_per_mac = max_ips_per_mac
+        self.alert_cooldown = alert_cooldown
+        self.history = history
+        self.clock = clock
+
+        self._by_ip: Dict[bytes, Binding] = {}
+        self._by_mac: Dict[bytes, set] = {}
+        self._gateways: Dict[bytes, Optional[bytes]] = {}
+        self._last_alert: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+        self.observed = 0
+        self.alerts = 0
+
+        for ip, mac in (gateways or {}).items():
+            self.set_gateway(ip, mac)
+
+    # ------------------------- Configuration -------------------------
+
+    def set_gateway(self, ip: str, mac: Optional[str] = None) -> None:
+        """Pins the router's MAC (or, with mac=None, pins it on the first sighting)."""
+        with self._lock:
+            self._gateways[socket.inet_aton(ip)] = mac_to_bytes(mac) if mac else None
+
+    def clear_gateways(self) -> None:
+        with self._lock:
+            self._gateways.clear()
+
+    # ------------------------- Observations -------------------------
+
+    def observe_raw(self, ip: bytes, mac: bytes, source: str = "arp", now: Optional[float] = None) -> List[dict]:
+        """
+        Records one sighting given as raw bytes (4 byte IP, 6 byte MAC) straight from a frame.
+
+        Returns:
+            list: Alerts raised by this sighting (usually empty)
+        """
+        if now is None:
+            now = self.clock()
+
+        with self._lock:
+            self.observed += 1
+            binding = self._by_ip.get(ip)
+            # Fast path: binding wahi hai, sirf timestamp update.
+            if binding is not None and binding.mac == mac:
+                binding.last_seen = now
+                return []
+
+            if ip == _ZERO_IP or mac[0] & 0x01:
+                return []
+            alerts = self._rebind(ip, mac, binding, source, now)
+
+        for alert in alerts:
+            self._dispatch(alert)
+        return alerts
+
+    def observe(self, ip: str, mac: str, source: str = "sweep", now: Optional[float] = None) -> List[dict]:
+        """Records one sighting given as strings ("192.168.1.5", "aa:bb:cc:dd:ee:ff")."""
+        try:
+            return self.observe_raw(socket.inet_aton(ip), mac_to_bytes(mac), source, now)
+        except (OSError, TypeError, ValueError):
+            return []
+
+    def observe_devices(self, devices: Iterable[dict]) -> List[dict]:
+        """Records a batch of {"ip", "mac"} sightings (IPv6 and IP-less ones are skipped)."""
+        alerts = []
+        for device in devices:
+            ip = device.get("ip")
+            if ip and ":" not in ip:
+                alerts.extend(self.observe(ip, device["mac"], device.get("source", "sweep")))
+        return alerts
+
+    # ------------------------- Queries -------------------------
+
+    def mac_for(self, ip: str) -> Optional[str]:
+        with self._lock:
+            binding = self._by_ip.get(socket.inet_aton(ip))
+            return bytes_to_mac(binding.mac) if binding else None
+
+    def ips_for(self, mac: str) -> List[str]:
+        with self._lock:
+            return sorted(socket.inet_ntoa(ip) for ip in self._by_mac.get(mac_to_bytes(mac), ()))
+
+    def history_for(self, ip: str) -> List[dict]:
+        """Owners of an IP, oldest first, the current one last."""
+        with self._lock:
+            binding = self._by_ip.get(socket.inet_aton(ip))
+            if binding is None:
+                return []
+            owners = list(binding.history) + [(binding.mac, binding.first_seen, binding.last_seen)]
+        return [{"mac": bytes_to_mac(mac), "first_seen": first, "last_seen": last} for mac, first, last in owners]
+
+    def __len__(self) -> int:
+        return len(self._by_ip)
+
+    # ------------------------- Internals -------------------------
+
+    def _rebind(self, ip: bytes, mac: bytes, binding: Optional[Binding], source: str, now: float) -> List[dict]:
+        """Slow path, called with the lock held: new IP or an IP answering from a new MAC."""
+        alerts = []
+        old_mac = binding.mac if binding is not None else None
+
+        if ip in self._gateways:
+            pinned = self._gateways[ip]
+            if pinned is None:
+                self._gateways[ip] = mac
+            elif mac != pinned:
+                # Gateway ka binding kabhi attacker ko mat do, pinned MAC hi sahi hai.
+                alerts.append(self._alert(GATEWAY_IMPERSONATION, ip, mac, pinned, source, now))
+                return [alert for alert in alerts if alert]
+
+        if binding is None:
+            binding = self._by_ip[ip] = Binding(mac, now, self.history)
+        else:
+            if now - binding.last_seen <= self.conflict_window:
+                alerts.append(self._alert(DUPLICATE_IP, ip, mac, old_mac, source, now))
+
+            rebinds = binding.rebinds
+            rebinds.append(now)
+            while rebinds and rebinds[0] < now - self.rebind_window:
+                rebinds.popleft()
+            if len(rebinds) > self.rebind_limit:
+                alerts.append(self._alert(RAPID_REBIND, ip, mac, old_mac, source, now, rebinds=len(rebinds)))
+
+            binding.history.append((old_mac, binding.first_seen, binding.last_seen))
+            binding.mac = mac
+            binding.first_seen = binding.last_seen = now
+
+            old_ips = self._by_mac.get(old_mac)
+            if old_ips is not None:
+                old_ips.discard(ip)
+                if not old_ips:
+                    del self._by_mac[old_mac]
+
+        ips = self._by_mac.setdefault(mac, set())
+        ips.add(ip)
+        if len(ips) > self.max_ips_per_mac and mac not in self._gateways.values():
+            alerts.append(self._alert(MAC_FLOOD, ip, mac, None, source, now, ips=len(ips)))
+
+        return [alert for alert in alerts if alert]
+
+    def _alert(self, kind: str, ip: bytes, mac: bytes, old_mac: Optional[bytes], source: str,
+               now: float, **fields) -> Optional[dict]:
+        # MAC flood ek MAC ka issue hai, baaki sab ek IP ka.
+        key = (kind, mac if kind == MAC_FLOOD else ip)
+        last = self._last_alert.get(key)
+        if last is not None and now - last < self.alert_cooldown:
+            return None
+        self._last_alert[key] = now
+        self.alerts += 1
+
+        alert = {
+            "alert": kind,
+            "severity": SEVERITY[kind],
+            "ip": socket.inet_ntoa(ip),
+            "mac": bytes_to_mac(mac),
+            "old_mac": bytes_to_mac(old_mac) if old_mac else None,
+            "source": source,
+        }
+        alert.update(fields)
+        return alert
+
+    def _dispatch(self, alert: dict) -> None:
+        if self.on_alert is None:
+            return
+        try:
+            self.on_alert(alert)
+        except Exception as e:
+            logger.error(f"Binding alert callback failed: {e}.")
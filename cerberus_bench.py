@@ -0,0 +1,316 @@
+"""
+Cerberus Benchmark Module
+
+This module benchmarks the scan pipeline against a simulated LAN (lan_simulator), so it
+runs offline on any plain Linux box, no root and no real network needed. Every
+scenario drives the real components - wake-up stage, ARP sweep engine, registry diff
+and the SQLite device store - and reports per-stage wall time, CPU time, peak RSS
+and packets/second.
+
+Each scenario runs in its own process so the peak RSS belongs to that scenario only.
+Results can be saved as baseline JSON files and later runs compared against them, so
+performance regressions show up.
+
+Usage:
+    python cerberus_bench.py                       # 256, 4k and 65k hosts
+    python cerberus_bench.py --sizes 256 4k --loss 0.02 --latency 0.005
+    python cerberus_bench.py --save-baseline       # writes bench_baselines/*.json
+    python cerberus_bench.py --check               # exit code 1 on regression
+    python cerberus_bench.py --startup             # cold-start import time vs budget
+"""
+
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from arp_sweeper import ArpSweeper
+from device_registry import DeviceRegistry
+from device_store import DeviceStore
+from lan_simulator import SimulatedIcmp, SimulatedLan
+from wakeup_stage import WakeupStage
+
+SCENARIOS = {
+    "256": "10.0.0.0/24",
+    "4k": "10.0.0.0/20",
+    "65k": "10.0.0.0/16",
+}
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baselines")
+
+STAGES = ("wakeup", "transmit", "receive", "diff", "persist")
+
+STARTUP_MODULE = "cerberus_scan"
+STARTUP_BUDGET = 0.25    # seconds
+
+# Must never be loaded just by starting Cerberus, they are imported on first use.
+LAZY_MODULES = ("scapy", "npcap_installer", "requests", "winreg", "http.server", "urllib.request", "smtplib",
+                "multiprocessing", "asyncio")
+
+# ========================= Scenario Runner =========================
+
+def run_scenario(name, network, live_fraction=0.25, known_fraction=0.9, loss=0.0,
+                 latency=0.001, jitter=0.001, timeout=0.25, seed=1):
+    """
+    Runs one full scan cycle against a simulated LAN and measures it.
+
+    Returns:
+        dict: Timings (seconds) per stage, cpu_seconds, peak_rss_kb, pps and counters
+    """
+    lan = SimulatedLan(network, live_fraction=live_fraction, loss=loss, latency=latency,
+                       jitter=jitter, seed=seed)
+
+    # Known devices = most of the live hosts, baaki intruders ki tarah dikhenge.
+    live = list(lan.live_hosts.items())
+    known_count = int(len(live) * known_fraction)
+    registry = DeviceRegistry()
+    for ip, mac in live[:known_count]:
+        registry.add(mac, ip=ip)
+    registry.pop_dirty()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = DeviceStore(os.path.join(tmp, "bench.db"))
+        store.upsert(registry)
+
+        cpu_started = time.process_time()
+        wall_started = time.perf_counter()
+
+        # Wake-up stage runs alongside the ARP transmit, just like scan_segment().
+        wakeup = WakeupStage(SimulatedIcmp())
+        wakeup.start(network, [ip for ip, _mac in live[:known_count]])
+
+        sweeper = ArpSweeper(network, lan.gateway_mac, lan.gateway_ip, lan, timeout=timeout)
+        devices = [{"ip": ip, "mac": mac} for ip, mac in sweeper.sweep()]
+        wakeup.join()
+
+        diff_started = time.perf_counter()
+        known, unknown = registry.diff(devices)
+        persist_started = time.perf_counter()
+        store.upsert(registry.pop_dirty())
+        finished = time.perf_counter()
+
+        cpu_seconds = time.process_time() - cpu_started
+        store.close()
+
+    sweep = sweeper.last_stats
+    stages = {
+        "wakeup": wakeup.last_seconds,
+        "transmit": sweep["tx_seconds"],
+        "receive": sweep["rx_seconds"],
+        "diff": persist_started - diff_started,
+        "persist": finished - persist_started,
+    }
+
+    return {
+        "scenario": name,
+        "network": network,
+        "hosts": lan.network.num_addresses - 2,
+        "live": len(live),
+        "found": len(devices),
+        "known": len(known),
+        "unknown": len(unknown),
+        "loss": loss,
+        "latency": latency,
+        "stages": stages,
+        "wall_seconds": finished - wall_started,
+        "cpu_seconds": cpu_seconds,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "tx_pps": sweep["sent"] / sweep["tx_seconds"] if sweep["tx_seconds"] else 0.0,
+        "rx_pps": sweep["replies"] / sweep["total_seconds"] if sweep["total_seconds"] else 0.0,
+    }
+
+
+def run_isolated(name, network, **kwargs):
+    """Runs a scenario in a fresh child process (clean peak RSS)."""
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(run_scenario, name, network, **kwargs).result()
+
+# ========================= Startup Budget =========================
+
+_IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - started
+lazy = {lazy!r}
+loaded = sorted(m for m in sys.modules if any(m == name or m.startswith(name + ".") for name in lazy))
+with open("startup.json", "w") as f:
+    json.dump({{"seconds": seconds, "loaded": loaded}}, f)
+"""
+
+
+def measure_startup(module=STARTUP_MODULE, runs=5):
+    """
+    Measures the cold-start import time of `module`, every run in a fresh interpreter.
+    The first run is thrown away (it may still be writing .pyc files).
+
+    Returns:
+        dict: median_seconds, best_seconds, and `loaded` - lazy modules that got imported anyway
+    """
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [source_dir, env.get("PYTHONPATH")]))
+    code = _IMPORT_PROBE.format(module=module, lazy=LAZY_MODULES)
+
+    samples, loaded = [], []
+    # Importing cerberus_scan sets up cerberus.log in the working directory, so use a scratch one.
+    with tempfile.TemporaryDirectory() as tmp:
+        for _ in range(runs + 1):
+            proc = subprocess.run([sys.executable, "-c", code], cwd=tmp, env=env,
+                                  capture_output=True, text=True)
+            if proc.returncode != 0:
+                raise RuntimeError(f"import {module} failed:\n{proc.stderr.strip()}")
+            # Result goes through a file, console logging shares stdout with the child.
+            with open(os.path.join(tmp, "startup.json"), "r") as f:
+                result = json.load(f)
+            samples.append(result["seconds"])
+            loaded = result["loaded"]
+
+    samples = samples[1:]
+    return {
+        "module": module,
+        "median_seconds": statistics.median(samples),
+        "best_seconds": min(samples),
+        "loaded": loaded,
+    }
+
+
+def check_startup(result, budget=STARTUP_BUDGET):
+    """Returns a list of startup budget violations (empty = OK)."""
+    problems = []
+    if result["median_seconds"] > budget:
+        problems.append(f"import {result['module']}: {result['median_seconds'] * 1000:.1f}ms "
+                        f"> budget {budget * 1000:.0f}ms")
+    if result["loaded"]:
+        problems.append(f"lazy modules imported at startup: {', '.join(result['loaded'])}")
+    return problems
+
+# ========================= Baselines =========================
+
+def baseline_path(name):
+    return os.path.join(BASELINE_DIR, f"scan_{name}.json")
+
+
+def save_baseline(result):
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    with open(baseline_path(result["scenario"]), "w") as f:
+        json.dump(result, f, indent=4)
+
+
+def compare_baseline(result, tolerance=0.25, slack=0.005):
+    """
+    Compares a result with its saved baseline.
+
+    Args:
+        tolerance: Allowed relative slowdown per stage (0.25 = 25%)
+        slack: Absolute seconds ignored, so tiny stages don't flap on noise
+
+    Returns:
+        list: Human readable regression messages (empty = OK), or None if no baseline exists
+    """
+    try:
+        with open(baseline_path(result["scenario"]), "r") as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        return None
+
+    regressions = []
+    for stage in STAGES:
+        old, new = baseline["stages"].get(stage, 0.0), result["stages"][stage]
+        if new > old * (1 + tolerance) + slack:
+            regressions.append(f"{stage}: {old * 1000:.1f}ms -> {new * 1000:.1f}ms")
+
+    for key in ("wall_seconds", "cpu_seconds"):
+        old, new = baseline[key], result[key]
+        if new > old * (1 + tolerance) + slack:
+            regressions.append(f"{key}: {old:.3f}s -> {new:.3f}s")
+
+    if result["peak_rss_kb"] > baseline["peak_rss_kb"] * (1 + tolerance):
+        regressions.append(f"peak_rss: {baseline['peak_rss_kb']}KB -> {result['peak_rss_kb']}KB")
+
+    return regressions
+
+# ========================= Reporting =========================
+
+def print_result(result):
+    stages = "  ".join(f"{stage}={result['stages'][stage] * 1000:.1f}ms" for stage in STAGES)
+    print(f"[{result['scenario']:>4}] {result['hosts']} hosts, {result['found']}/{result['live']} found, "
+          f"{result['unknown']} unknown")
+    print(f"       {stages}")
+    print(f"       wall={result['wall_seconds']:.3f}s  cpu={result['cpu_seconds']:.3f}s  "
+          f"rss={result['peak_rss_kb'] / 1024:.1f}MB  tx={result['tx_pps']:.0f}pps  rx={result['rx_pps']:.0f}pps")
+
+
+def run_startup_check(budget):
+    result = measure_startup()
+    print(f"[boot] import {result['module']}: median={result['median_seconds'] * 1000:.1f}ms  "
+          f"best={result['best_seconds'] * 1000:.1f}ms  budget={budget * 1000:.0f}ms")
+    problems = check_startup(result, budget)
+    for message in problems:
+        print(f"       OVER BUDGET {message}")
+    return 1 if problems else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Cerberus scan pipeline benchmark (simulated LAN).")
+    parser.add_argument("--sizes", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS),
+                        help="Scenarios to run (default: all)")
+    parser.add_argument("--live", type=float, default=0.25, help="Share of addresses with a live host")
+    parser.add_argument("--loss", type=float, default=0.0, help="Reply loss probability")
+    parser.add_argument("--latency", type=float, default=0.001, help="Base reply latency (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.001, help="Extra random latency (seconds)")
+    parser.add_argument("--timeout", type=float, default=0.25, help="ARP receive window after transmit")
+    parser.add_argument("--save-baseline", action="store_true", help="Save results as the new baselines")
+    parser.add_argument("--check", action="store_true", help="Fail (exit 1) if slower than the baselines")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown for --check")
+    parser.add_argument("--json", help="Also write all results to this JSON file")
+    parser.add_argument("--startup", action="store_true",
+                        help="Only measure cold-start import time, exit 1 if over --startup-budget")
+    parser.add_argument("--startup-budget", type=float, default=STARTUP_BUDGET,
+                        help="Cold-start import budget in seconds")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.startup:
+        return run_startup_check(args.startup_budget)
+
+    results = []
+    failed = False
+
+    for name in args.sizes:
+        result = run_isolated(name, SCENARIOS[name], live_fraction=args.live, loss=args.loss,
+                              latency=args.latency, jitter=args.jitter, timeout=args.timeout)
+        results.append(result)
+        print_result(result)
+
+        if args.check:
+            regressions = compare_baseline(result, tolerance=args.tolerance)
+            if regressions is None:
+                print("       (no baseline saved yet)")
+            elif regressions:
+                failed = True
+                for message in regressions:
+                    print(f"       REGRESSION {message}")
+
+        if args.save_baseline:
+            save_baseline(result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
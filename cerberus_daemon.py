@@ -0,0 +1,618 @@
+"""
+Cerberus Daemon Module
+
+This module runs Cerberus as a long-lived service on an asyncio event loop, instead of
+one blocking surveillance loop. The work is split into tasks connected by bounded queues:
+
+    scan thread ------+
+                      +--> sightings queue --> check task --> event queue per sink --> sink tasks
+    passive capture --+                            |
+                                                   +--> registry --> persist task (batched)
+
+    - scan: the tiered ScanScheduler runs in its own thread and only scans. Its results
+      are handed over, so diffing, alerting and saving never delay the next scan.
+    - check: registry diff, delta engine and intruder alerts, on the event loop
+    - sinks: every event consumer registered with add_sink() (by default the JSON-lines
+      stream) drains its own queue in its own worker thread. A slow or dead sink only fills
+      its own queue, which then drops events (counted in cerberus_daemon_dropped_total)
+      instead of blocking. The alert dispatcher and the fleet reporter are not daemon
+      sinks: scan.emit_event() hands them every event directly, and both already only
+      enqueue into their own bounded queues drained by their own threads.
+    - persist: saves the changed devices every `persist_interval` seconds
+    - metrics: queue depths for the Prometheus endpoint (METRICS_PORT)
+
+Signals:
+    SIGTERM / SIGINT: graceful shutdown - stop scanning, drain the queues, save, exit
+    SIGHUP: reload - save, re-read the trusted devices from the store, re-detect the network,
+            reopen the vendor table
+
+Usage:
+    sudo python cerberus_daemon.py --pidfile /run/cerberus.pid
+
+    # or embedded
+    daemon = CerberusDaemon(registry)
+    asyncio.run(daemon.run())
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+import cerberus_scan as scan
+import cerberus_logger
+import cerberus_metrics as metrics
+import oui_lookup
+from binding_tracker import BindingTracker
+from delta_engine import DeltaEngine
+from router_detector import NetworkWatcher, RouterDetector
+from scan_scheduler import ScanScheduler
+
+logger = cerberus_logger.get_logger("cerberus.daemon")
+
+QUEUE_DEPTH = metrics.gauge("cerberus_daemon_queue_depth", "Items waiting in a daemon queue.")
+DROPPED = metrics.counter("cerberus_daemon_dropped_total", "Items dropped because a daemon queue was full.")
+
+SIGHTINGS = "sightings"
+
+
+class EventSinkSpec:
+    """One registered event consumer and its queue."""
+
+    __slots__ = ("name", "deliver", "queue_size", "batch_size", "queue", "pool", "task", "delivered")
+
+    def __init__(self, name: str, deliver: Callable[[List[dict]], None], queue_size: int, batch_size: int):
+        self.name = name
+        self.deliver = deliver
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.queue = None
+        self.pool = None
+        self.task = None
+        self.delivered = 0
+
+
+class CerberusDaemon:
+    """
+    asyncio runtime for surveillance mode. Create it with the trusted registry and
+    await run(), it returns once a shutdown signal was handled and everything is drained.
+    """
+
+    def __init__(self, registry, queue_size: int = 1024, event_queue_size: int = 4096,
+                 persist_interval: float = 30.0, drain_timeout: float = 10.0):
+        """
+        Args:
+            registry: Trusted DeviceRegistry
+            queue_size: Max sighting batches waiting for the check task
+            event_queue_size: Default max events waiting per sink
+            persist_interval: Seconds between two saves of the changed devices
+            drain_timeout: Max seconds a graceful shutdown waits for scans, queues and sinks
+        """
+        self.registry = registry
+        self.queue_size = queue_size
+        self.event_queue_size = event_queue_size
+        self.persist_interval = persist_interval
+        self.drain_timeout = drain_timeout
+
+        self.scheduler = ScanScheduler()
+        self.sinks: Dict[str, EventSinkSpec] = {}
+        self.monitors = []
+        self.ndp = []
+        self.watcher = None
+        self.live_devices = {}    # ip -> device from the latest sweep, probe tier inhi ko check karta hai
+        self.scan_count = 0
+        self.probe_cursor = 0
+
+        self._loop = None
+        self._loop_thread = None
+        self._stopping = None
+        self._sightings = None
+        self._tasks = []
+        self._scan_pool = None
+        self._scan_future = None
+        self._persist_pool = None
+        self._file_sink = None
+        self._retarget_lock = threading.Lock()
+
+    # ------------------------- Sinks -------------------------
+
+    def add_sink(self, name: str, deliver: Callable[[List[dict]], None], queue_size: Optional[int] = None,
+                 batch_size: int = 256) -> None:
+        """
+        Registers an event consumer. deliver(events) is called from the sink's own worker
+        thread with batches of event dicts ({"ts", "event", ...}) and may block as long as
+        it likes - only this sink's queue fills up meanwhile. Call before run().
+        """
+        self.sinks[name] = EventSinkSpec(name, deliver, queue_size or self.event_queue_size, batch_size)
+
+    def emit(self, event: str, **fields) -> None:
+        """
+        emit_event() target while the daemon runs: fans the event out to every sink queue.
+        Thread-safe and never blocks (full queues drop the event).
+        """
+        record = {"ts": round(time.time(), 3), "event": event}
+        record.update(fields)
+        self._call_in_loop(self._offer_event, record)
+
+    def _offer_event(self, record: dict) -> None:
+        for spec in self.sinks.values():
+            if spec.queue is None:
+                continue
+            try:
+                spec.queue.put_nowait(record)
+            except asyncio.QueueFull:
+                DROPPED.inc(queue=spec.name)
+
+    def _write_events(self, events: List[dict]) -> None:
+        """Default sink: the JSON-lines event stream set up by cerberus_scan."""
+        sink = self._file_sink
+        for record in events:
+            fields = {key: value for key, value in record.items() if key != "event"}
+            sink.emit(record["event"], **fields)
+
+    # ------------------------- Sightings -------------------------
+
+    def submit(self, devices: List[dict], scope: Optional[Iterable[str]] = (), scan_info: Optional[dict] = None,
+               wait: bool = False) -> bool:
+        """
+        Hands sightings to the check task. Thread-safe.
+
+        Args:
+            devices: Sightings ({"ip", "mac", ...})
+            scope: Passed to check_devices (None = full sweep, () = passive)
+            scan_info: Sweep bookkeeping, turns into the scan_completed event after the check
+            wait: Block (at most drain_timeout) while the queue is full instead of dropping.
+                  Sweep results wait, passive sightings are dropped - the next sweep sees them anyway.
+
+        Returns:
+            bool: False if the batch was dropped
+        """
+        item = (devices, scope, scan_info)
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return False
+
+        if not wait or threading.get_ident() == self._loop_thread:
+            self._call_in_loop(self._offer_sighting, item)
+            return True
+
+        future = asyncio.run_coroutine_threadsafe(self._sightings.put(item), loop)
+        try:
+            future.result(self.drain_timeout)
+            return True
+        except Exception:
+            future.cancel()
+            DROPPED.inc(queue=SIGHTINGS)
+            logger.warning(f"Check task is stuck, dropped {len(devices)} sightings.")
+            return False
+
+    def _offer_sighting(self, item) -> None:
+        try:
+            self._sightings.put_nowait(item)
+        except asyncio.QueueFull:
+            DROPPED.inc(queue=SIGHTINGS)
+
+    def _check_later(self, devices, registry=None, scope=()):
+        """check_devices() stand-in for the capture threads: queues instead of checking inline."""
+        self.submit(devices, scope)
+
+    def _call_in_loop(self, callback, *args) -> None:
+        loop = self._loop
+        if loop is None:
+            return
+        if threading.get_ident() == self._loop_thread:
+            callback(*args)
+            return
+        try:
+            loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            pass    # Loop already closed, shutdown ke baad aaya hua sighting
+
+    # ------------------------- Scan Tiers (scan thread) -------------------------
+
+    def full_sweep(self, budget: int) -> int:
+        self.scan_count += 1
+        logger.info(f"------------------------- Scan {self.scan_count} -------------------------")
+        started = time.monotonic()
+        segments = scan.SCAN_SEGMENTS
+        scan.emit_event("scan_started", scan=self.scan_count,
+                        segments=[segment["cidr"] for segment in segments] or [scan.TARGET_NETWORK])
+
+        failed = []
+        current_devices = scan.scan_network(scan.known_hosts(self.registry, self.live_devices), failed=failed)
+        swept = time.monotonic()
+        self.scheduler.reschedule("sweep")
+
+        scan_info = {"scan": self.scan_count, "started": started, "swept": swept}
+        if not current_devices:
+            logger.warning("No devices found!")
+            scan.emit_event("scan_completed", scan=self.scan_count, devices=0, unknown=0,
+                            sweep_ms=round((swept - started) * 1000, 1))
+            return scan.segment_host_count()
+
+        self.live_devices = {device["ip"]: device for device in current_devices}
+        scan.DEVICES_FOUND.set(len(current_devices))
+        for monitor in self.monitors:
+            monitor.mark_seen(device["mac"] for device in current_devices)
+
+        self.submit(current_devices, scope=scan.sweep_scope(failed), scan_info=scan_info, wait=True)
+        return scan.segment_host_count()
+
+    def probe_live_hosts(self, budget: int) -> int:
+        current = {segment["cidr"] for segment in scan.SCAN_SEGMENTS}
+        hosts = [device for device in self.live_devices.values()
+                 if not current or device.get("segment", scan.TARGET_NETWORK) in current]
+        if not hosts:
+            return 0
+
+        start = self.probe_cursor % len(hosts)
+        batch = (hosts[start:] + hosts[:start])[:budget]
+        self.probe_cursor = start + len(batch)
+
+        answered = scan.probe_devices(batch, timeout=scan.PROBE_TIMEOUT)
+        logger.debug("Probe: %d/%d live hosts answered.", len(answered), len(batch))
+        self.submit(answered, scope=[device["mac"] for device in batch], wait=True)
+        return len(batch)
+
+    def probe_ipv6(self, budget: int) -> int:
+        known = self.registry.ipv6_addresses()[:budget]
+        return sum(engine.probe(known) for engine in self.ndp)
+
+    def on_new_device(self, device: dict) -> None:
+        self.scheduler.trigger("event", f"new MAC {device['mac']}")
+
+    # ------------------------- Network Changes -------------------------
+
+    def retarget(self, context) -> None:
+        """Points scans, gateway pins and listeners at a new NetworkContext. Any thread."""
+        if not context.router_ip:
+            logger.warning("Default route lost - keeping the current scan targets until it is back.")
+            return
+
+        with self._retarget_lock:
+            scan.apply_network_context(context)
+            scan.retarget_gateways(self.registry, context.router_ip)
+            segments = scan.SCAN_SEGMENTS
+            logger.warning(f"Network changed, now scanning: {', '.join(segment['cidr'] for segment in segments)}")
+            scan.emit_event("network_changed", router_ip=context.router_ip, interface=context.interface,
+                            segments=[segment["cidr"] for segment in segments])
+
+            wanted = {segment["interface"] for segment in segments if segment["interface"]}
+            self.monitors = scan.sync_listeners(self.monitors, wanted, self._start_monitors)
+            self.ndp = scan.sync_listeners(self.ndp, wanted, self._start_ndp)
+
+            budget = scan.segment_host_count()
+            for name in ("sweep", "event"):
+                self.scheduler.tiers[name].budget = budget
+        self.scheduler.trigger("event", "network changed")
+
+    def _on_network_change(self, old, new) -> None:
+        self.retarget(new)
+
+    def _start_monitors(self, interfaces=None):
+        return scan.start_passive_monitors(self.registry, self.on_new_device, interfaces, checker=self._check_later)
+
+    def _start_ndp(self, interfaces=None):
+        return scan.start_ndp_discovery(self.registry, interfaces, checker=self._check_later)
+
+    # ------------------------- Tasks -------------------------
+
+    async def _check_loop(self) -> None:
+        queue = self._sightings
+        while True:
+            devices, scope, scan_info = await queue.get()
+            try:
+                self._check(devices, scope, scan_info)
+            except Exception:
+                logger.exception("Checking sightings failed.")
+            finally:
+                queue.task_done()
+
+    def _check(self, devices, scope, scan_info) -> None:
+        checking = time.monotonic()
+        unknown_devices = scan.check_devices(devices, self.registry, scope=scope)
+        if scan_info is None:
+            return
+
+        if not unknown_devices:
+            logger.info("All devices are trusted.")
+        checked = time.monotonic()
+        started, swept = scan_info["started"], scan_info["swept"]
+        # Persist yaha nahi hota (persist task alag hai), isliye persist_ms ki jagah queue_ms.
+        scan.emit_event("scan_completed", scan=scan_info["scan"], devices=len(devices),
+                        unknown=len(unknown_devices),
+                        recovered=sum(device.get("source") == "retry" for device in devices),
+                        sweep_ms=round((swept - started) * 1000, 1),
+                        queue_ms=round((checking - swept) * 1000, 1),
+                        check_ms=round((checked - checking) * 1000, 1),
+                        total_ms=round((checked - started) * 1000, 1))
+
+    async def _sink_loop(self, spec: EventSinkSpec) -> None:
+        loop = asyncio.get_running_loop()
+        queue = spec.queue
+        while True:
+            batch = [await queue.get()]
+            # Jitne events pade hai ek batch me bhejo, har event ka alag round trip nahi.
+            while len(batch) < spec.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            try:
+                await loop.run_in_executor(spec.pool, spec.deliver, batch)
+                spec.delivered += len(batch)
+            except Exception as e:
+                logger.error(f"Event sink '{spec.name}' failed, {len(batch)} events lost: {e}.")
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def _persist_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.persist_interval)
+            await self.persist()
+
+    async def persist(self) -> None:
+        """Saves the devices changed since the last save and the presence history, in the persist worker thread."""
+        loop = asyncio.get_running_loop()
+        if self.registry.dirty_count():
+            await loop.run_in_executor(self._persist_pool, scan.save_known_devices, self.registry)
+        await loop.run_in_executor(self._persist_pool, scan.save_presence)
+
+    async def _metrics_loop(self) -> None:
+        while True:
+            QUEUE_DEPTH.set(self._sightings.qsize(), queue=SIGHTINGS)
+            for spec in self.sinks.values():
+                QUEUE_DEPTH.set(spec.queue.qsize(), queue=spec.name)
+            await asyncio.sleep(1.0)
+
+    # ------------------------- Signals -------------------------
+
+    def request_stop(self, reason: str = "stop requested") -> None:
+        """Starts a graceful shutdown. Thread-safe."""
+        self._call_in_loop(self._set_stopping, reason)
+
+    def _set_stopping(self, reason: str) -> None:
+        if self._stopping.is_set():
+            logger.warning("Shutdown already in progress, still draining.")
+            return
+        logger.info(f"Shutting down ({reason}).")
+        self._stopping.set()
+
+    async def reload(self) -> None:
+        """SIGHUP: save, reload trusted devices from the store, re-detect the network."""
+        loop = asyncio.get_running_loop()
+        logger.info("Reloading (SIGHUP).")
+        await self.persist()
+
+        registry = await loop.run_in_executor(self._persist_pool, scan.load_known_devices)
+        if registry:
+            self.registry = registry
+            for monitor in self.monitors:
+                monitor.mark_seen(registry.macs())
+        else:
+            logger.warning("Device store is empty or unreadable, keeping the current trusted devices.")
+
+        oui_lookup.set_table_path(scan.OUI_TABLE or oui_lookup.DEFAULT_TABLE)
+
+        old = RouterDetector.get_context()
+        context = await loop.run_in_executor(None, RouterDetector.get_context, True)
+        if context != old:
+            await loop.run_in_executor(None, self.retarget, context)
+        scan.emit_event("daemon_reloaded", devices=len(self.registry))
+
+    def _install_signal_handlers(self, loop) -> None:
+        handlers = {signal.SIGTERM: lambda: self.request_stop("SIGTERM"),
+                    signal.SIGINT: lambda: self.request_stop("SIGINT")}
+        if hasattr(signal, "SIGHUP"):
+            handlers[signal.SIGHUP] = lambda: self._spawn(self.reload())
+
+        for signum, handler in handlers.items():
+            try:
+                loop.add_signal_handler(signum, handler)
+            except (NotImplementedError, RuntimeError):
+                # Windows: loop signal handlers nahi hote, normal handler se loop me bhejo.
+                signal.signal(signum, lambda *_args, handler=handler: loop.call_soon_threadsafe(handler))
+
+    def _spawn(self, coroutine) -> None:
+        task = asyncio.ensure_future(coroutine)
+        task.add_done_callback(self._task_done)
+
+    @staticmethod
+    def _task_done(task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Daemon task failed.", exc_info=task.exception())
+
+    # ------------------------- Lifecycle -------------------------
+
+    async def run(self) -> int:
+        """
+        Starts every task and runs until a shutdown signal (or a crashed scan thread).
+
+        Returns:
+            int: Exit status, 0 after a graceful shutdown
+        """
+        loop = asyncio.get_running_loop()
+        self._loop = loop
+        self._loop_thread = threading.get_ident()
+        self._stopping = asyncio.Event()
+        self._sightings = asyncio.Queue(self.queue_size)
+        self._scan_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cerberus-scan")
+        self._persist_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cerberus-persist")
+
+        scan.DELTA_ENGINE = DeltaEngine(scan.MISS_TOLERANCE)
+        scan.BINDING_TRACKER = BindingTracker(scan.gateway_pins(self.registry, RouterDetector.get_context().router_ip),
+                                              on_alert=scan.report_binding_alert,
+                                              conflict_window=scan.CONFLICT_WINDOW,
+                                              rebind_window=scan.REBIND_WINDOW, rebind_limit=scan.REBIND_LIMIT)
+
+        # Ab se har emit_event daemon ki queues me jayega, file sink bhi unme se ek hai.
+        self._file_sink = cerberus_logger.set_event_sink(self)
+        if self._file_sink is not None and "events" not in self.sinks:
+            self.add_sink("events", self._write_events)
+        for spec in self.sinks.values():
+            spec.queue = asyncio.Queue(spec.queue_size)
+            spec.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"cerberus-sink-{spec.name}")
+            spec.task = loop.create_task(self._sink_loop(spec))
+
+        self._tasks = [loop.create_task(self._check_loop()),
+                       loop.create_task(self._persist_loop()),
+                       loop.create_task(self._metrics_loop())]
+        self._install_signal_handlers(loop)
+
+        logger.info("Cerberus is watching.")
+        logger.info(f"Daemon started with {len(self.registry)} known devices (pid {os.getpid()}).")
+
+        self.monitors = self._start_monitors()
+        self.ndp = self._start_ndp()
+
+        sweep_budget = scan.segment_host_count()
+        self.scheduler.add_tier("sweep", self.full_sweep, deadline=scan.SCAN_INTERVAL, budget=sweep_budget,
+                                run_now=True)
+        self.scheduler.add_tier("probe", self.probe_live_hosts, deadline=scan.PROBE_INTERVAL,
+                                budget=scan.PROBE_BUDGET)
+        self.scheduler.add_tier("event", self.full_sweep, deadline=None, budget=sweep_budget,
+                                min_gap=scan.EVENT_MIN_GAP)
+        self.scheduler.add_tier("ndp", self.probe_ipv6, deadline=scan.PROBE_INTERVAL, budget=scan.PROBE_BUDGET,
+                                run_now=True)
+        self._scan_future = loop.run_in_executor(self._scan_pool, self.scheduler.run_forever)
+
+        if scan.NETWORK_WATCH:
+            self.watcher = NetworkWatcher(self._on_network_change)
+            try:
+                self.watcher.start()
+            except OSError as e:
+                logger.warning(f"Network change detection unavailable ({e}), scan targets stay fixed.")
+                self.watcher = None
+
+        status = 0
+        stop_waiter = loop.create_task(self._stopping.wait())
+        await asyncio.wait({stop_waiter, self._scan_future}, return_when=asyncio.FIRST_COMPLETED)
+        if self._scan_future.done() and not self._stopping.is_set():
+            logger.error("Scan thread exited unexpectedly.", exc_info=self._scan_future.exception())
+            status = 1
+        stop_waiter.cancel()
+
+        await self._drain()
+        return status
+
+    async def _drain(self) -> None:
+        """Stops the producers first, then empties the queues in order, then saves."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.drain_timeout
+
+        async def settle(awaitable, what):
+            try:
+                await asyncio.wait_for(asyncio.shield(awaitable), max(deadline - loop.time(), 0.0))
+            except asyncio.TimeoutError:
+                logger.warning(f"Drain timeout: gave up waiting for {what}.")
+            except Exception as e:
+                logger.error(f"Error while waiting for {what}: {e}.")
+
+        # 1. Naye sightings band: scheduler (current tier finishes), watcher, passive listeners.
+        self.scheduler.stop()
+        listeners = ([self.watcher] if self.watcher is not None else []) + self.monitors + self.ndp
+        await settle(loop.run_in_executor(None, lambda: [listener.stop() for listener in listeners]),
+                     "listeners")
+        await settle(self._scan_future, "the running scan")
+
+        # 2. Jo sightings queue me hai unka check, phir har sink ka backlog.
+        await settle(self._sightings.join(), "pending sightings")
+        # Sinks ek saath drain, ek slow sink baaki sabka time na kha jaye.
+        await asyncio.gather(*(settle(spec.queue.join(), f"event sink '{spec.name}'")
+                               for spec in self.sinks.values()))
+
+        for task in self._tasks + [spec.task for spec in self.sinks.values()]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *(spec.task for spec in self.sinks.values()), return_exceptions=True)
+
+        # 3. Aakhri save, aur emit_event wapas seedha file sink pe.
+        await self.persist()
+        cerberus_logger.set_event_sink(self._file_sink)
+
+        for spec in self.sinks.values():
+            spec.pool.shutdown(wait=False)
+        self._scan_pool.shutdown(wait=False)
+        self._persist_pool.shutdown(wait=True)
+
+        logger.info(f"Scan tiers: {self.scheduler.stats()}")
+        logger.info("Daemon drained: %s.", ", ".join(f"{spec.name}={spec.delivered} events"
+                                                     for spec in self.sinks.values()) or "no sinks")
+
+# ========================= Entry Point =========================
+
+def write_pidfile(path: str) -> None:
+    """Writes the pid file, refusing to start over a live daemon."""
+    try:
+        with open(path, "r") as f:
+            pid = int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        pid = 0
+
+    if pid and pid != os.getpid():
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            pid = 0    # Stale pid file, pichla run crash hua tha
+        except OSError:
+            pass
+        if pid:
+            raise RuntimeError(f"Cerberus is already running (pid {pid}, {path}).")
+
+    with open(path, "w") as f:
+        f.write(f"{os.getpid()}\n")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run Cerberus as a daemon (SIGTERM: stop, SIGHUP: reload).")
+    parser.add_argument("--pidfile", help="Write the daemon pid here (eg, /run/cerberus.pid)")
+    parser.add_argument("--queue-size", type=int, default=1024, help="Max sighting batches waiting to be checked")
+    parser.add_argument("--event-queue-size", type=int, default=4096, help="Max events waiting per sink")
+    parser.add_argument("--persist-interval", type=float, default=30.0,
+                        help="Seconds between saves of changed devices")
+    parser.add_argument("--drain-timeout", type=float, default=10.0, help="Max seconds to drain on shutdown")
+    args = parser.parse_args(argv)
+
+    logger.info("=" * 50)
+    logger.info("PROJECT CERBERUS: The Network Sentinel (daemon)")
+    logger.info("=" * 50)
+
+    if not scan.check_npcap_requirement():
+        logger.info("Exiting due to Npcap requirement not met.")
+        return 0
+
+    if args.pidfile:
+        try:
+            write_pidfile(args.pidfile)
+        except (OSError, RuntimeError) as e:
+            logger.critical(f"{e}")
+            return 1
+
+    try:
+        if scan.detect_network() is None:
+            return 1
+
+        registry = scan.load_or_learn()
+        if not registry:
+            return 1
+
+        daemon = CerberusDaemon(registry, queue_size=args.queue_size, event_queue_size=args.event_queue_size,
+                                persist_interval=args.persist_interval, drain_timeout=args.drain_timeout)
+        return asyncio.run(daemon.run())
+
+    except Exception:
+        logger.exception("Fatal error.")
+        return 1
+    finally:
+        if args.pidfile:
+            try:
+                os.remove(args.pidfile)
+            except OSError:
+                pass
+        scan.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
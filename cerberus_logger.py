@@ -1,19 +1,327 @@
 """
 Logging setup Module to make and look the code clean.
 
+Besides the human readable log, it can also write a structured event stream: one
+compact JSON object per line (scan_started, device_joined, device_left, ip_changed,
+mac_moved, intruder, scan_completed ...) so SIEM / downstream tools can ingest
+detections without regex parsing.
+
+In queue mode the code which logs only puts the record on an in-memory queue
+(QueueHandler), and a background listener thread formats and writes records in
+batches, with size/time rotation and gzip compressed archives. So the scan loop
+never waits on disk or console I/O.
+
 Usage:
     import cerberus_logger
 
     logger = cerberus_logger.setup_logging()
+    logger = cerberus_logger.setup_logging(queue_mode=True)
+
+    cerberus_logger.setup_event_stream("cerberus_events.jsonl")
+    cerberus_logger.emit_event("intruder", ip="192.168.1.105", mac="aa:bb:cc:dd:ee:ff")
 """
 
+import atexit
+import gzip
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import shutil
 import sys
+import threading
+import time
+
+# ========================= Batched Handlers =========================
+
+class BatchWriteMixin:
+    """
+    Lets a stream handler write a whole batch of records with a single write + flush,
+    instead of one write and one flush per record.
+    """
+
+    def emit_batch(self, records):
+        records = [record for record in records if record.levelno >= self.level and self.filter(record)]
+        if not records:
+            return
+
+        try:
+            self.acquire()
+            try:
+                if hasattr(self, "shouldRollover") and self.shouldRollover(records[0]):
+                    self.doRollover()
+                if self.stream is None and hasattr(self, "_open"):
+                    self.stream = self._open()
+
+                lines = [self.format(record) + self.terminator for record in records]
+                max_bytes = getattr(self, "maxBytes", 0)
+                if not max_bytes:
+                    self.stream.write("".join(lines))
+                else:
+                    # Size limit har record pe check karo, warna ek bada batch file ko max_bytes se kaafi aage le jaata.
+                    position = self.stream.tell()
+                    pending = []
+                    for line in lines:
+                        if pending and position + len(line) >= max_bytes:
+                            self.stream.write("".join(pending))
+                            pending = []
+                            self.doRollover()
+                            if self.stream is None:
+                                self.stream = self._open()
+                            position = self.stream.tell()
+                        pending.append(line)
+                        position += len(line)
+                    self.stream.write("".join(pending))
+                self.flush()
+            finally:
+                self.release()
+        except Exception:
+            self.handleError(records[0])
+
+
+class BatchStreamHandler(BatchWriteMixin, logging.StreamHandler):
+    """Console handler with batched writes."""
+
+
+class CompressedRotatingFileHandler(BatchWriteMixin, logging.handlers.RotatingFileHandler):
+    """
+    Rotates when the file gets bigger than max_bytes OR older than rotate_seconds,
+    and gzips the rotated files (cerberus.log.1.gz, cerberus.log.2.gz ...).
+    """
+
+    def __init__(self, filename, max_bytes=10 * 1024 * 1024, backup_count=5, rotate_seconds=86400,
+                 encoding="utf-8"):
+        super().__init__(filename, mode="a", maxBytes=max_bytes, backupCount=backup_count, encoding=encoding)
+        self.rotate_seconds = rotate_seconds
+        self.rollover_at = time.time() + rotate_seconds if rotate_seconds else None
+
+    def namer(self, default_name):
+        return default_name + ".gz"
+
+    def rotator(self, source, dest):
+        # Compression listener thread me hota hai, scan loop pe koi asar nahi.
+        with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.remove(source)
+
+    def shouldRollover(self, record):
+        if super().shouldRollover(record):
+            return True
+        return self.rollover_at is not None and self.backupCount > 0 and time.time() >= self.rollover_at
+
+    def doRollover(self):
+        super().doRollover()
+        if self.rotate_seconds:
+            self.rollover_at = time.time() + self.rotate_seconds
+
+# ========================= Queue Plumbing =========================
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler which does NOT format the message in the calling thread.
+    The stock prepare() merges args into the message right away - we leave that to the
+    listener, so a log call in the hot path costs only a queue put.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class BatchingQueueListener:
+    """
+    Background thread which drains the log queue in batches and hands each batch
+    to every handler (one write per handler per batch).
+    """
+
+    _SENTINEL = None
+
+    def __init__(self, log_queue, handlers, batch_size=256):
+        self.queue = log_queue
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="cerberus-log", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self.queue.put_nowait(self._SENTINEL)
+        self._thread.join()
+        self._thread = None
+        for handler in self.handlers:
+            handler.close()
+
+    def _handle(self, batch):
+        for handler in self.handlers:
+            if isinstance(handler, BatchWriteMixin):
+                handler.emit_batch(batch)
+            else:
+                for record in batch:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            # Jitne records abhi queue me pade hai sab ek saath utha lo.
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = self._SENTINEL in batch
+            batch = [record for record in batch if record is not self._SENTINEL]
+            if batch:
+                self._handle(batch)
+            if stop:
+                return
+
+
+_listener = None
+
+
+def stop_logging():
+    """Flushes everything still in the log queue and stops the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+# ========================= Structured Event Stream =========================
+
+class EventSink:
+    """
+    JSON-lines event writer. emit() only appends to an in-memory buffer; encoding and the
+    actual write happen on flush, which runs when the buffer is full or from a small
+    background thread every flush_interval seconds. Rotation + compression is the same
+    as the human log.
+    """
+
+    def __init__(self, path="cerberus_events.jsonl", max_bytes=50 * 1024 * 1024, backup_count=5,
+                 rotate_seconds=86400, buffer_events=512, flush_interval=1.0):
+        self._file = CompressedRotatingFileHandler(
+            path,
+            max_bytes=max_bytes,
+            backup_count=backup_count,
+            rotate_seconds=rotate_seconds
+        )
+        self.path = path
+        self.buffer_events = buffer_events
+        self.flush_interval = flush_interval
+
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name="cerberus-events", daemon=True)
+        self._flusher.start()
+
+    def emit(self, event, **fields):
+        """Queues one event. A "ts" (unix time) and the "event" name are added automatically."""
+        record = {"ts": round(time.time(), 3), "event": event}
+        record.update(fields)
+
+        with self._lock:
+            self._buffer.append(record)
+            full = len(self._buffer) >= self.buffer_events
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            records, self._buffer = self._buffer, []
+        if not records:
+            return
+
+        text = "".join(json.dumps(record, separators=(",", ":"), default=str) + "\n" for record in records)
+        handler = self._file
+        handler.acquire()
+        try:
+            if handler.stream is None:
+                handler.stream = handler._open()
+            handler.stream.seek(0, 2)
+            too_big = handler.maxBytes > 0 and handler.stream.tell() + len(text) >= handler.maxBytes
+            too_old = handler.rollover_at is not None and time.time() >= handler.rollover_at
+            if (too_big or too_old) and handler.backupCount > 0:
+                handler.doRollover()
+            handler.stream.write(text)
+            handler.stream.flush()
+        finally:
+            handler.release()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logging.getLogger("cerberus").error(f"Event stream flush failed: {e}.")
+
+    def close(self):
+        self._stop.set()
+        self._flusher.join()
+        self.flush()
+        self._file.close()
+
+
+_event_sink = None
+
+
+def setup_event_stream(path="cerberus_events.jsonl", **kwargs):
+    """
+    Starts the structured JSON-lines event stream. Keyword arguments go to EventSink.
+
+    Returns:
+        EventSink: The sink, also used by emit_event()
+    """
+    global _event_sink
+    stop_event_stream()
+    _event_sink = EventSink(path, **kwargs)
+    atexit.register(stop_event_stream)
+    return _event_sink
+
+
+def get_event_sink():
+    """The sink emit_event() currently writes to (None when the event stream is off)."""
+    return _event_sink
+
+
+def set_event_sink(sink):
+    """
+    Routes emit_event() to another sink, anything with emit(event, **fields) - eg, the
+    daemon's queue in front of the real EventSink. Returns the previous sink.
+    """
+    global _event_sink
+    previous, _event_sink = _event_sink, sink
+    return previous
+
+
+def emit_event(event, **fields):
+    """Writes one structured event. Does nothing when the event stream is not set up."""
+    sink = _event_sink
+    if sink is not None:
+        sink.emit(event, **fields)
+
+
+def stop_event_stream():
+    global _event_sink
+    if _event_sink is not None:
+        _event_sink.close()
+        _event_sink = None
+
+# ========================= Setup =========================
 
 def setup_logging(
         log_file = "cerberus.log",
         level = "INFO",
-        silent_mode = False
+        silent_mode = False,
+        queue_mode = False,
+        max_bytes = 10 * 1024 * 1024,
+        backup_count = 5,
+        rotate_seconds = 86400
 ):
     """
     Docstring for setup_logging
@@ -22,8 +330,18 @@ def setup_logging(
         log_file: Name of the log file
         level: Log level (DEBUG, INFO, WARNING, ERROR, CRITICAL) ...niche mention karunga hi me
         silent_mode: if TRUE, dont show logs in the console, aur false me ye console/terminal pe logs dikhayega
+        queue_mode: if TRUE, log calls only enqueue the record and a background thread does the
+                    formatting and batched writing, with rotation and compressed archives
+        max_bytes: (queue mode) rotate the log file when it grows past this size
+        backup_count: (queue mode) number of compressed archives to keep
+        rotate_seconds: (queue mode) also rotate when the file is older than this, 0 to disable
     """
 
+    # Worker processes (sharded sweeps) re-import the main script; the log file belongs to the parent.
+    multiprocessing = sys.modules.get("multiprocessing")
+    if multiprocessing is not None and multiprocessing.parent_process() is not None:
+        return logging.getLogger("cerberus")
+
     level_map = {
         "DEBUG" : logging.DEBUG,
         "INFO" : logging.INFO,
@@ -42,28 +360,49 @@ def setup_logging(
     handlers = []
 
     # File handler (always log to file)
-    file_handler = logging.FileHandler(
-        log_file,
-        mode="a", # Append mode
-        encoding = "utf-8"
-    )
+    if queue_mode:
+        file_handler = CompressedRotatingFileHandler(
+            log_file,
+            max_bytes=max_bytes,
+            backup_count=backup_count,
+            rotate_seconds=rotate_seconds
+        )
+    else:
+        file_handler = logging.FileHandler(
+            log_file,
+            mode="a", # Append mode
+            encoding = "utf-8"
+        )
     file_handler.setFormatter(formatter)
     handlers.append(file_handler)
 
     # Console handler
     if not silent_mode:
-        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler = BatchStreamHandler(sys.stdout) if queue_mode else logging.StreamHandler(sys.stdout)
         console_handler.setFormatter(formatter)
         handlers.append(console_handler)
 
+    if queue_mode:
+        global _listener
+        stop_logging()
+
+        # Unbounded queue: put kabhi block nahi karega, disk slow ho toh bhi scan nahi rukega.
+        log_queue = queue.SimpleQueue()
+        _listener = BatchingQueueListener(log_queue, handlers)
+        _listener.start()
+        atexit.register(stop_logging)
+
+        handlers = [LazyQueueHandler(log_queue)]
+
     # configure root logger
     logging.basicConfig(
         level=log_level,
-        handlers=handlers
+        handlers=handlers,
+        force=queue_mode
     )
 
     logger = logging.getLogger("cerberus")
-    logger.info(f"Logging initialized. Level: {level}, File: {log_file}")
+    logger.info("Logging initialized. Level: %s, File: %s, Queue mode: %s", level, log_file, queue_mode)
 
     return logger
 
@@ -1,85 +1,398 @@
-from scapy.all import ARP, Ether, srp, IP, ICMP, send
 import time
-import json
+import sqlite3
 import cerberus_logger
-from router_detector import RouterDetector
-from npcap_installer import handle_npcap_installation
+import cerberus_metrics as metrics
+from router_detector import NetworkWatcher, RouterDetector
+from arp_sweeper import ArpSweeper, network_host_range
+import sharded_sweep
+from sharded_sweep import ShardedSweeper
+from passive_monitor import PassiveMonitor
+from ndp_discovery import NdpDiscovery
+from scan_scheduler import ScanScheduler
+from device_registry import DeviceRegistry
+from device_store import open_store
+from wakeup_stage import WakeupStage
+from delta_engine import DeltaEngine
+from binding_tracker import BindingTracker
+from alert_dispatcher import AlertDispatcher, SmtpSink, SyslogSink, WebhookSink
+import oui_lookup
+from presence_history import PresenceHistory
+import ipaddress
+import logging
 import platform
+import socket
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
-# Import npcap installer for Windows compatibility
-try:
-    NPCAP_INSTALLER_AVAILABLE = True
-except ImportError:
-    NPCAP_INSTALLER_AVAILABLE = False
-    print("⚠️ Warning: npcap_installer module not found. Windows users may need to install Npcap manually.")
+# Heavy / platform specific modules are imported on first use, not here:
+#   - scapy: only when the raw-socket sweep is unavailable (see load_scapy_arp)
+#   - npcap_installer: only on Windows (see check_npcap_requirement)
+#   - fleet (and asyncio with it): only when FLEET_COLLECTOR is set (see start_fleet_reporter)
+_SCAPY_ARP = None
 
 # CONFIGURATION
-KNOWN_DEVICES_FILE = "known_devices.json"
+KNOWN_DEVICES_DB = "cerberus_devices.db"
+KNOWN_DEVICES_FILE = "known_devices.json"    # Legacy whitelist, imported once into the DB
+DEVICE_STORE = None
+DELTA_ENGINE = None    # Scan-to-scan delta tracking, created by surveillance_mode()
+BINDING_TRACKER = None    # IP<->MAC consistency (ARP spoofing) checks, created by surveillance_mode()
+EVENT_STREAM_FILE = "cerberus_events.jsonl"    # Structured JSON-lines events for SIEM, None to disable
+METRICS_PORT = None    # eg, 9477 to serve Prometheus metrics on http://127.0.0.1:9477/metrics
 TARGET_NETWORK = None    
-SCAN_INTERVAL = 60
+SCAN_INTERFACE = None
+SCAN_SEGMENTS = []    # Every IPv4 segment to watch, filled by main() (LAN, IoT VLAN, guest...)
+SCAN_INTERVAL = 300    # Full-range sweep deadline (seconds)
+PROBE_INTERVAL = 15    # Targeted probe of live hosts (seconds)
+PROBE_BUDGET = 256     # Max hosts re-probed per probe run
+PROBE_TIMEOUT = 0.5
+EVENT_MIN_GAP = 10     # Min seconds between event-triggered sweeps
+ARP_TIMEOUT = 3    # Upper bound only, a sweep ends as soon as replies stop (RTT estimate)
+ARP_MIN_QUIET = 0.02    # Floor (seconds) of that RTT based receive window, raise it for Wi-Fi segments with late dozers
+SWEEP_WORKERS = None    # Processes per large sweep: None = one per core (ranges of 2048+ hosts), 1 = never shard
+SWEEP_RATE = 5000    # Max ARP requests/s of one segment sweep (split across the workers), None = no cap
+SWEEP_BURST = 512    # Requests sent back to back before SWEEP_RATE applies (a /24 goes out at once)
+RETRY_ATTEMPTS = 2    # Unicast ARP retries for known hosts which missed a full sweep, 0 = off
+RETRY_BACKOFF = 0.05    # Seconds before the first retry, doubled before every next one
+RETRY_BUDGET = 256    # Max known hosts retried per segment and sweep
+OUI_TABLE = None    # Compiled OUI vendor table (python oui_lookup.py compile ...), None = oui.bin next to the scripts
+MISS_TOLERANCE = 2     # Consecutive missed scans before a device is reported as left
+CONFLICT_WINDOW = 5    # Two MACs on one IP within this many seconds = duplicate IP
+REBIND_WINDOW = 60     # An IP changing MAC more than REBIND_LIMIT times in this window = rapid rebind
+REBIND_LIMIT = 3
+PASSIVE_MONITOR = True
+IPV6_DISCOVERY = True    # Multicast echo + NDP/RA/DAD capture for IPv6 hosts (Linux)
+NDP_TIMEOUT = 2
+NETWORK_WATCH = True    # Follow DHCP renumbering / Wi-Fi roams via rtnetlink (Linux)
+ALERT_WEBHOOK_URL = None    # eg, "http://127.0.0.1:8080/cerberus" - alert batches are POSTed as JSON
+ALERT_SYSLOG = None    # "/dev/log" (local syslog) or "host:514" (UDP)
+ALERT_SMTP = None    # eg, {"recipients": ["admin@example.com"], "host": "localhost", "port": 25}
+ALERT_WINDOW = 5    # Seconds alerts are collected into one batch per sink
+ALERT_DEDUPE = 900    # The same alert for the same MAC is sent at most once per this many seconds
+ALERT_DISPATCHER = None
+PRESENCE_HISTORY_DIR = "cerberus_history"    # Per-device presence timeline (python presence_history.py mac ...), None to disable
+PRESENCE_SLOT = 60    # Seconds per presence slot, older data is downsampled to 15 minutes / 1 hour
+PRESENCE_RETENTION = 365    # Days of presence history kept
+PRESENCE_HISTORY = None
+FLEET_COLLECTOR = None    # eg, "collector.example.com:9478" - report sightings/alerts/scan stats to a central collector
+FLEET_SENTINEL_ID = None    # Name of this sentinel in the fleet inventory, None = hostname
+FLEET_SITE = None    # Free-form site name shown by the collector
+FLEET_TOKEN = None    # Shared secret, must match the collector's --token
+FLEET_SPOOL = "cerberus_fleet.spool"    # Batches are kept here while the collector is down
+FLEET_REPORTER = None
 
 # This line is for logging module.
-logger = cerberus_logger.setup_logging()
+# Queue mode: log calls only enqueue, a background thread does the disk/console writes.
+logger = cerberus_logger.setup_logging(queue_mode=True)
+
+def emit_event(event, **fields):
+    """Writes one structured event, and hands the alert-worthy ones to the alert dispatcher."""
+    cerberus_logger.emit_event(event, **fields)
+    dispatcher = ALERT_DISPATCHER
+    if dispatcher is not None:
+        dispatcher.emit(event, **fields)
+    reporter = FLEET_REPORTER
+    if reporter is not None:
+        reporter.emit(event, **fields)
+
+# Hot-path metrics, served in Prometheus format when METRICS_PORT is set.
+ARP_REQUESTS = metrics.counter("cerberus_arp_requests_total", "ARP requests sent.")
+ARP_REPLIES = metrics.counter("cerberus_arp_replies_total", "ARP replies received.")
+ARP_UNANSWERED = metrics.counter("cerberus_arp_unanswered_total", "ARP requests which got no reply.")
+ARP_RECOVERED = metrics.counter("cerberus_arp_recovered_total", "Known hosts which missed a sweep but answered a retry.")
+ARP_SRTT = metrics.gauge("cerberus_arp_srtt_seconds", "Smoothed ARP reply round trip time.")
+INTRUDERS = metrics.counter("cerberus_intruders_total", "Unknown devices reported.")
+NDP_SIGHTINGS = metrics.counter("cerberus_ndp_sightings_total", "New IPv6 address/MAC pairs seen.")
+BINDING_ALERTS = metrics.counter("cerberus_binding_alerts_total", "ARP spoofing / IP conflict alerts.")
+TRANSITIONS = metrics.counter("cerberus_transitions_total", "Device transitions (joined/left/ip_changed/mac_moved).")
+DEVICES_FOUND = metrics.gauge("cerberus_devices_found", "Devices found by the last full sweep.")
+
+def get_device_store():
+    """Opens the SQLite device store once, importing the old known_devices.json if the store is empty."""
+    global DEVICE_STORE
+    if DEVICE_STORE is None:
+        DEVICE_STORE = open_store(KNOWN_DEVICES_DB, legacy_json=KNOWN_DEVICES_FILE)
+    return DEVICE_STORE
 
 def load_known_devices():
-    """It loads the list of trusted MAC addresses from a file."""
+    """It loads the trusted MAC addresses from the device store into an indexed DeviceRegistry."""
     try:
-        with open(KNOWN_DEVICES_FILE, 'r') as f:
-            devices = json.load(f)
+        devices = get_device_store().load_registry()
+    except sqlite3.Error as e:
+        logger.error(f"Error reading device store: {e}")
+        return DeviceRegistry()
+
+    if not devices:
+        logger.warning("No known devices found. Starting learning mode.")
+    else:
         logger.info(f"Loaded {len(devices)} known devices.")
-        return devices
-    except FileNotFoundError:
-        logger.warning("No known devices file found. Starting learning mode.")
-        return []
-    except json.JSONDecodeError as e:
-        logger.error(f"Error reading devices file: {e}")
-        return []
+    return devices
 
 def save_known_devices(devices):
-    """Saves the list of trusted MAC addresses to a file."""
+    """
+    Saves only the devices changed since the last save, as one batched upsert.
+    Cost is O(changes), not O(all devices), and a crash mid-write can not lose the whitelist.
+    """
     try:
-        with open(KNOWN_DEVICES_FILE, 'w') as f:
-            json.dump(devices, f, indent=4)
-        logger.info(f"Saved {len(devices)} devices.")
+        with metrics.span("persist"):
+            saved = get_device_store().upsert(devices.pop_dirty())
+        logger.info(f"Saved {saved} changed devices ({len(devices)} known).")
     except Exception as e:
         logger.error(f"Failed to save devices: {e}.")
 
-def scan_network():
-    """Isme wakeup call add kiya hai matlab ping karega har device ko pehle."""
-    logger.info(f"Scanning {TARGET_NETWORK}")
+def known_hosts(registry, live_devices=None):
+    """
+    {ip: mac} of every host we expect on the network: the last IP of each registry record,
+    overridden by the devices of the latest sweep (they are more recent).
+    """
+    hosts = {record.last_ip: record.mac_str for record in registry if record.last_ip}
+    for ip, device in (live_devices or {}).items():
+        hosts[ip] = device["mac"]
+    return hosts
+
+class ScanError(Exception):
+    """A segment could not be scanned (interface down, socket error...)."""
+
+def scan_network(known_ips=(), failed=None):
+    """
+    Scans every configured segment at the same time (one worker per interface/segment),
+    so the total scan time is the slowest segment's time, not the sum of all of them.
+
+    Args:
+        known_ips: Previously seen IPs, they get a unicast wake-up echo as well. Given as
+                   {ip: mac} (see known_hosts), the ones missing from the sweep are retried.
+        failed: Optional list, the CIDR of every segment whose scan failed is appended to it.
+
+    Returns:
+        list: Merged inventory, every device tagged with its "segment" and "interface".
+    """
+    segments = SCAN_SEGMENTS or [{"interface": SCAN_INTERFACE, "cidr": TARGET_NETWORK}]
+    known_ips = dict(known_ips) if isinstance(known_ips, dict) else dict.fromkeys(known_ips)
+
+    def scan(segment):
+        try:
+            return scan_segment(segment["cidr"], segment["interface"], known_ips)
+        except ScanError as e:
+            logger.error(str(e))
+            if failed is not None:
+                failed.append(segment["cidr"])
+            return []
+
+    if len(segments) == 1:
+        return scan(segments[0])
+
+    clients = []
+    with ThreadPoolExecutor(max_workers=len(segments), thread_name_prefix="cerberus-scan") as pool:
+        for result in pool.map(scan, segments):
+            clients.extend(result)
+
+    logger.info("Found %d devices across %d segments.", len(clients), len(segments))
+    return clients
+
+def scan_segment(network, interface, known_ips=()):
+    """
+    Isme wakeup call add kiya hai matlab ping karega har device ko pehle.
+    The wake-up runs as a pipeline stage alongside the ARP transmit, so there is no dead time
+    before the sweep - late wakers still answer inside the ARP receive window.
+    """
+    logger.info("Scanning %s on %s", network, interface)
     
+    wakeup = None
     try:
-        broadcast_ip = '.'.join(TARGET_NETWORK.split('/')[0].split('.')[:3]) + '.255'
-        send(IP(dst=broadcast_ip)/ICMP(), verbose=0)
-        logger.debug("Sent wake-up broadcast ping to all devices.")
-        time.sleep(1)
+        wakeup = WakeupStage.for_interface(interface)
+        wakeup.start(network, known_ips)
     except Exception as e:
         logger.debug(f"Wake-up call failed (non-critical): {e}.")
 
     try:
-        # ARP Scan rahega hi taki scapy sabko packet bhej sake. 
-        arp_request = ARP(pdst=TARGET_NETWORK)
-        ether_frame = Ether(dst="ff:ff:ff:ff:ff:ff")
-        packet = ether_frame / arp_request
-
-        answered_list = srp(packet, timeout=3, verbose=0)[0]
-        
         clients = []
-        for sent, received in answered_list:
-            clients.append({"ip": received.psrc, "mac": received.hwsrc})
+        for ip, mac in arp_sweep(network, interface):
+            clients.append({"ip": ip, "mac": mac, "segment": network, "interface": interface})
+        
+        if wakeup is not None:
+            logger.debug("Sent %d wake-up pings (broadcast + known IPs).", wakeup.join())
+            metrics.observe_stage("wakeup", wakeup.last_seconds, segment=network)
+
+        # Scan complete declare karne se pehle, jo known hosts reply miss kar gaye unko ek aur mauka.
+        missing = missing_hosts(network, known_ips, clients)
+        if missing:
+            for ip, mac in arp_retry(network, interface, missing):
+                clients.append({"ip": ip, "mac": mac, "segment": network, "interface": interface,
+                                "source": "retry"})
         
-        logger.info(f"Found {len(clients)} devices.")
+        logger.info("Found %d devices on %s.", len(clients), network)
 
-        # Har device jo mila hai use log karega ye
-        for device in clients:
-            logger.debug(f" Device: {device['ip']} -> {device['mac']}")
+        # Har device jo mila hai use log karega ye - sirf jab DEBUG on ho, warna ye loop bhi nahi chalega.
+        if logger.isEnabledFor(logging.DEBUG):
+            for device in clients:
+                logger.debug(" Device: %s -> %s", device['ip'], device['mac'])
 
         return clients
         
     except Exception as e:
-        logger.error(f"Scan failed: {e}.")
-        return []
+        raise ScanError(f"Scan of {network} failed: {e}.") from e
+
+    finally:
+        if wakeup is not None:
+            wakeup.close()
+
+def sweep_scope(failed):
+    """
+    Delta engine scope of a full sweep: None when every segment was scanned, else only the
+    tracked MACs on the segments that completed - a segment which failed says nothing about
+    who left it.
+    """
+    if not failed:
+        return None
+    if DELTA_ENGINE is None:
+        return ()
+    segments = SCAN_SEGMENTS or [{"cidr": TARGET_NETWORK}]
+    completed = [ipaddress.ip_network(segment["cidr"], strict=False)
+                 for segment in segments if segment["cidr"] not in failed]
+    return DELTA_ENGINE.macs_in(completed)
+
+def arp_sweep(network, interface, targets=None, timeout=None):
+    """
+    Yields (ip, mac) for every device on `network` (or only `targets`) that answers an ARP request.
+    Uses the raw-socket sweep engine where AF_PACKET exists (Linux), scapy srp everywhere else.
+    """
+    if timeout is None:
+        timeout = ARP_TIMEOUT
+
+    if interface and hasattr(socket, "AF_PACKET"):
+        try:
+            sweeper = make_sweeper(network, interface, targets, timeout)
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f"Raw-socket sweep unavailable ({e}), falling back to scapy.")
+        else:
+            try:
+                yield from sweeper.sweep(targets)
+            finally:
+                sweeper.close()
+                record_sweep_stats(sweeper.last_stats, network, "sweep" if targets is None else "probe")
+            return
+
+    ARP, Ether, srp = load_scapy_arp()
+
+    # ARP Scan rahega hi taki scapy sabko packet bhej sake. 
+    arp_request = ARP(pdst=list(targets) if targets is not None else network)
+    ether_frame = Ether(dst="ff:ff:ff:ff:ff:ff")
+    packet = ether_frame / arp_request
+
+    with metrics.span("arp_srp", segment=network):
+        answered_list = srp(packet, timeout=timeout, iface=interface, verbose=0)[0]
+    ARP_REPLIES.inc(len(answered_list), segment=network)
+    for sent, received in answered_list:
+        yield received.psrc, received.hwsrc
+
+def missing_hosts(network, known_ips, clients):
+    """
+    {ip: mac} of known hosts on `network` which did not answer the sweep, at most RETRY_BUDGET.
+    A MAC that answered from another IP is not missing (that is an IP change, not a miss).
+    """
+    if not RETRY_ATTEMPTS or not isinstance(known_ips, dict):
+        return {}    # Sirf IPs pata hai, MAC nahi - unicast retry nahi ho sakta
+
+    subnet = ipaddress.ip_network(network, strict=False)
+    found_ips = {device["ip"] for device in clients}
+    found_macs = {device["mac"] for device in clients}
+
+    missing = {}
+    for ip, mac in known_ips.items():
+        if mac is None or ip in found_ips or mac in found_macs:
+            continue
+        try:
+            if ipaddress.ip_address(ip) not in subnet:
+                continue
+        except ValueError:
+            continue
+        missing[ip] = mac
+        if len(missing) >= RETRY_BUDGET:
+            break
+    return missing
+
+def arp_retry(network, interface, hosts):
+    """
+    Yields (ip, mac) for every known host in `hosts` ({ip: last known mac}) which answers a
+    unicast ARP retry - RETRY_ATTEMPTS rounds with exponential back-off from RETRY_BACKOFF.
+    Cuts false "left" transitions from a single lost broadcast or reply.
+    """
+    recovered = 0
+    if interface and hasattr(socket, "AF_PACKET"):
+        try:
+            sweeper = ArpSweeper.for_interface(interface, network, timeout=PROBE_TIMEOUT, rate=SWEEP_RATE,
+                                               burst=SWEEP_BURST, min_quiet=ARP_MIN_QUIET)
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f"Raw-socket retry unavailable ({e}), falling back to scapy.")
+        else:
+            try:
+                for ip, mac in sweeper.retry(hosts, attempts=RETRY_ATTEMPTS, backoff=RETRY_BACKOFF):
+                    recovered += 1
+                    yield ip, mac
+            finally:
+                sweeper.close()
+                record_sweep_stats(sweeper.last_stats, network, "retry")
+                ARP_RECOVERED.inc(recovered, segment=network)
+                logger.info("Retry: %d/%d known hosts on %s answered.", recovered, len(hosts), network)
+            return
+
+    ARP, Ether, srp = load_scapy_arp()
+
+    remaining = dict(hosts)
+    for attempt in range(RETRY_ATTEMPTS):
+        if not remaining:
+            break
+        time.sleep(RETRY_BACKOFF * (2 ** attempt))
+        packets = [Ether(dst=mac) / ARP(pdst=ip) for ip, mac in remaining.items()]
+        answered_list = srp(packets, timeout=PROBE_TIMEOUT, iface=interface, verbose=0)[0]
+        ARP_REPLIES.inc(len(answered_list), segment=network, kind="retry")
+        for sent, received in answered_list:
+            if remaining.pop(received.psrc, None) is not None:
+                recovered += 1
+                yield received.psrc, received.hwsrc
+    ARP_RECOVERED.inc(recovered, segment=network)
+    logger.info("Retry: %d/%d known hosts on %s answered.", recovered, len(hosts), network)
+
+def make_sweeper(network, interface, targets, timeout):
+    """
+    Raw-socket sweeper for one segment. Full sweeps of big ranges (a flat /16 or /20) are
+    sharded across worker processes, everything else uses a single socket.
+    """
+    if targets is None and SWEEP_WORKERS != 1:
+        first, last = network_host_range(network)
+        workers = SWEEP_WORKERS or sharded_sweep.default_workers(last - first + 1)
+        if workers > 1:
+            return ShardedSweeper.for_interface(interface, network, workers=workers, rate=SWEEP_RATE,
+                                                burst=SWEEP_BURST, timeout=timeout, min_quiet=ARP_MIN_QUIET)
+    return ArpSweeper.for_interface(interface, network, timeout=timeout, rate=SWEEP_RATE, burst=SWEEP_BURST,
+                                    min_quiet=ARP_MIN_QUIET)
+
+def load_scapy_arp():
+    """
+    Imports the scapy ARP pieces on first use. Only the layers we need are loaded
+    (scapy.all pulls in every protocol and takes seconds), and the result is cached.
+
+    Returns:
+        Tuple: (ARP, Ether, srp)
+    """
+    global _SCAPY_ARP
+    if _SCAPY_ARP is None:
+        with metrics.span("import_scapy"):
+            from scapy.layers.l2 import ARP, Ether
+            from scapy.sendrecv import srp
+        _SCAPY_ARP = (ARP, Ether, srp)
+    return _SCAPY_ARP
+
+def record_sweep_stats(stats, network, kind):
+    """Feeds the numbers of one finished raw-socket sweep into the metrics registry."""
+    if not stats:
+        return
+    metrics.observe_stage("arp_transmit", stats["tx_seconds"], segment=network, kind=kind)
+    metrics.observe_stage("arp_receive", stats["rx_seconds"], segment=network, kind=kind)
+    ARP_REQUESTS.inc(stats["sent"], segment=network, kind=kind)
+    ARP_REPLIES.inc(stats["replies"], segment=network, kind=kind)
+    ARP_UNANSWERED.inc(max(stats["sent"] - stats["replies"], 0), segment=network, kind=kind)
+    if stats.get("srtt") is not None:
+        ARP_SRTT.set(stats["srtt"], segment=network)
 
 def learn_network_mode():
     """First-time setup: Learn all current devices as trusted."""
@@ -89,57 +402,405 @@ def learn_network_mode():
     
     if not current_devices:
         logger.error("No devices found!")
-        return []
+        return DeviceRegistry()
     
-    known_macs = [device["mac"] for device in current_devices]
-    save_known_devices(known_macs)
+    # IPv6-only devices bhi trusted list me aane chahiye, warna har baar intruder dikhenge.
+    current_devices.extend(discover_ipv6())
+
+    registry = DeviceRegistry()
+    now = time.time()
+    for device in current_devices:
+        registry.add(device["mac"], ip=device["ip"], seen=now)
+    save_known_devices(registry)
+    if PRESENCE_HISTORY is not None:
+        PRESENCE_HISTORY.record(current_devices, scanned=True)
+        save_presence()
     
-    logger.info(f"Learned {len(known_macs)} devices:")
+    logger.info(f"Learned {len(registry)} devices:")
     for device in current_devices:
-        logger.info(f"  {device["ip"]} -> {device["mac"]}")
+        logger.info(f"  {device['ip']} -> {device['mac']} ({oui_lookup.describe_mac(device['mac']) or 'Unknown vendor'})")
         logger.info("They are now trusted.")
     
-    return known_macs
+    return registry
+
+def check_devices(devices, registry, scope=()):
+    """
+    Compares discovered devices against the trusted registry (one bulk diff, O(1) per MAC)
+    and raises the intruder alert. Used by the active sweep, the probes and the passive listeners.
+
+    With the delta engine running (surveillance mode) only transitions are reported -
+    joined, left, IP changed, MAC moved - so a device is alerted on once, not every cycle.
+
+    Args:
+        scope: MACs these results were expected to contain, for leave detection.
+               None = full sweep, () = passive sighting (never counts a miss).
+
+    Returns:
+        list: The unknown devices.
+    """
+    with metrics.span("check"):
+        known_devices, unknown_devices = registry.diff(devices)
+
+    if BINDING_TRACKER is not None:
+        BINDING_TRACKER.observe_devices(devices)
+
+    if PRESENCE_HISTORY is not None:
+        PRESENCE_HISTORY.record(devices, scanned=scope is None)
+
+    if FLEET_REPORTER is not None:
+        FLEET_REPORTER.sighting(devices)
+
+    if DELTA_ENGINE is None:
+        # Learning mode / one-shot: no previous scan to compare with, report everything.
+        changes = [dict(device, event="joined") for device in devices]
+    else:
+        with metrics.span("delta"):
+            changes = DELTA_ENGINE.update(devices, scope=scope)
+
+    report_changes(changes, registry)
+    return unknown_devices
+
+def report_binding_alert(alert):
+    """Logs and emits one ARP spoofing / IP conflict alert from the binding tracker."""
+    BINDING_ALERTS.inc(alert=alert["alert"])
+    if alert["alert"] == "gateway_impersonation":
+        logger.critical("ALERT: Gateway %s answered from %s, expected %s - possible ARP spoofing!",
+                        alert['ip'], alert['mac'], alert['old_mac'])
+    elif alert["alert"] == "duplicate_ip":
+        logger.critical("ALERT: Duplicate IP %s claimed by %s and %s!", alert['ip'], alert['mac'], alert['old_mac'])
+    elif alert["alert"] == "rapid_rebind":
+        logger.critical("ALERT: %s changed MAC %d times in %ds (now %s)!",
+                        alert['ip'], alert['rebinds'], REBIND_WINDOW, alert['mac'])
+    else:
+        logger.critical("ALERT: %s claims %d IPs - possible ARP poisoning!", alert['mac'], alert['ips'])
+    when = event_time(alert.pop("capture_time", None))
+    emit_event(alert.pop("alert"), **when, **alert)
+
+def event_time(capture_time):
+    """
+    Timestamp fields for the event of a replayed sighting or alert (pcap_replay tags them
+    with "capture_time"): "ts" is when it happened in the capture, "replayed_ts" the wall
+    clock. Live ones get {} - the event stream stamps them itself.
+    """
+    if capture_time is None:
+        return {}
+    return {"ts": round(capture_time, 3), "replayed_ts": round(time.time(), 3)}
+
+def gateway_pins(registry, router_ip):
+    """{router_ip: trusted MAC} - pinned from the registry if we know it, else on first sighting."""
+    if not router_ip:
+        return {}
+    mac = next((record.mac_str for record in registry if record.last_ip == router_ip), None)
+    return {router_ip: mac}
+
+def report_changes(changes, registry):
+    """Logs and emits the delta transitions, and raises the alert for unknown devices among them."""
+    intruders = []
+    for change in changes:
+        event, ip, mac = change["event"], change.get("ip"), change["mac"]
+        known = mac in registry
+        vendor = change["vendor"] = oui_lookup.describe_mac(mac) or "Unknown vendor"
+        TRANSITIONS.inc(event=event)
+        extra = {key: change[key] for key in ("old_ip", "old_mac") if key in change}
+        extra.update(event_time(change.get("capture_time")))
+        emit_event(f"device_{event}" if event in ("joined", "left") else event,
+                   ip=ip, mac=mac, vendor=vendor, segment=change.get("segment"),
+                   source=change.get("source", "sweep"), known=known, **extra)
+
+        if event == "left":
+            logger.info("Left: %s - %s (%s)", ip, mac, vendor)
+        elif event == "ip_changed":
+            logger.info("IP changed: %s (%s) %s -> %s", mac, vendor, change['old_ip'], ip)
+        elif event == "mac_moved":
+            logger.warning("MAC moved: %s now answered by %s (%s), was %s", ip, mac, vendor, change['old_mac'])
+        elif known:
+            logger.info("Joined: %s - %s (%s)", ip, mac, vendor)
+        else:
+            logger.warning("Unknown: %s - %s (%s)", ip, mac, vendor)
+
+        if not known and event != "left":
+            intruders.append(change)
+
+    # Alert if intruders detected.
+    if intruders:
+        INTRUDERS.inc(len(intruders))
+        logger.critical("ALERT: %d intruder(s) device detected!", len(intruders))
+        for intruder in intruders:
+            logger.critical("INTRUDER: %s - %s (%s)", intruder['ip'], intruder['mac'], intruder['vendor'])
+            emit_event("intruder", ip=intruder['ip'], mac=intruder['mac'], vendor=intruder['vendor'],
+                       segment=intruder.get('segment'), source=intruder.get('source', 'sweep'),
+                       reason=intruder['event'], **event_time(intruder.get("capture_time")))
+
+def start_passive_monitors(registry, on_new_device=None, interfaces=None, checker=None):
+    """
+    Starts one passive ARP/DHCP listener per scanned interface so new MACs are checked the
+    moment they talk, not only on the next sweep. Returns the monitors that could be started.
+
+    Args:
+        checker: Called as checker(devices, registry) for every sighting, default check_devices
+                 (inline, in the capture thread). The daemon passes a queueing one.
+    """
+    if not PASSIVE_MONITOR or not hasattr(socket, "AF_PACKET"):
+        return []
+    checker = checker or check_devices
+
+    def on_device(device):
+        logger.info("Passive %s sighting: %s -> %s", device['source'], device['ip'], device['mac'])
+        checker([device], registry)
+        if on_new_device is not None:
+            on_new_device(device)
+
+    if interfaces is None:
+        interfaces = scan_interfaces()
+    monitors = []
+    for interface in sorted(i for i in interfaces if i):
+        on_arp = BINDING_TRACKER.observe_raw if BINDING_TRACKER is not None else None
+        monitor = PassiveMonitor(interface, on_device, known_macs=registry.macs(), on_arp=on_arp)
+        try:
+            monitor.start()
+        except OSError as e:
+            logger.warning(f"Passive monitor unavailable on {interface} ({e}), relying on active sweeps only.")
+            continue
+        monitors.append(monitor)
+    return monitors
+
+def scan_interfaces():
+    """Interfaces of all configured segments."""
+    return {segment["interface"] for segment in SCAN_SEGMENTS if segment["interface"]} or {SCAN_INTERFACE}
+
+def start_ndp_discovery(registry, interfaces=None, checker=None):
+    """
+    Starts one IPv6 neighbor discovery engine per scanned interface. Every new IPv6
+    address/MAC pair goes through check_devices (or `checker`), which correlates it to
+    known devices or raises the intruder alert. Returns the engines that could be started.
+    """
+    if not IPV6_DISCOVERY or not hasattr(socket, "AF_PACKET"):
+        return []
+    checker = checker or check_devices
+
+    def on_device(device):
+        NDP_SIGHTINGS.inc(source=device["source"])
+        checker([device], registry)
+
+    engines = []
+    for interface in sorted(i for i in (interfaces or scan_interfaces()) if i):
+        try:
+            engine = NdpDiscovery.for_interface(interface, on_device=on_device)
+            engine.start()
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f"IPv6 discovery unavailable on {interface} ({e}).")
+            continue
+        engines.append(engine)
+    return engines
 
-def surveillance_mode(known_macs):
+def sync_listeners(listeners, wanted, start):
+    """
+    Keeps per-interface listeners (passive monitors, NDP engines) in line with the scanned
+    interfaces: stops the ones on interfaces no longer scanned, starts missing ones.
+
+    Args:
+        listeners: Running listeners, anything with .interface and .stop()
+        wanted: Interfaces which should have a listener
+        start: Called as start(interfaces) for the missing ones, returns the started listeners
+
+    Returns:
+        list: The listeners now running
+    """
+    kept = []
+    for listener in listeners:
+        if listener.interface in wanted:
+            kept.append(listener)
+        else:
+            listener.stop()
+    running = {listener.interface for listener in kept}
+    kept.extend(start(wanted - running))
+    return kept
+
+def retarget_gateways(registry, router_ip):
+    """Re-pins the binding tracker's gateway after the router changed."""
+    if BINDING_TRACKER is None:
+        return
+    BINDING_TRACKER.clear_gateways()
+    for ip, mac in gateway_pins(registry, router_ip).items():
+        BINDING_TRACKER.set_gateway(ip, mac)
+
+def discover_ipv6(known_ips=()):
+    """One-shot IPv6 discovery on every scanned interface (learning mode). Returns sightings."""
+    if not IPV6_DISCOVERY or not hasattr(socket, "AF_PACKET"):
+        return []
+
+    devices = []
+    for interface in sorted(i for i in scan_interfaces() if i):
+        try:
+            engine = NdpDiscovery.for_interface(interface)
+        except (OSError, KeyError, ValueError) as e:
+            logger.debug(f"IPv6 discovery unavailable on {interface} ({e}).")
+            continue
+        try:
+            devices.extend(engine.discover(known_ips, timeout=NDP_TIMEOUT))
+        finally:
+            engine.transport.close()
+
+    logger.info(f"IPv6 discovery found {len(devices)} addresses.")
+    return devices
+
+def probe_devices(devices, timeout=None):
+    """
+    Re-checks only the given devices with targeted ARP requests, grouped per segment.
+    Much cheaper than a full sweep when we only want to know if live hosts are still there.
+    """
+    by_segment = {}
+    for device in devices:
+        key = (device.get("segment") or TARGET_NETWORK, device.get("interface") or SCAN_INTERFACE)
+        by_segment.setdefault(key, []).append(device["ip"])
+
+    answered = []
+    for (network, interface), ips in by_segment.items():
+        try:
+            for ip, mac in arp_sweep(network, interface, targets=ips, timeout=timeout):
+                answered.append({"ip": ip, "mac": mac, "segment": network, "interface": interface})
+        except Exception as e:
+            logger.error(f"Probe of {network} failed: {e}.")
+    return answered
+
+def segment_host_count():
+    """Number of addresses a full sweep of all segments will probe."""
+    segments = SCAN_SEGMENTS or [{"cidr": TARGET_NETWORK}]
+    return sum(ipaddress.ip_network(segment["cidr"], strict=False).num_addresses for segment in segments)
+
+def surveillance_mode(registry):
     """Main surveillance loop - the eternal watch. Kya Cool naam rakhta hu me😎"""
     logger.info("Cerberus is watching.")
-    logger.info(f"Starting surveillance with {len(known_macs)} known devices. Press Ctrl+C to stop.")
-    
-    scan_count = 0
+    logger.info(f"Starting surveillance with {len(registry)} known devices. Press Ctrl+C to stop.")
     
-    try:
-        while True:
-            scan_count += 1
-            logger.info(f"------------------------- Scan {scan_count} -------------------------")
-            
-            current_devices = scan_network()
-            
-            if not current_devices:
-                logger.warning("No devices found!")
-                time.sleep(SCAN_INTERVAL)
-                continue
-            
-            unknown_devices = []
-            
-            for device in current_devices:
-                if device["mac"] not in known_macs:
-                    unknown_devices.append(device)
-                    ip = device["ip"]
-                    mac = device["mac"]
-                    logger.warning(f"Unknown: {ip} - {mac}")
-            
-            # Alert if intruders detected.
-            if unknown_devices:
-                logger.critical(f"ALERT: {len(unknown_devices)} intruder(s) device detected!")
-                for intruder in unknown_devices:
-                    logger.critical(f"INTRUDER: {intruder["ip"]} - {intruder["mac"]}")
-            else:
-                logger.info("All devices are trusted.")
-            
+    global DELTA_ENGINE, BINDING_TRACKER
+    DELTA_ENGINE = DeltaEngine(MISS_TOLERANCE)
+    BINDING_TRACKER = BindingTracker(gateway_pins(registry, RouterDetector.get_context().router_ip),
+                                     on_alert=report_binding_alert, conflict_window=CONFLICT_WINDOW,
+                                     rebind_window=REBIND_WINDOW, rebind_limit=REBIND_LIMIT)
 
+    scheduler = ScanScheduler()
+    live_devices = {}    # ip -> device from the latest sweep, probe tier inhi ko check karta hai
+    state = {"scan_count": 0, "probe_cursor": 0, "monitors": [], "ndp": []}
 
-            time.sleep(SCAN_INTERVAL)
+    def full_sweep(budget):
+        state["scan_count"] += 1
+        logger.info(f"------------------------- Scan {state['scan_count']} -------------------------")
+        started = time.monotonic()
+        segments = SCAN_SEGMENTS
+        emit_event("scan_started", scan=state["scan_count"],
+                   segments=[segment["cidr"] for segment in segments] or [TARGET_NETWORK])
+        
+        failed = []
+        current_devices = scan_network(known_hosts(registry, live_devices), failed=failed)
+        swept = time.monotonic()
+        # Full sweep ho gaya toh periodic sweep ki deadline bhi aage badha do.
+        scheduler.reschedule("sweep")
+        
+        if not current_devices:
+            logger.warning("No devices found!")
+            emit_event("scan_completed", scan=state["scan_count"], devices=0, unknown=0,
+                       sweep_ms=round((swept - started) * 1000, 1))
+            return segment_host_count()
+        
+        live_devices.clear()
+        live_devices.update((device["ip"], device) for device in current_devices)
+        DEVICES_FOUND.set(len(current_devices))
+
+        for monitor in state["monitors"]:
+            monitor.mark_seen(device["mac"] for device in current_devices)
+
+        unknown_devices = check_devices(current_devices, registry, scope=sweep_scope(failed))
+        if not unknown_devices:
+            logger.info("All devices are trusted.")
+        checked = time.monotonic()
+
+        # Is scan ke sightings (aur probes ke bhi) ek hi batch me save honge.
+        save_known_devices(registry)
+        save_presence()
+        finished = time.monotonic()
+
+        emit_event("scan_completed", scan=state["scan_count"], devices=len(current_devices),
+                   unknown=len(unknown_devices),
+                   recovered=sum(device.get("source") == "retry" for device in current_devices),
+                   sweep_ms=round((swept - started) * 1000, 1),
+                   check_ms=round((checked - swept) * 1000, 1),
+                   persist_ms=round((finished - checked) * 1000, 1),
+                   total_ms=round((finished - started) * 1000, 1))
+
+        return segment_host_count()
+
+    def probe_live_hosts(budget):
+        # Network badal gaya ho toh purane segment ke hosts probe karne ka matlab nahi.
+        current = {segment["cidr"] for segment in SCAN_SEGMENTS}
+        hosts = [device for device in live_devices.values()
+                 if not current or device.get("segment", TARGET_NETWORK) in current]
+        if not hosts:
+            return 0
+
+        # Budget se zyada live hosts ho toh round-robin me thode thode check karo.
+        start = state["probe_cursor"] % len(hosts)
+        batch = (hosts[start:] + hosts[:start])[:budget]
+        state["probe_cursor"] = start + len(batch)
+
+        answered = probe_devices(batch, timeout=PROBE_TIMEOUT)
+        logger.debug("Probe: %d/%d live hosts answered.", len(answered), len(batch))
+        check_devices(answered, registry, scope=[device["mac"] for device in batch])
+        return len(batch)
+
+    def probe_ipv6(budget):
+        # Ek multicast echo + known addresses ke NS - prefix kitna bhi bada ho, cost same.
+        known = registry.ipv6_addresses()[:budget]
+        return sum(engine.probe(known) for engine in state["ndp"])
+
+    def on_new_device(device):
+        scheduler.trigger("event", f"new MAC {device['mac']}")
+
+    def on_network_change(old, new):
+        if not new.router_ip:
+            logger.warning("Default route lost - keeping the current scan targets until it is back.")
+            return
+
+        apply_network_context(new)
+        retarget_gateways(registry, new.router_ip)
+        segments = SCAN_SEGMENTS
+        logger.warning(f"Network changed, now scanning: {', '.join(segment['cidr'] for segment in segments)}")
+        emit_event("network_changed", router_ip=new.router_ip, interface=new.interface,
+                   segments=[segment["cidr"] for segment in segments])
+
+        # Interfaces badle ho toh passive listeners bhi badlo.
+        wanted = {segment["interface"] for segment in segments if segment["interface"]}
+        state["monitors"] = sync_listeners(state["monitors"], wanted,
+                                           lambda missing: start_passive_monitors(registry, on_new_device, missing))
+        state["ndp"] = sync_listeners(state["ndp"], wanted, lambda missing: start_ndp_discovery(registry, missing))
+
+        budget = segment_host_count()
+        for name in ("sweep", "event"):
+            scheduler.tiers[name].budget = budget
+        scheduler.trigger("event", "network changed")
+
+    # Passive monitor real time me dekhta hai, active sweep ab sirf backstop hai.
+    state["monitors"] = start_passive_monitors(registry, on_new_device)
+    state["ndp"] = start_ndp_discovery(registry)
+
+    sweep_budget = segment_host_count()
+    scheduler.add_tier("sweep", full_sweep, deadline=SCAN_INTERVAL, budget=sweep_budget, run_now=True)
+    scheduler.add_tier("probe", probe_live_hosts, deadline=PROBE_INTERVAL, budget=PROBE_BUDGET)
+    scheduler.add_tier("event", full_sweep, deadline=None, budget=sweep_budget, min_gap=EVENT_MIN_GAP)
+    scheduler.add_tier("ndp", probe_ipv6, deadline=PROBE_INTERVAL, budget=PROBE_BUDGET, run_now=True)
+
+    # Tiers ke baad hi start karo, change aate hi trigger("event") chahiye.
+    watcher = None
+    if NETWORK_WATCH:
+        watcher = NetworkWatcher(on_network_change)
+        try:
+            watcher.start()
+        except OSError as e:
+            logger.warning(f"Network change detection unavailable ({e}), scan targets stay fixed.")
+            watcher = None
+    
+    try:
+        scheduler.run_forever()
             
     except KeyboardInterrupt:
         logger.info("Surveillance stopped by user.")
@@ -147,6 +808,48 @@ def surveillance_mode(known_macs):
     except Exception as e:
         logger.exception("Error in surveillance.")
         raise
+    finally:
+        scheduler.stop()
+        if watcher is not None:
+            watcher.stop()
+        for monitor in state["monitors"]:
+            monitor.stop()
+        for engine in state["ndp"]:
+            engine.stop()
+        save_known_devices(registry)
+        save_presence()
+        logger.info(f"Scan tiers: {scheduler.stats()}")
+
+def apply_network_context(context):
+    """
+    Switches the scan targets to a NetworkContext. Scanners only ever read SCAN_SEGMENTS
+    (interface and cidr together), and it is replaced with one assignment at the end, so
+    a sweep sees either the old targets or the new ones, never a mix.
+
+    Returns:
+        list: The new scan segments
+    """
+    global TARGET_NETWORK, SCAN_INTERFACE, SCAN_SEGMENTS
+
+    # It will try to use the actual subnet mask first then only it will search that range.
+    network_cidr = context.cidr
+    if network_cidr:
+        logger.info(f"✔️ Network detected with correct subnet: {network_cidr}.")
+    else:
+        # Mask nahi mila toh network range /24 hai assume karlega, most cases me vahi range rehti hai jaise(192.168.1.0/24)
+        network_cidr = '.'.join(context.router_ip.split('.')[:-1]) + '.0/24'
+        logger.warning(f"⚠️ Using default /24 network assumption: {network_cidr}.")
+
+    # Multi-homed machine ho toh baaki interfaces ke segments bhi saath me scan honge.
+    segments = [{"interface": context.interface, "cidr": network_cidr}]
+    for segment in context.segments:
+        if (segment.interface, segment.cidr) != (context.interface, network_cidr):
+            segments.append({"interface": segment.interface, "cidr": segment.cidr})
+
+    TARGET_NETWORK = network_cidr
+    SCAN_INTERFACE = context.interface
+    SCAN_SEGMENTS = segments
+    return segments
 
 def check_npcap_requirement():
     """
@@ -161,8 +864,12 @@ def check_npcap_requirement():
     
     logger.info("Windows platform detected - checking Npcap availability...")
     
-    if not NPCAP_INSTALLER_AVAILABLE:
-        logger.warning("Npcap installer module not available.")
+    # Windows-only dependencies (winreg, ctypes, requests) live in npcap_installer,
+    # so it is only imported here.
+    try:
+        from npcap_installer import handle_npcap_installation
+    except ImportError as e:
+        logger.warning(f"Npcap installer module not available: {e}.")
         print("\n" + "="*70)
         print("⚠️  WINDOWS USERS: NPCAP REQUIRED")
         print("="*70)
@@ -198,6 +905,140 @@ def check_npcap_requirement():
         return choice == 'y'
 
 
+def detect_network():
+    """
+    Detects the network, points the scan targets at it and starts the optional outputs
+    (event stream, vendor table, metrics endpoint). Shared by main() and the daemon.
+
+    Returns:
+        NetworkContext: The detected context, or None if no network was found
+    """
+    # Ye auto detect karega router_detector module ki madad se.
+    try:
+        context = RouterDetector.get_context()
+    except Exception as e:
+        logger.critical(f"Could not detect network! Network detection failed: {e}")
+        return None
+
+    if not context.router_ip:
+        logger.critical("Could not detect network! Check your connection.")
+        return None
+
+    apply_network_context(context)
+
+    logger.info(f"Router detected: {context.router_ip}")
+    logger.info(f"Scanning network: {TARGET_NETWORK}")
+    for segment in SCAN_SEGMENTS[1:]:
+        logger.info(f"Also scanning: {segment['cidr']} on {segment['interface']}")
+    logger.info(f"Your IP: {context.local_ip or 'Unknown'}")
+    logger.info(f"Interface: {context.interface or 'Unknown'}")
+    logger.info("-" * 50)
+
+    if EVENT_STREAM_FILE:
+        cerberus_logger.setup_event_stream(EVENT_STREAM_FILE)
+
+    if OUI_TABLE:
+        oui_lookup.set_table_path(OUI_TABLE)
+
+    start_alert_dispatcher()
+    start_presence_history()
+    start_fleet_reporter()
+
+    if METRICS_PORT:
+        try:
+            metrics.start_metrics_server(METRICS_PORT)
+        except OSError as e:
+            logger.error(f"Could not start metrics endpoint on port {METRICS_PORT}: {e}.")
+
+    return context
+
+def load_or_learn():
+    """Trusted devices from the store, or learned from a first scan. Empty registry = nothing to watch."""
+    registry = load_known_devices()
+    if not registry:
+        registry = learn_network_mode()
+    return registry
+
+def start_alert_dispatcher():
+    """Starts alert delivery to the configured webhook / syslog / SMTP sinks. None if none is set."""
+    global ALERT_DISPATCHER
+
+    sinks = []
+    if ALERT_WEBHOOK_URL:
+        sinks.append(WebhookSink(ALERT_WEBHOOK_URL))
+    if ALERT_SYSLOG:
+        address = ALERT_SYSLOG
+        if not address.startswith("/"):
+            host, _, port = address.rpartition(":")
+            address = (host or "localhost", int(port or 514))
+        sinks.append(SyslogSink(address))
+    if ALERT_SMTP:
+        sinks.append(SmtpSink(**ALERT_SMTP))
+    if not sinks:
+        return None
+
+    ALERT_DISPATCHER = AlertDispatcher(sinks, window=ALERT_WINDOW, dedupe_seconds=ALERT_DEDUPE).start()
+    logger.info(f"Alerts go to: {', '.join(worker.name for worker in ALERT_DISPATCHER.workers)}.")
+    return ALERT_DISPATCHER
+
+def start_presence_history():
+    """Opens the presence history store. None if disabled or the directory is unusable."""
+    global PRESENCE_HISTORY
+    if not PRESENCE_HISTORY_DIR:
+        return None
+    # Har tier ka slot pichle ka multiple hona chahiye, warna downsampling ka fold nahi banta.
+    medium = PRESENCE_SLOT * max(1, round(900 / PRESENCE_SLOT))
+    coarse = medium * max(1, round(3600 / medium))
+    tiers = ((PRESENCE_SLOT, 14 * 86400), (medium, 90 * 86400), (coarse, PRESENCE_RETENTION * 86400))
+    try:
+        PRESENCE_HISTORY = PresenceHistory(PRESENCE_HISTORY_DIR, tiers=tiers)
+    except (OSError, ValueError) as e:
+        logger.error(f"Presence history unavailable ({e}).")
+        return None
+    return PRESENCE_HISTORY
+
+def save_presence():
+    """Writes the current presence chunk (and downsamples old ones when a new chunk started)."""
+    if PRESENCE_HISTORY is None:
+        return
+    try:
+        with metrics.span("presence"):
+            PRESENCE_HISTORY.flush()
+    except OSError as e:
+        logger.error(f"Failed to save presence history: {e}.")
+
+def start_fleet_reporter():
+    """Starts reporting to the fleet collector. None if FLEET_COLLECTOR is not set."""
+    global FLEET_REPORTER
+    if not FLEET_COLLECTOR:
+        return None
+    import fleet
+
+    try:
+        address = fleet.parse_address(FLEET_COLLECTOR)
+    except ValueError:
+        logger.error(f"Invalid FLEET_COLLECTOR {FLEET_COLLECTOR!r}, expected host:port.")
+        return None
+    FLEET_REPORTER = fleet.FleetReporter(address, sentinel=FLEET_SENTINEL_ID, site=FLEET_SITE, token=FLEET_TOKEN,
+                                         spool_path=FLEET_SPOOL).start()
+    return FLEET_REPORTER
+
+def shutdown():
+    """Sends pending alerts and fleet reports, closes the device store and flushes the event stream."""
+    global ALERT_DISPATCHER, FLEET_REPORTER
+    if ALERT_DISPATCHER is not None:
+        ALERT_DISPATCHER.close()
+        ALERT_DISPATCHER = None
+    if FLEET_REPORTER is not None:
+        FLEET_REPORTER.close()
+        FLEET_REPORTER = None
+    save_presence()
+    sharded_sweep.shutdown_pool()
+    if DEVICE_STORE is not None:
+        DEVICE_STORE.close()
+    cerberus_logger.stop_event_stream()
+    logger.info("Cerberus is shutting down. Buh-bieeeee.")
+
 def main():
     """Main execution flow - the brain of the operation."""
     logger.info("=" * 50)
@@ -209,53 +1050,23 @@ def main():
         logger.info("Exiting due to Npcap requirement not met.")
         sys.exit(0)
 
-    # Ye auto detect karega router_detector module ki madad se.
-    detector = RouterDetector()
-    network_info = detector.get_network_info()
-
-    if not network_info:
-        logger.critical("Could not detect network! Check your connection.")
+    if detect_network() is None:
         return
-    
-    global TARGET_NETWORK
-
-    router_ip = network_info.get('router_ip', 'Unknown')
-
-    # It will try to detect actual subnet mask first then only it will search that range.
-    network_cidr = detector.get_network_with_mask()
-
-    if network_cidr:
-        TARGET_NETWORK = network_cidr
-        logger.info(f"✔️ Network detected with correct subnet: {TARGET_NETWORK}.")
-    else:
-        # Ye else case hai toh upar ka nahi chala toh network range /24 hai assume karlega, mostl cases me vahi range rehti hai jaise(192.168.1.0/24)
-        network_base = '.'.join(router_ip.split('.')[:-1]) + '.0/24'
-        TARGET_NETWORK = network_base
-        logger.warning(f"⚠️ Using default /24 network assumption: {TARGET_NETWORK}.")
-
-    logger.info(f"Router detected: {router_ip}")
-    logger.info(f"Scanning network: {TARGET_NETWORK}")
-    logger.info(f"Your IP: {network_info.get('local_ip', 'Unknown')}")
-    logger.info(f"Interface: {network_info.get('interface', 'Unknown')}")
-    logger.info("-" * 50)
 
     try:
-        known_macs = load_known_devices()
-        
-        if not known_macs:
-            known_macs = learn_network_mode()
-            if not known_macs:
-                return
+        registry = load_or_learn()
+        if not registry:
+            return
         
         # ENTER THE ETERNAL WATCH: Ek ko bhi nahi chodega apun😎😤
-        surveillance_mode(known_macs)
+        surveillance_mode(registry)
         
     except KeyboardInterrupt:
         logger.info("Program stopped.")
     except Exception as e:
         logger.exception("Fatal error.")
     finally:
-        logger.info("Cerberus is shutting down. Buh-bieeeee.")
+        shutdown()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,181 @@
+"""
+Delta Engine Module
+
+This module compares consecutive scan results and reports only what changed, so
+alerting and logging scale with churn instead of with network size:
+
+    - joined: a MAC which was not present before
+    - left: a MAC missing from `miss_tolerance` consecutive scans that should have seen it
+    - ip_changed: a present MAC answering from a different IPv4 address
+    - mac_moved: an IPv4 address now answered by a different MAC (possible spoofing)
+
+One dropped ARP reply is not a departure - a device only "leaves" after it was missed
+`miss_tolerance` times in a row, and any sighting resets the counter.
+
+Usage:
+    from delta_engine import DeltaEngine
+
+    delta = DeltaEngine(miss_tolerance=2)
+    for change in delta.update(scan_results):
+        print(change["event"], change["mac"], change["ip"])
+"""
+
+import ipaddress
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import cerberus_logger
+from device_registry import int_to_mac, mac_to_int
+
+logger = cerberus_logger.get_logger("cerberus.delta_engine")
+
+JOINED = "joined"
+LEFT = "left"
+IP_CHANGED = "ip_changed"
+MAC_MOVED = "mac_moved"
+
+
+class Presence:
+    """Tracking state of one present device."""
+
+    __slots__ = ("mac", "ip", "misses", "first_seen", "last_seen", "device")
+
+    def __init__(self, mac: int, ip: Optional[str], now: float, device: dict):
+        self.mac = mac
+        self.ip = ip
+        self.misses = 0
+        self.first_seen = now
+        self.last_seen = now
+        self.device = device
+
+
+class DeltaEngine:
+    """
+    Set-based scan-to-scan comparison with miss-tolerance hysteresis. Thread-safe, so the
+    sweep tiers and the passive listeners can feed the same engine.
+    """
+
+    def __init__(self, miss_tolerance: int = 2):
+        """
+        Args:
+            miss_tolerance: Consecutive misses before a device is reported as left
+        """
+        self.miss_tolerance = max(1, miss_tolerance)
+        self._present: Dict[int, Presence] = {}
+        self._by_ip: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._present)
+
+    def __contains__(self, mac) -> bool:
+        try:
+            return mac_to_int(mac) in self._present
+        except (TypeError, ValueError):
+            return False
+
+    def update(self, devices: Iterable[dict], scope: Optional[Iterable[str]] = None,
+               now: Optional[float] = None) -> List[dict]:
+        """
+        Applies one set of sightings and returns the transitions it caused.
+
+        Args:
+            devices: Sightings, dicts with "ip" and "mac" (extra keys are carried along)
+            scope: MACs this scan was expected to see. None = a full IPv4 sweep, every tracked
+                   device with an IPv4 address not in `devices` gets a miss (IPv6-only devices
+                   are never expected by an ARP sweep). An empty scope (passive sightings)
+                   never counts misses; a probe passes the MACs it probed.
+            now: Timestamp (default: time.time())
+
+        Returns:
+            list: Transition dicts {"event", "mac", "ip", ...} plus the sighting's own keys
+        """
+        if now is None:
+            now = time.time()
+
+        changes = []
+        seen = set()
+
+        with self._lock:
+            for device in devices:
+                try:
+                    key = mac_to_int(device["mac"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                seen.add(key)
+                self._observe(key, device, now, changes)
+
+            if scope is None:
+                missed = [key for key, entry in self._present.items()
+                          if key not in seen and entry.ip is not None]
+            else:
+                missed = []
+                for mac in scope:
+                    try:
+                        key = mac_to_int(mac)
+                    except (TypeError, ValueError):
+                        continue
+                    if key in self._present and key not in seen:
+                        missed.append(key)
+
+            for key in missed:
+                self._miss(key, now, changes)
+
+        return changes
+
+    def macs_in(self, networks: Iterable) -> List[str]:
+        """MACs of the tracked devices whose IPv4 address is in one of `networks` (ip_network objects)."""
+        networks = [network for network in networks if network.version == 4]
+        with self._lock:
+            entries = [(entry.mac, entry.ip) for entry in self._present.values() if entry.ip is not None]
+        return [int_to_mac(mac) for mac, ip in entries
+                if any(ipaddress.IPv4Address(ip) in network for network in networks)]
+
+    # ------------------------- Internals -------------------------
+
+    def _observe(self, key: int, device: dict, now: float, changes: List[dict]) -> None:
+        ip = device.get("ip")
+        # IPv6 addresses rotate (privacy addresses), sirf presence track karo unke liye.
+        ipv4 = ip if ip and ":" not in ip else None
+
+        entry = self._present.get(key)
+        if entry is None:
+            entry = self._present[key] = Presence(key, ipv4, now, device)
+            changes.append(_change(JOINED, device, mac=int_to_mac(key)))
+        else:
+            entry.misses = 0
+            entry.last_seen = now
+            entry.device = device
+            if ipv4 and entry.ip != ipv4:
+                old_ip, entry.ip = entry.ip, ipv4
+                if old_ip is not None:
+                    if self._by_ip.get(old_ip) == key:
+                        del self._by_ip[old_ip]
+                    changes.append(_change(IP_CHANGED, device, mac=int_to_mac(key), old_ip=old_ip))
+
+        if ipv4:
+            owner = self._by_ip.get(ipv4)
+            if owner != key:
+                self._by_ip[ipv4] = key
+                if owner is not None:
+                    changes.append(_change(MAC_MOVED, device, mac=int_to_mac(key), old_mac=int_to_mac(owner)))
+
+    def _miss(self, key: int, now: float, changes: List[dict]) -> None:
+        entry = self._present[key]
+        entry.misses += 1
+        if entry.misses < self.miss_tolerance:
+            return
+
+        del self._present[key]
+        if entry.ip is not None and self._by_ip.get(entry.ip) == key:
+            del self._by_ip[entry.ip]
+        changes.append(_change(LEFT, entry.device, mac=int_to_mac(key), ip=entry.ip,
+                               present_seconds=round(entry.last_seen - entry.first_seen, 1)))
+
+
+def _change(event: str, device: dict, **fields) -> dict:
+    change = dict(device)
+    change.update(fields)
+    change["event"] = event
+    return change
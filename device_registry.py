@@ -0,0 +1,265 @@
+"""
+Device Registry Module
+
+This module keeps the inventory of trusted devices. Every MAC address is normalized
+into a 48-bit integer, so 'AA-BB-CC-DD-EE-FF', 'aa:bb:cc:dd:ee:ff' and 'aabb.ccdd.eeff'
+are all the same device, and lookups are a single hash probe instead of a scan over
+a list. Per-device records use __slots__ because we track thousands of endpoints.
+
+Usage:
+    from device_registry import DeviceRegistry
+
+    registry = DeviceRegistry.from_macs(["aa:bb:cc:dd:ee:ff"])
+    known, unknown = registry.diff(scan_results)
+"""
+
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import cerberus_logger
+from oui_lookup import describe_mac
+
+logger = cerberus_logger.get_logger("cerberus.device_registry")
+
+MacLike = Union[str, int]
+
+_MAC_SEPARATORS = str.maketrans("", "", ":-. ")
+
+# IPv6 addresses remembered per device (link-local, SLAAC, privacy addresses...).
+MAX_IPV6 = 8
+
+# ========================= MAC Normalization =========================
+
+def mac_to_int(mac: MacLike) -> int:
+    """
+    Normalizes a MAC address into a 48-bit integer.
+
+    Raises:
+        ValueError: If the value is not a valid 48-bit MAC address
+    """
+    if isinstance(mac, int):
+        if not 0 <= mac < 1 << 48:
+            raise ValueError(f"MAC out of range: {mac}")
+        return mac
+
+    digits = mac.translate(_MAC_SEPARATORS)
+    if len(digits) != 12:
+        raise ValueError(f"Invalid MAC address: {mac!r}")
+    return int(digits, 16)
+
+
+def int_to_mac(value: int) -> str:
+    """Formats a 48-bit integer as 'aa:bb:cc:dd:ee:ff'."""
+    return value.to_bytes(6, "big").hex(":")
+
+
+def normalize_mac(mac: MacLike) -> str:
+    """Returns the canonical lower-case colon form of any MAC spelling."""
+    return int_to_mac(mac_to_int(mac))
+
+# ========================= Device Records =========================
+
+class DeviceRecord:
+    """Compact per-device record."""
+
+    __slots__ = ("mac", "first_seen", "last_seen", "last_ip", "label", "ipv6")
+
+    def __init__(self, mac: int, first_seen: Optional[float] = None, last_seen: Optional[float] = None,
+                 last_ip: Optional[str] = None, label: Optional[str] = None, ipv6: Tuple[str, ...] = ()):
+        self.mac = mac
+        self.first_seen = first_seen
+        self.last_seen = last_seen
+        self.last_ip = last_ip
+        self.label = label
+        self.ipv6 = ipv6
+
+    def note_ip(self, ip: str) -> None:
+        """Records an address: IPv4 goes to last_ip, IPv6 to the most-recent-first ipv6 tuple."""
+        if ":" not in ip:
+            self.last_ip = ip
+        elif not self.ipv6 or self.ipv6[0] != ip:
+            self.ipv6 = (ip,) + tuple(addr for addr in self.ipv6 if addr != ip)[:MAX_IPV6 - 1]
+
+    @property
+    def mac_str(self) -> str:
+        return int_to_mac(self.mac)
+
+    @property
+    def vendor(self) -> Optional[str]:
+        """Vendor from the offline OUI table (looked up on demand, nothing stored per record)."""
+        return describe_mac(self.mac)
+
+    def to_dict(self) -> dict:
+        return {
+            "mac": self.mac_str,
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+            "last_ip": self.last_ip,
+            "ipv6": list(self.ipv6),
+            "label": self.label,
+            "vendor": self.vendor
+        }
+
+    def __repr__(self) -> str:
+        return f"DeviceRecord({self.mac_str}, ip={self.last_ip}, label={self.label})"
+
+# ========================= Registry =========================
+
+class DeviceRegistry:
+    """
+    Hash index of trusted devices keyed by the 48-bit MAC integer.
+    """
+
+    def __init__(self):
+        self._records: Dict[int, DeviceRecord] = {}
+        # Keys changed since the last pop_dirty(), so persistence costs O(changes).
+        self._dirty = set()
+        self._dirty_lock = threading.Lock()
+
+    @classmethod
+    def from_macs(cls, entries: Iterable[Union[str, dict]]) -> "DeviceRegistry":
+        """
+        Builds a registry from the known_devices.json content: a list of MAC strings
+        (or dicts with a "mac" key). Invalid entries are skipped with a warning.
+        """
+        registry = cls()
+        for entry in entries:
+            if isinstance(entry, dict):
+                mac, ip, label = entry.get("mac"), entry.get("last_ip"), entry.get("label")
+            else:
+                mac, ip, label = entry, None, None
+            try:
+                registry.add(mac, ip=ip, label=label)
+            except (TypeError, ValueError) as e:
+                logger.warning(f"Skipping invalid known device entry {entry!r}: {e}.")
+        return registry
+
+    # ------------------------- Container Protocol -------------------------
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, mac: MacLike) -> bool:
+        try:
+            return mac_to_int(mac) in self._records
+        except (TypeError, ValueError):
+            return False
+
+    def __iter__(self) -> Iterator[DeviceRecord]:
+        return iter(list(self._records.values()))
+
+    def get(self, mac: MacLike) -> Optional[DeviceRecord]:
+        try:
+            return self._records.get(mac_to_int(mac))
+        except (TypeError, ValueError):
+            return None
+
+    def ipv6_addresses(self) -> List[str]:
+        """Every IPv6 address correlated to a known device, for neighbor solicitation probes."""
+        return [ip for record in self._records.values() for ip in record.ipv6]
+
+    def macs(self) -> List[str]:
+        """All known MACs in canonical form (what known_devices.json stores)."""
+        return [int_to_mac(mac) for mac in self._records]
+
+    # ------------------------- Updates -------------------------
+
+    def add(self, mac: MacLike, ip: Optional[str] = None, label: Optional[str] = None,
+            seen: Optional[float] = None) -> DeviceRecord:
+        """Adds a device (or updates it if it already exists) and returns its record."""
+        key = mac_to_int(mac)
+        self._mark_dirty(key)
+        record = self._records.get(key)
+        if record is None:
+            record = DeviceRecord(key, first_seen=seen, last_seen=seen, label=label)
+            if ip is not None:
+                record.note_ip(ip)
+            self._records[key] = record
+            return record
+
+        if seen is not None:
+            record.last_seen = seen
+            if record.first_seen is None:
+                record.first_seen = seen
+        if ip is not None:
+            record.note_ip(ip)
+        if label is not None:
+            record.label = label
+        return record
+
+    def remove(self, mac: MacLike) -> bool:
+        try:
+            key = mac_to_int(mac)
+        except (TypeError, ValueError):
+            return False
+        with self._dirty_lock:
+            self._dirty.discard(key)
+        return self._records.pop(key, None) is not None
+
+    # ------------------------- Change Tracking -------------------------
+
+    def _mark_dirty(self, key: int) -> None:
+        with self._dirty_lock:
+            self._dirty.add(key)
+
+    def dirty_count(self) -> int:
+        """Number of records changed since the last pop_dirty()."""
+        with self._dirty_lock:
+            return len(self._dirty)
+
+    def pop_dirty(self) -> List[DeviceRecord]:
+        """Returns the records changed since the last call and clears the change set."""
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, set()
+        records = self._records
+        return [records[key] for key in dirty if key in records]
+
+    # ------------------------- Bulk Diff -------------------------
+
+    def diff(self, devices: Iterable[dict], update: bool = True,
+             now: Optional[float] = None) -> Tuple[List[dict], List[dict]]:
+        """
+        Splits a whole scan result into known and unknown devices in one pass.
+
+        Args:
+            devices: Scan results, dicts with at least "ip" and "mac"
+            update: If True, refresh last_seen / last_ip (or ipv6) of known devices
+            now: Timestamp for last_seen (default: time.time())
+
+        Returns:
+            Tuple[list, list]: (known_devices, unknown_devices)
+        """
+        if now is None:
+            now = time.time()
+
+        records = self._records
+        known, unknown = [], []
+        touched = []
+
+        for device in devices:
+            try:
+                key = mac_to_int(device["mac"])
+            except (TypeError, ValueError):
+                unknown.append(device)
+                continue
+
+            record = records.get(key)
+            if record is None:
+                unknown.append(device)
+                continue
+
+            known.append(device)
+            if update:
+                touched.append(key)
+                record.last_seen = now
+                if record.first_seen is None:
+                    record.first_seen = now
+                if device.get("ip"):
+                    record.note_ip(device["ip"])
+
+        if touched:
+            with self._dirty_lock:
+                self._dirty.update(touched)
+
+        return known, unknown
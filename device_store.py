@@ -0,0 +1,186 @@
+"""
+Device Store Module
+
+This module persists the trusted device registry in SQLite running in WAL mode, instead
+of rewriting the whole known_devices.json on every save. A crash in the middle of a
+write can not lose the whitelist any more (SQLite commits are atomic), and saving one
+scan only writes the devices which actually changed, as one batched upsert.
+
+The old known_devices.json can still be imported once (it is done automatically
+when the database is empty).
+
+Usage:
+    from device_store import DeviceStore
+
+    store = DeviceStore("cerberus_devices.db")
+    registry = store.load_registry()
+    store.upsert(registry.pop_dirty())
+"""
+
+import json
+import sqlite3
+import threading
+import urllib.parse
+from typing import Iterable, Optional
+
+import cerberus_logger
+from device_registry import DeviceRecord, DeviceRegistry
+
+logger = cerberus_logger.get_logger("cerberus.device_store")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS devices (
+    mac        INTEGER PRIMARY KEY,
+    first_seen REAL,
+    last_seen  REAL,
+    last_ip    TEXT,
+    label      TEXT,
+    ipv6       TEXT
+)
+"""
+
+# Columns added after the first release, ALTER TABLE'd into older databases.
+_MIGRATIONS = {
+    "ipv6": "ALTER TABLE devices ADD COLUMN ipv6 TEXT",
+}
+
+_UPSERT = """
+INSERT INTO devices (mac, first_seen, last_seen, last_ip, label, ipv6) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT(mac) DO UPDATE SET
+    first_seen = COALESCE(devices.first_seen, excluded.first_seen),
+    last_seen  = COALESCE(excluded.last_seen, devices.last_seen),
+    last_ip    = COALESCE(excluded.last_ip, devices.last_ip),
+    label      = COALESCE(excluded.label, devices.label),
+    ipv6       = COALESCE(excluded.ipv6, devices.ipv6)
+"""
+
+
+class DeviceStore:
+    """
+    SQLite (WAL) backed storage for the device registry.
+    """
+
+    def __init__(self, path: str = "cerberus_devices.db", compact_every: int = 500, read_only: bool = False):
+        """
+        Args:
+            path: Database file
+            compact_every: Run compaction after this many upsert batches
+            read_only: Open an existing store for reading only (sqlite3.Error if it does not
+                       exist). The database is never modified, close() does not compact it.
+        """
+        self.path = path
+        self.compact_every = compact_every
+        self.read_only = read_only
+        self._batches = 0
+        self._lock = threading.Lock()
+
+        if read_only:
+            # mode=ro: na file banegi na schema/pragma likhe jayenge. WAL ki -shm/-wal files SQLite khud bana sakta hai.
+            self.conn = sqlite3.connect(f"file:{urllib.parse.quote(path)}?mode=ro", uri=True, check_same_thread=False)
+            return
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        # auto_vacuum sirf nayi (empty) database pe lagta hai, isliye schema se pehle set karna zaruri hai.
+        self.conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        # WAL + NORMAL is still crash safe, it only skips an fsync per commit.
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        with self.conn:
+            self.conn.execute(_SCHEMA)
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(devices)")}
+            for column, statement in _MIGRATIONS.items():
+                if column not in columns:
+                    self.conn.execute(statement)
+
+    # ------------------------- Loading -------------------------
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM devices").fetchone()[0]
+
+    def load_registry(self) -> DeviceRegistry:
+        """Reads every stored device into a fresh DeviceRegistry."""
+        registry = DeviceRegistry()
+        with self._lock:
+            rows = self.conn.execute("SELECT mac, first_seen, last_seen, last_ip, label, ipv6 FROM devices").fetchall()
+
+        for mac, first_seen, last_seen, last_ip, label, ipv6 in rows:
+            record = registry.add(mac, ip=last_ip, label=label, seen=last_seen)
+            record.first_seen = first_seen
+            if ipv6:
+                record.ipv6 = tuple(ipv6.split())
+        registry.pop_dirty()    # Abhi DB se hi aaye hai, dobara likhne ki zarurat nahi
+        return registry
+
+    def import_json(self, json_file: str) -> int:
+        """
+        Imports the legacy known_devices.json (a list of MACs) into the store.
+
+        Returns:
+            int: Number of devices imported
+        """
+        with open(json_file, "r") as f:
+            registry = DeviceRegistry.from_macs(json.load(f))
+
+        count = self.upsert(registry.pop_dirty())
+        logger.info(f"Imported {count} devices from {json_file}.")
+        return count
+
+    # ------------------------- Saving -------------------------
+
+    def upsert(self, records: Iterable[DeviceRecord]) -> int:
+        """
+        Writes the given records as one batched transaction.
+
+        Returns:
+            int: Number of records written
+        """
+        rows = [(r.mac, r.first_seen, r.last_seen, r.last_ip, r.label, " ".join(r.ipv6) or None)
+                for r in records]
+        if not rows:
+            return 0
+
+        with self._lock:
+            with self.conn:
+                self.conn.executemany(_UPSERT, rows)
+            self._batches += 1
+            compact = self.compact_every and self._batches % self.compact_every == 0
+
+        if compact:
+            self.compact()
+        return len(rows)
+
+    def delete(self, mac: int) -> None:
+        with self._lock:
+            with self.conn:
+                self.conn.execute("DELETE FROM devices WHERE mac = ?", (mac,))
+
+    # ------------------------- Maintenance -------------------------
+
+    def compact(self) -> None:
+        """Folds the WAL back into the database file and returns free pages to the OS."""
+        with self._lock:
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self.conn.execute("PRAGMA incremental_vacuum")
+        logger.debug(f"Compacted device store {self.path}.")
+
+    def close(self) -> None:
+        if not self.read_only:
+            self.compact()
+        with self._lock:
+            self.conn.close()
+
+
+def open_store(path: str, legacy_json: Optional[str] = None) -> DeviceStore:
+    """
+    Opens the store, importing the legacy JSON whitelist first if the store is still empty.
+    """
+    store = DeviceStore(path)
+    if legacy_json and len(store) == 0:
+        try:
+            store.import_json(legacy_json)
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, TypeError) as e:
+            logger.error(f"Could not import {legacy_json}: {e}.")
+    return store
@@ -0,0 +1,876 @@
+"""
+Fleet Module
+
+This module gives one global view over many sites: every sentinel (a cerberus_scan.py or
+cerberus_daemon.py per site) reports to one central collector.
+
+    - FleetReporter (sentinel side): sightings are delta-filtered (only new MACs, changed
+      IPs, and a refresh every few minutes), events (intruders, transitions, spoofing
+      alerts, scan stats) are queued, and both go out as one batch per `interval` over a
+      persistent TCP connection. While the collector is unreachable the batches are
+      spooled to a local file and replayed, in order, once it is back.
+    - FleetCollector (central side): asyncio server, one coroutine per sentinel
+      connection, so thousands of sentinels cost thousands of sockets, not threads.
+      Batches are merged into a FleetInventory indexed by MAC, IP and sentinel, and the
+      inventory is snapshotted to disk periodically.
+
+Wire format: every message is a frame of a 4 byte big-endian length followed by zlib
+compressed JSON. A sentinel says hello (id, site, token) once per connection, then sends
+batches; each batch is acknowledged by id, and unacknowledged ones are resent after a
+reconnect. Batch ids increase within a reporter run and the collector keeps the highest
+applied id per run (saved with its snapshot), so resent batches are dropped however long
+the outage was - delivery is effectively exactly-once. There is no TLS, run it over a VPN / SSH tunnel between sites.
+
+Usage:
+    # Central:
+    python fleet.py collector --port 9478 --snapshot fleet_inventory.json
+
+    # Each site, in cerberus_scan.py:
+    FLEET_COLLECTOR = "collector.example.com:9478"
+
+    # Ask the collector:
+    python fleet.py query --collector localhost:9478 --mac aa:bb:cc:dd:ee:ff
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import os
+import shutil
+import signal
+import socket
+import struct
+import sys
+import threading
+import time
+import zlib
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import cerberus_logger
+import cerberus_metrics as metrics
+
+logger = cerberus_logger.get_logger("cerberus.fleet")
+
+DEFAULT_PORT = 9478
+PROTOCOL_VERSION = 1
+MAX_FRAME = 16 * 1024 * 1024    # Compressed frame limit
+MAX_MESSAGE = 64 * 1024 * 1024    # Decompressed limit (zlib bombs)
+
+SNAPSHOT_SLICE = 500    # Devices encoded per event loop turn while snapshotting
+
+ALERT_EVENTS = ("intruder", "gateway_impersonation", "duplicate_ip", "rapid_rebind", "mac_flood", "mac_moved")
+
+_FRAME = struct.Struct(">I")
+
+FLEET_SENTINELS = metrics.gauge("cerberus_fleet_sentinels", "Sentinels connected to the collector.")
+FLEET_DEVICES = metrics.gauge("cerberus_fleet_devices", "Devices in the fleet inventory.")
+FLEET_BATCHES = metrics.counter("cerberus_fleet_batches_total", "Batches applied by the collector.")
+FLEET_DUPLICATES = metrics.counter("cerberus_fleet_duplicate_batches_total", "Resent batches the collector skipped.")
+FLEET_SPOOLED = metrics.counter("cerberus_fleet_spooled_total", "Batches spooled while the collector was down.")
+
+
+class FleetError(Exception):
+    """Protocol error or rejected connection."""
+
+# ========================= Framing =========================
+
+def encode_frame(message: dict) -> bytes:
+    payload = zlib.compress(json.dumps(message, separators=(",", ":"), default=str).encode("utf-8"), 6)
+    return _FRAME.pack(len(payload)) + payload
+
+
+def decode_payload(payload: bytes) -> dict:
+    inflater = zlib.decompressobj()
+    data = inflater.decompress(payload, MAX_MESSAGE)
+    if inflater.unconsumed_tail:
+        raise FleetError("message too large")
+    message = json.loads(data)
+    if not isinstance(message, dict):
+        raise FleetError("message is not an object")
+    return message
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = bytearray()
+    while len(chunks) < size:
+        chunk = sock.recv(size - len(chunks))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        chunks += chunk
+    return bytes(chunks)
+
+
+def recv_frame(sock: socket.socket) -> dict:
+    """Blocking read of one frame (sentinel side)."""
+    length = _FRAME.unpack(_recv_exact(sock, _FRAME.size))[0]
+    if length > MAX_FRAME:
+        raise FleetError(f"frame of {length} bytes")
+    return decode_payload(_recv_exact(sock, length))
+
+
+async def read_frame(reader: asyncio.StreamReader) -> dict:
+    """Async read of one frame (collector side)."""
+    length = _FRAME.unpack(await reader.readexactly(_FRAME.size))[0]
+    if length > MAX_FRAME:
+        raise FleetError(f"frame of {length} bytes")
+    return decode_payload(await reader.readexactly(length))
+
+
+def parse_address(address: str, default_port: int = DEFAULT_PORT) -> Tuple[str, int]:
+    """'host:port' (or just 'host') -> (host, port)."""
+    host, _, port = address.rpartition(":")
+    if not host:
+        return port or "localhost", default_port
+    return host.strip("[]"), int(port)
+
+# ========================= Reporter (Sentinel Side) =========================
+
+class FleetReporter:
+    """
+    Batches sightings and events of one sentinel and delivers them to the collector,
+    spooling to disk while it is unreachable. Thread-safe, sighting() / emit() never block.
+    """
+
+    def __init__(self, address: Tuple[str, int], sentinel: Optional[str] = None, site: Optional[str] = None,
+                 token: Optional[str] = None, spool_path: Optional[str] = None, interval: float = 2.0,
+                 refresh: float = 300.0, max_batch: int = 5000, queue_size: int = 100000,
+                 spool_limit: int = 64 * 1024 * 1024, timeout: float = 10.0, backoff: float = 1.0,
+                 max_backoff: float = 60.0, keepalive: float = 30.0, clock: Callable[[], float] = time.time):
+        """
+        Args:
+            address: (host, port) of the collector
+            sentinel: Id of this sentinel, default the hostname
+            site: Free-form site name shown in the inventory
+            token: Shared secret the collector expects in the hello
+            spool_path: File batches are spooled to while the collector is down, None = keep none
+            interval: Seconds sightings/events are collected into one batch
+            refresh: A device already reported is re-sent after this many seconds (last seen)
+            max_batch: Max sightings + events per batch
+            queue_size: Max queued events, the oldest are dropped beyond it
+            spool_limit: Max spool file size in bytes, newer batches are dropped beyond it
+            timeout: Connect / acknowledgement timeout in seconds
+            backoff / max_backoff: Reconnect delay, doubled per failure up to max_backoff
+            keepalive: An empty batch is sent after this many idle seconds (liveness)
+            clock: Wall clock for sighting timestamps
+        """
+        self.address = address
+        self.sentinel = sentinel or socket.gethostname()
+        self.site = site
+        self.token = token
+        self.spool_path = spool_path
+        self.interval = interval
+        self.refresh = refresh
+        self.max_batch = max_batch
+        self.queue_size = queue_size
+        self.spool_limit = spool_limit
+        self.timeout = timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.keepalive = keepalive
+        self.clock = clock
+
+        self._sightings: "collections.OrderedDict[str, dict]" = collections.OrderedDict()
+        self._events = collections.deque()
+        self._reported: Dict[str, Tuple[Optional[str], float]] = {}    # mac -> (ip, last sent)
+        self._cond = threading.Condition()
+        self._closing = False
+        self._thread = None
+
+        self._sock = None
+        self._failures = 0
+        self._retry_at = 0.0
+        self._last_sent = 0.0
+        self._epoch = int(time.time() * 1000)    # Batch ids are (epoch, seq), unique across restarts
+        self._seq = 0
+
+        self.sent = 0
+        self.spooled = 0
+        self.dropped = 0
+
+    # ------------------------- Producers -------------------------
+
+    def sighting(self, devices: Iterable[dict]) -> int:
+        """Queues the devices which are new, changed IP or are due for a refresh. Returns how many."""
+        now = self.clock()
+        queued = 0
+        with self._cond:
+            for device in devices:
+                mac, ip = device.get("mac"), device.get("ip")
+                if not mac:
+                    continue
+                previous = self._reported.get(mac)
+                # Delta: wahi MAC wahi IP pe dobara dikha toh refresh tak kuch mat bhejo.
+                if previous is not None and previous[0] == ip and now - previous[1] < self.refresh:
+                    continue
+                self._reported[mac] = (ip, now)
+                self._sightings[mac] = {"mac": mac, "ip": ip, "seen": now, "segment": device.get("segment"),
+                                        "source": device.get("source", "sweep")}
+                queued += 1
+            if queued:
+                self._cond.notify()
+        return queued
+
+    def emit(self, event: str, **fields) -> None:
+        """Queues one event (same signature as EventSink.emit, so it plugs into emit_event)."""
+        fields["event"] = event
+        fields.setdefault("ts", self.clock())
+        with self._cond:
+            if len(self._events) >= self.queue_size:
+                self._events.popleft()
+                self.dropped += 1
+            self._events.append(fields)
+            self._cond.notify()
+
+    # ------------------------- Lifecycle -------------------------
+
+    def start(self) -> "FleetReporter":
+        self._thread = threading.Thread(target=self._run, name="cerberus-fleet", daemon=True)
+        self._thread.start()
+        logger.info(f"Reporting to fleet collector {self.address[0]}:{self.address[1]} as '{self.sentinel}'.")
+        return self
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Sends what is queued (or spools it) and stops the worker."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self._disconnect()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"sent": self.sent, "spooled": self.spooled, "dropped": self.dropped,
+                    "queued": len(self._sightings) + len(self._events), "connected": self._sock is not None}
+
+    # ------------------------- Worker -------------------------
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._closing:
+                    self._cond.wait(self.interval)
+                closing = self._closing
+                batch = self._take_batch()
+
+            if batch is not None:
+                self._deliver(batch)
+            elif closing:
+                pass
+            elif self._sock is None:
+                # Bhejne ko kuch nahi, par spool khali karna hai (aur collector ko pata chale hum zinda hain).
+                if self._connect():
+                    self._drain_spool()
+            elif time.monotonic() - self._last_sent >= self.keepalive:
+                self._heartbeat()
+            if closing:
+                with self._cond:
+                    if not self._sightings and not self._events:
+                        return
+
+    def _take_batch(self) -> Optional[dict]:
+        """Called with the lock held."""
+        if not self._sightings and not self._events:
+            return None
+        sightings, events = [], []
+        while self._sightings and len(sightings) < self.max_batch:
+            sightings.append(self._sightings.popitem(last=False)[1])
+        while self._events and len(sightings) + len(events) < self.max_batch:
+            events.append(self._events.popleft())
+        return {"sightings": sightings, "events": events}
+
+    def _next_frame(self, batch: dict) -> bytes:
+        self._seq += 1
+        batch.update(type="batch", id=[self._epoch, self._seq], sent=self.clock())
+        return encode_frame(batch)
+
+    def _deliver(self, batch: dict) -> None:
+        frame = self._next_frame(batch)
+        if self._connect() and self._drain_spool():
+            try:
+                self._send(frame)
+                self.sent += 1
+                return
+            except (OSError, FleetError, ValueError) as e:
+                logger.warning(f"Fleet collector connection lost ({e}).")
+                self._failed()
+        self._spool(frame)
+
+    def _heartbeat(self) -> None:
+        """Empty batch keeping an idle connection alive. Never spooled."""
+        try:
+            self._send(self._next_frame({"sightings": [], "events": []}))
+        except (OSError, FleetError, ValueError) as e:
+            logger.warning(f"Fleet collector connection lost ({e}).")
+            self._failed()
+
+    def _send(self, frame: bytes) -> None:
+        """Sends one batch frame and waits for its acknowledgement."""
+        sock = self._sock
+        sock.sendall(frame)
+        reply = recv_frame(sock)
+        if reply.get("type") != "ack":
+            raise FleetError(f"unexpected reply {reply.get('type')!r}")
+        self._last_sent = time.monotonic()
+
+    # ------------------------- Connection -------------------------
+
+    def _connect(self) -> bool:
+        if self._sock is not None:
+            return True
+        if time.monotonic() < self._retry_at:
+            return False
+        try:
+            sock = socket.create_connection(self.address, timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.sendall(encode_frame({"type": "hello", "role": "sentinel", "sentinel": self.sentinel,
+                                       "site": self.site, "token": self.token, "version": PROTOCOL_VERSION}))
+            reply = recv_frame(sock)
+            if reply.get("type") != "welcome":
+                sock.close()
+                raise FleetError(reply.get("error") or "rejected")
+        except (OSError, FleetError, ValueError) as e:
+            self._failed()
+            if self._failures == 1:
+                logger.warning(f"Fleet collector unreachable ({e}), spooling until it is back.")
+            return False
+
+        self._sock = sock
+        if self._failures:
+            logger.info(f"Fleet collector back after {self._failures} failed attempts.")
+        self._failures = 0
+        return True
+
+    def _failed(self) -> None:
+        self._disconnect()
+        self._failures += 1
+        delay = min(self.max_backoff, self.backoff * (2 ** (self._failures - 1)))
+        self._retry_at = time.monotonic() + delay
+
+    def _disconnect(self) -> None:
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    # ------------------------- Spool -------------------------
+
+    def _trim_spool(self, acked: int) -> None:
+        """Drops the first `acked` bytes (acknowledged frames) so the next replay does not resend them."""
+        if not acked:
+            return
+        temp = self.spool_path + ".tmp"
+        try:
+            with open(self.spool_path, "rb") as source, open(temp, "wb") as target:
+                source.seek(acked)
+                shutil.copyfileobj(source, target)
+            os.replace(temp, self.spool_path)
+        except OSError as e:
+            # Trim na ho paya toh bhi theek: collector resent batches ko id se pehchaan leta hai.
+            logger.warning(f"Could not trim fleet spool: {e}.")
+
+    def _spool(self, frame: bytes) -> None:
+        if not self.spool_path:
+            self.dropped += 1
+            return
+        try:
+            size = os.path.getsize(self.spool_path) if os.path.exists(self.spool_path) else 0
+            if size + len(frame) > self.spool_limit:
+                self.dropped += 1
+                logger.error(f"Fleet spool {self.spool_path} is full, batch dropped.")
+                return
+            with open(self.spool_path, "ab") as f:
+                f.write(frame)
+            self.spooled += 1
+            FLEET_SPOOLED.inc()
+        except OSError as e:
+            self.dropped += 1
+            logger.error(f"Could not spool fleet batch: {e}.")
+
+    def _drain_spool(self) -> bool:
+        """Sends spooled batches, oldest first. True when the spool is empty afterwards."""
+        path = self.spool_path
+        if not path or not os.path.exists(path) or os.path.getsize(path) == 0:
+            return True
+
+        sent = acked = 0
+        try:
+            with open(path, "rb") as f:
+                while True:
+                    header = f.read(_FRAME.size)
+                    if len(header) < _FRAME.size:
+                        break
+                    length = _FRAME.unpack(header)[0]
+                    payload = f.read(length)
+                    if len(payload) < length:
+                        break    # Half written frame (crash mid-spool), skip it
+                    self._send(header + payload)
+                    sent += 1
+                    acked = f.tell()
+        except (OSError, FleetError, ValueError) as e:
+            logger.warning(f"Fleet spool replay interrupted after {sent} batches ({e}).")
+            self._failed()
+            self.sent += sent
+            self._trim_spool(acked)
+            return False
+
+        os.remove(path)
+        self.sent += sent
+        logger.info(f"Replayed {sent} spooled batches to the fleet collector.")
+        return True
+
+# ========================= Inventory (Collector Side) =========================
+
+class FleetInventory:
+    """
+    Merged device inventory of every sentinel, indexed by MAC, IP and sentinel.
+    Only touched from the collector's event loop, so it needs no locking.
+    """
+
+    def __init__(self, alert_history: int = 10000, epochs: int = 64,
+                 vendor_lookup: Optional[Callable[[str], Optional[str]]] = None):
+        """
+        Args:
+            alert_history: Recent alerts kept for queries
+            epochs: Reporter runs (restarts) per sentinel whose last applied batch is remembered
+            vendor_lookup: mac -> vendor, default oui_lookup.describe_mac
+        """
+        self.devices: Dict[str, dict] = {}
+        self.by_ip: Dict[str, set] = {}
+        self.by_sentinel: Dict[str, set] = {}
+        self.sentinels: Dict[str, dict] = {}
+        self.alerts = collections.deque(maxlen=alert_history)
+        self.epochs = epochs
+        self.online = 0    # Sentinels with at least one open connection
+        self._marks: Dict[str, "collections.OrderedDict[int, int]"] = {}    # sentinel -> {epoch: last seq}
+
+        if vendor_lookup is None:
+            import oui_lookup
+            vendor_lookup = oui_lookup.describe_mac
+        self.vendor_lookup = vendor_lookup
+
+    # ------------------------- Updates -------------------------
+
+    def connected(self, sentinel: str, site: Optional[str], peer: Optional[str]) -> None:
+        info = self.sentinels.setdefault(sentinel, {"sentinel": sentinel, "first_seen": time.time(),
+                                                    "batches": 0, "connections": 0})
+        info.update(site=site, peer=peer, connected=True, connected_at=time.time())
+        info["connections"] += 1
+        # Reconnect jab purana half-open socket abhi band nahi hua - dono ginne padenge.
+        info["active"] = info.get("active", 0) + 1
+        if info["active"] == 1:
+            self.online += 1
+        self.by_sentinel.setdefault(sentinel, set())
+
+    def disconnected(self, sentinel: str) -> None:
+        """One connection of the sentinel closed; it is offline once its last one did."""
+        info = self.sentinels.get(sentinel)
+        if info is None or not info.get("active"):
+            return
+        info["active"] -= 1
+        if info["active"] == 0:
+            self.online -= 1
+            info["connected"] = False
+            info["disconnected_at"] = time.time()
+
+    def is_duplicate(self, sentinel: str, batch_id) -> bool:
+        """
+        True if the batch was applied before (resent after a reconnect or a spool replay),
+        else records it. A reporter numbers its batches (epoch, seq) with seq increasing
+        within one run (epoch) and sends them in order, so one high-water mark per epoch
+        catches a resend however long the replay was.
+        """
+        try:
+            epoch, seq = batch_id
+        except (TypeError, ValueError):
+            return False    # No usable id, nothing to compare with
+        if not isinstance(epoch, int) or not isinstance(seq, int):
+            return False
+
+        marks = self._marks.setdefault(sentinel, collections.OrderedDict())
+        mark = marks.get(epoch)
+        if mark is not None and seq <= mark:
+            return True
+        marks[epoch] = seq
+        marks.move_to_end(epoch)
+        while len(marks) > self.epochs:
+            marks.popitem(last=False)
+        return False
+
+    def apply(self, sentinel: str, batch: dict) -> int:
+        """Merges one batch. Returns the number of sightings + events applied."""
+        info = self.sentinels.get(sentinel)
+        if info is not None:
+            info["batches"] += 1
+            info["last_report"] = time.time()
+
+        sightings = batch.get("sightings") or []
+        events = batch.get("events") or []
+        for sighting in sightings:
+            if isinstance(sighting, dict) and sighting.get("mac"):
+                self._sighting(sentinel, sighting)
+        for event in events:
+            if isinstance(event, dict):
+                self._event(sentinel, event)
+        return len(sightings) + len(events)
+
+    def _sighting(self, sentinel: str, sighting: dict) -> None:
+        mac = str(sighting["mac"]).lower()
+        ip = sighting.get("ip")
+        seen = sighting.get("seen") or time.time()
+
+        device = self.devices.get(mac)
+        if device is None:
+            device = self.devices[mac] = {"mac": mac, "vendor": self.vendor_lookup(mac), "first_seen": seen,
+                                          "last_seen": seen, "ip": ip, "sentinel": sentinel, "intruder": False,
+                                          "sites": {}}
+        site = device["sites"].get(sentinel)
+        old_ip = site["ip"] if site is not None else None
+        device["sites"][sentinel] = {"ip": ip, "last_seen": seen, "segment": sighting.get("segment"),
+                                     "source": sighting.get("source")}
+        if seen >= device["last_seen"]:
+            device.update(last_seen=seen, ip=ip, sentinel=sentinel)
+
+        if old_ip != ip:
+            self._unindex_ip(mac, old_ip)
+            if ip:
+                self.by_ip.setdefault(ip, set()).add(mac)
+        self.by_sentinel.setdefault(sentinel, set()).add(mac)
+
+    def _unindex_ip(self, mac: str, ip: Optional[str]) -> None:
+        if not ip:
+            return
+        # Kisi aur site pe abhi bhi ye IP hai toh index me rehne do.
+        if any(site["ip"] == ip for site in self.devices[mac]["sites"].values()):
+            return
+        macs = self.by_ip.get(ip)
+        if macs is not None:
+            macs.discard(mac)
+            if not macs:
+                del self.by_ip[ip]
+
+    def _event(self, sentinel: str, event: dict) -> None:
+        name = event.get("event")
+        if name == "scan_completed":
+            info = self.sentinels.get(sentinel)
+            if info is not None:
+                info["last_scan"] = {key: value for key, value in event.items() if key != "event"}
+        elif name in ALERT_EVENTS:
+            self.alerts.append(dict(event, sentinel=sentinel))
+            mac = str(event.get("mac") or "").lower()
+            if name == "intruder" and mac in self.devices:
+                self.devices[mac]["intruder"] = True
+        elif name == "device_left":
+            mac = str(event.get("mac") or "").lower()
+            site = self.devices.get(mac, {}).get("sites", {}).get(sentinel)
+            if site is not None:
+                site["left"] = event.get("ts")
+
+    # ------------------------- Queries -------------------------
+
+    def device(self, mac: str) -> Optional[dict]:
+        return self.devices.get(mac.lower())
+
+    def devices_by_ip(self, ip: str) -> List[dict]:
+        return [self.devices[mac] for mac in sorted(self.by_ip.get(ip, ()))]
+
+    def devices_at(self, sentinel: str) -> List[dict]:
+        return [self.devices[mac] for mac in sorted(self.by_sentinel.get(sentinel, ()))]
+
+    def recent_alerts(self, since: float = 0.0, limit: int = 100) -> List[dict]:
+        alerts = [alert for alert in self.alerts if (alert.get("ts") or 0) >= since]
+        return alerts[-limit:]
+
+    def summary(self) -> dict:
+        return {
+            "sentinels": len(self.sentinels),
+            "connected": self.online,
+            "devices": len(self.devices),
+            "intruders": sum(1 for device in self.devices.values() if device["intruder"]),
+            "alerts": len(self.alerts),
+        }
+
+    def query(self, request: dict) -> dict:
+        """Answers one query message (mac / ip / sentinel / alerts, else the summary)."""
+        if request.get("mac"):
+            return {"device": self.device(request["mac"])}
+        if request.get("ip"):
+            return {"devices": self.devices_by_ip(request["ip"])}
+        if request.get("sentinel"):
+            return {"sentinel": self.sentinels.get(request["sentinel"]),
+                    "devices": self.devices_at(request["sentinel"])}
+        if request.get("alerts"):
+            return {"alerts": self.recent_alerts(float(request.get("since") or 0), int(request.get("limit") or 100))}
+        return {"summary": self.summary(), "sentinels": sorted(self.sentinels.values(), key=lambda i: i["sentinel"])}
+
+    # ------------------------- Snapshots -------------------------
+
+    def to_dict(self) -> dict:
+        return {"devices": list(self.devices.values()), "sentinels": list(self.sentinels.values()),
+                "alerts": list(self.alerts),
+                "marks": {sentinel: list(marks.items()) for sentinel, marks in self._marks.items()}}
+
+    def encode(self) -> Iterator[str]:
+        """
+        The snapshot as JSON text, one part per SNAPSHOT_SLICE devices. Each part is encoded
+        from the live inventory when it is pulled, so the collector can pull one per event
+        loop turn - no copy of the inventory, no stall of the connections.
+        """
+        data = self.to_dict()
+        yield "{"
+        for index, (key, value) in enumerate(data.items()):
+            yield ("," if index else "") + json.dumps(key) + ":"
+            if not isinstance(value, list):
+                yield json.dumps(value, separators=(",", ":"), default=str)
+                continue
+            yield "["
+            for start in range(0, len(value), SNAPSHOT_SLICE):
+                part = json.dumps(value[start:start + SNAPSHOT_SLICE], separators=(",", ":"), default=str)
+                yield ("," if start else "") + part[1:-1]
+            yield "]"
+        yield "}"
+
+    def save(self, path: str, parts: Optional[Iterable[str]] = None) -> None:
+        """Atomic JSON snapshot. `parts` lets the caller encode() in the loop and write elsewhere."""
+        temp = path + ".tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            f.writelines(parts if parts is not None else self.encode())
+        os.replace(temp, path)
+
+    def load(self, path: str) -> int:
+        """Restores a snapshot (sentinels start disconnected). Returns the number of devices."""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for info in data.get("sentinels", []):
+            info["connected"] = False
+            info["active"] = 0
+            self.sentinels[info["sentinel"]] = info
+        for device in data.get("devices", []):
+            mac = device["mac"]
+            self.devices[mac] = device
+            for sentinel, site in device.get("sites", {}).items():
+                self.by_sentinel.setdefault(sentinel, set()).add(mac)
+                if site.get("ip"):
+                    self.by_ip.setdefault(site["ip"], set()).add(mac)
+        self.alerts.extend(data.get("alerts", []))
+        # Collector restart ke baad bhi resent batches pehchaane jaane chahiye.
+        for sentinel, marks in data.get("marks", {}).items():
+            self._marks[sentinel] = collections.OrderedDict((epoch, seq) for epoch, seq in marks)
+        return len(self.devices)
+
+# ========================= Collector =========================
+
+class FleetCollector:
+    """asyncio TCP server merging sentinel batches into a FleetInventory."""
+
+    def __init__(self, inventory: Optional[FleetInventory] = None, host: str = "0.0.0.0", port: int = DEFAULT_PORT,
+                 token: Optional[str] = None, snapshot_path: Optional[str] = None, snapshot_interval: float = 60.0,
+                 idle_timeout: float = 300.0, hello_timeout: float = 10.0):
+        """
+        Args:
+            inventory: Inventory to merge into (default: a new one, restored from snapshot_path if it exists)
+            host / port: Listen address
+            token: Shared secret sentinels must send, None = accept everyone
+            snapshot_path: JSON file the inventory is saved to every snapshot_interval seconds
+            idle_timeout: A sentinel silent for this long is disconnected (reporters send keepalives)
+            hello_timeout: Seconds a new connection has to say hello
+        """
+        self.inventory = inventory or FleetInventory()
+        self.host = host
+        self.port = port
+        self.token = token
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self.idle_timeout = idle_timeout
+        self.hello_timeout = hello_timeout
+
+        self.server = None
+        self._writers = set()
+        self._snapshot_task = None
+        self._stop = None
+
+        if inventory is None and snapshot_path and os.path.exists(snapshot_path):
+            try:
+                loaded = self.inventory.load(snapshot_path)
+                logger.info(f"Restored {loaded} fleet devices from {snapshot_path}.")
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"Could not restore fleet snapshot {snapshot_path}: {e}.")
+
+    async def start(self) -> "FleetCollector":
+        self.server = await asyncio.start_server(self._handle, self.host, self.port, backlog=4096)
+        self.port = self.server.sockets[0].getsockname()[1]
+        if self.snapshot_path:
+            self._snapshot_task = asyncio.create_task(self._snapshot_loop())
+        logger.info(f"Fleet collector listening on {self.host}:{self.port}.")
+        return self
+
+    async def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            for writer in list(self._writers):
+                writer.close()
+            await self.server.wait_closed()
+        if self._snapshot_task is not None:
+            self._snapshot_task.cancel()
+        await self.snapshot()
+
+    async def run(self) -> None:
+        """Serves until SIGTERM / SIGINT."""
+        await self.start()
+        self._stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self._stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass    # Windows
+        try:
+            await self._stop.wait()
+        finally:
+            await self.close()
+            logger.info(f"Fleet collector stopped: {self.inventory.summary()}.")
+
+    # ------------------------- Connections -------------------------
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        peer = writer.get_extra_info("peername")
+        peer = f"{peer[0]}:{peer[1]}" if peer else None
+        sentinel = None
+        self._writers.add(writer)
+        try:
+            hello = await asyncio.wait_for(read_frame(reader), self.hello_timeout)
+            if hello.get("type") != "hello":
+                raise FleetError("expected hello")
+            if self.token is not None and hello.get("token") != self.token:
+                writer.write(encode_frame({"type": "error", "error": "bad token"}))
+                await writer.drain()
+                logger.warning(f"Fleet connection from {peer} rejected: bad token.")
+                return
+            writer.write(encode_frame({"type": "welcome", "version": PROTOCOL_VERSION}))
+            await writer.drain()
+
+            if hello.get("role", "sentinel") == "sentinel":
+                sentinel = str(hello.get("sentinel") or peer)
+                self.inventory.connected(sentinel, hello.get("site"), peer)
+                FLEET_SENTINELS.set(self.inventory.online)
+                logger.info(f"Sentinel '{sentinel}' connected from {peer}.")
+
+            while True:
+                message = await asyncio.wait_for(read_frame(reader), self.idle_timeout)
+                kind = message.get("type")
+                if kind == "batch" and sentinel is not None:
+                    if self.inventory.is_duplicate(sentinel, message.get("id")):
+                        FLEET_DUPLICATES.inc()
+                    else:
+                        self.inventory.apply(sentinel, message)
+                        FLEET_BATCHES.inc()
+                        FLEET_DEVICES.set(len(self.inventory.devices))
+                    writer.write(encode_frame({"type": "ack", "id": message.get("id")}))
+                elif kind == "query":
+                    writer.write(encode_frame(dict(self.inventory.query(message), type="result")))
+                else:
+                    raise FleetError(f"unexpected {kind!r}")
+                await writer.drain()
+
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except asyncio.TimeoutError:
+            logger.info(f"Fleet connection {sentinel or peer} idle, closed.")
+        except (FleetError, ValueError, zlib.error) as e:
+            logger.warning(f"Fleet connection {sentinel or peer} dropped: {e}.")
+        finally:
+            self._writers.discard(writer)
+            if sentinel is not None:
+                self.inventory.disconnected(sentinel)
+                FLEET_SENTINELS.set(self.inventory.online)
+                logger.info(f"Sentinel '{sentinel}' disconnected.")
+            writer.close()
+
+    # ------------------------- Snapshots -------------------------
+
+    async def _snapshot_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            await self.snapshot()
+
+    async def snapshot(self) -> None:
+        """
+        Saves the inventory. It is encoded slice by slice, yielding to the loop between
+        slices, and the file is written in a worker thread, so a big inventory never stalls
+        the sentinel connections.
+        """
+        if not self.snapshot_path:
+            return
+        parts = []
+        for part in self.inventory.encode():
+            parts.append(part)
+            await asyncio.sleep(0)
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.inventory.save, self.snapshot_path, parts)
+        except OSError as e:
+            logger.error(f"Could not save fleet snapshot: {e}.")
+
+# ========================= Query Client =========================
+
+def query(address: Tuple[str, int], request: dict, token: Optional[str] = None, timeout: float = 10.0) -> dict:
+    """One query to a collector (see FleetInventory.query for the request keys)."""
+    with socket.create_connection(address, timeout=timeout) as sock:
+        sock.sendall(encode_frame({"type": "hello", "role": "client", "token": token, "version": PROTOCOL_VERSION}))
+        reply = recv_frame(sock)
+        if reply.get("type") != "welcome":
+            raise FleetError(reply.get("error") or "rejected")
+        sock.sendall(encode_frame(dict(request, type="query")))
+        return recv_frame(sock)
+
+# ========================= CLI =========================
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Cerberus fleet collector and queries.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("collector", help="Run the central collector")
+    serve.add_argument("--host", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--token", help="Shared secret sentinels must present")
+    serve.add_argument("--snapshot", default="fleet_inventory.json", help="Inventory snapshot file")
+    serve.add_argument("--snapshot-interval", type=float, default=60.0)
+    serve.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on this port")
+    serve.add_argument("--log", default="cerberus_fleet.log")
+
+    ask = commands.add_parser("query", help="Query a running collector")
+    ask.add_argument("--collector", default=f"localhost:{DEFAULT_PORT}")
+    ask.add_argument("--token")
+    what = ask.add_mutually_exclusive_group()
+    what.add_argument("--mac")
+    what.add_argument("--ip")
+    what.add_argument("--sentinel")
+    what.add_argument("--alerts", action="store_true", help="Recent alerts of every sentinel")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "query":
+        request = {"mac": args.mac, "ip": args.ip, "sentinel": args.sentinel, "alerts": args.alerts}
+        try:
+            result = query(parse_address(args.collector), {k: v for k, v in request.items() if v}, token=args.token)
+        except (OSError, FleetError, ValueError) as e:
+            print(f"Query failed: {e}", file=sys.stderr)
+            return 1
+        result.pop("type", None)
+        print(json.dumps(result, indent=2, default=str))
+        return 0
+
+    cerberus_logger.setup_logging(log_file=args.log, queue_mode=True)
+    if args.metrics_port:
+        metrics.start_metrics_server(args.metrics_port)
+    collector = FleetCollector(host=args.host, port=args.port, token=args.token,
+                               snapshot_path=args.snapshot, snapshot_interval=args.snapshot_interval)
+    asyncio.run(collector.run())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+LAN Simulator Module
+
+This module is a simulated layer 2 network for testing and benchmarking Cerberus
+without a real network (or root). It plugs into the same transport interface the
+real raw sockets use, so the actual sweep engine runs unchanged on top of it:
+
+    - SimulatedLan: ARP transport - answers ARP requests for its live hosts, with
+      configurable reply loss and latency (base + random jitter)
+    - SimulatedIcmp: wake-up transport - only counts the echoes it gets
+
+Usage:
+    from lan_simulator import SimulatedLan
+    from arp_sweeper import ArpSweeper
+
+    lan = SimulatedLan("10.0.0.0/24", live_fraction=0.3, loss=0.01, latency=0.002)
+    sweeper = ArpSweeper("10.0.0.0/24", lan.gateway_mac, lan.gateway_ip, lan)
+    print(list(sweeper.sweep()))
+"""
+
+import heapq
+import ipaddress
+import random
+import socket
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from arp_sweeper import ARP_REPLY, ARP_REQUEST, build_arp_frame, parse_arp
+
+
+def simulated_mac(index: int) -> bytes:
+    """Deterministic locally administered MAC (02:...) for simulated host number `index`."""
+    return b"\x02\x00" + index.to_bytes(4, "big")
+
+
+class SimulatedLan:
+    """
+    In-memory L2 segment. send() receives our ARP requests, recv() hands out the
+    replies once their simulated latency has passed.
+    """
+
+    def __init__(self, network: str, live_fraction: float = 0.25, loss: float = 0.0,
+                 latency: float = 0.001, jitter: float = 0.001, seed: int = 1,
+                 hosts: Optional[Dict[str, bytes]] = None):
+        """
+        Args:
+            network: Simulated network in CIDR notation
+            live_fraction: Share of addresses with a live host on them
+            loss: Probability that a reply is lost
+            latency: Base reply latency in seconds
+            jitter: Extra random latency, uniform in [0, jitter]
+            seed: Random seed, so runs are repeatable
+            hosts: Optional explicit {ip: mac bytes} map instead of live_fraction
+        """
+        self.network = ipaddress.ip_network(network, strict=False)
+        self.loss = loss
+        self.latency = latency
+        self.jitter = jitter
+        self.random = random.Random(seed)
+
+        self.gateway_ip = str(next(self.network.hosts()))
+        self.gateway_mac = "02:00:ff:ff:ff:fe"
+
+        if hosts is None:
+            hosts = {}
+            for index, ip in enumerate(self.network.hosts()):
+                if str(ip) != self.gateway_ip and self.random.random() < live_fraction:
+                    hosts[str(ip)] = simulated_mac(index)
+        self.hosts = {socket.inet_aton(ip): mac for ip, mac in hosts.items()}
+
+        self.requests = 0
+        self.replies_sent = 0
+        self.replies_lost = 0
+
+        self._pending: List[Tuple[float, int, bytes]] = []
+        self._counter = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+    @property
+    def live_hosts(self) -> Dict[str, str]:
+        """{ip: mac} of every live simulated host."""
+        return {socket.inet_ntoa(ip): mac.hex(":") for ip, mac in self.hosts.items()}
+
+    def set_host(self, ip: str, mac: Optional[bytes]) -> None:
+        """Adds, moves or (with mac=None) removes a simulated host."""
+        key = socket.inet_aton(ip)
+        if mac is None:
+            self.hosts.pop(key, None)
+        else:
+            self.hosts[key] = mac
+
+    # ------------------------- Transport Interface -------------------------
+
+    def send(self, frame: bytes) -> None:
+        arp = parse_arp(bytes(frame))
+        if arp is None or arp[0] != ARP_REQUEST:
+            return
+
+        self.requests += 1
+        _op, sha, spa, _tha, tpa = arp
+        mac = self.hosts.get(tpa)
+        if mac is None:
+            return
+        if self.loss and self.random.random() < self.loss:
+            self.replies_lost += 1
+            return
+
+        reply = bytes(build_arp_frame(mac, tpa, sha, spa, op=ARP_REPLY))
+        due = time.monotonic() + self.latency + self.random.random() * self.jitter
+
+        with self._cond:
+            self._counter += 1
+            heapq.heappush(self._pending, (due, self._counter, reply))
+            self._cond.notify()
+        self.replies_sent += 1
+
+    def recv(self, timeout: float) -> Optional[bytes]:
+        deadline = time.monotonic() + max(timeout, 0)
+        with self._cond:
+            while not self._closed:
+                now = time.monotonic()
+                if self._pending and self._pending[0][0] <= now:
+                    return heapq.heappop(self._pending)[2]
+
+                wake_at = deadline
+                if self._pending:
+                    wake_at = min(wake_at, self._pending[0][0])
+                if wake_at <= now:
+                    return None
+                self._cond.wait(wake_at - now)
+        return None
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class SimulatedIcmp:
+    """Wake-up transport stand-in, it only counts what would have been sent."""
+
+    def __init__(self):
+        self.sent = 0
+
+    def send(self, packet: bytes, ip: str) -> None:
+        self.sent += 1
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,361 @@
+"""
+NDP Discovery Module
+
+This module is the IPv6 discovery engine of Cerberus. A /64 has 2^64 addresses, so
+sweeping it like an IPv4 range is impossible. Instead hosts are found with a constant
+number of packets, whatever the prefix size:
+
+    - one ICMPv6 echo request to ff02::1 (all-nodes), every IPv6 host on the link answers
+    - one neighbor solicitation per IPv6 address we already know, to re-check those
+    - passive capture of NDP traffic: neighbor solicitations/advertisements, router
+      solicitations/advertisements and duplicate address detection (DAD) probes, which
+      every host sends when it configures a new address
+
+Every sighting is an {"ip", "mac", "source"} dict, the same shape the ARP path uses, so
+IPv6 addresses are correlated to MACs in the same device registry.
+
+Usage:
+    from ndp_discovery import NdpDiscovery
+
+    ndp = NdpDiscovery.for_interface("eth0", on_device=print)
+    ndp.start()                 # passive capture + replies to our probes
+    ndp.probe(known_ipv6)       # multicast echo + NS for known addresses
+"""
+
+import ipaddress
+import os
+import socket
+import struct
+import threading
+import time
+from typing import Callable, Iterable, List, Optional
+
+import cerberus_logger
+from arp_sweeper import RawSocketTransport, bytes_to_mac, mac_to_bytes
+from wakeup_stage import internet_checksum
+
+logger = cerberus_logger.get_logger("cerberus.ndp_discovery")
+
+# ========================= Frame Layout =========================
+
+ETH_P_IPV6 = 0x86DD
+IPPROTO_ICMPV6 = 58
+
+ICMPV6_ECHO_REQUEST = 128
+ICMPV6_ECHO_REPLY = 129
+ND_ROUTER_SOLICIT = 133
+ND_ROUTER_ADVERT = 134
+ND_NEIGHBOR_SOLICIT = 135
+ND_NEIGHBOR_ADVERT = 136
+
+ND_OPT_SOURCE_LINKADDR = 1
+ND_OPT_TARGET_LINKADDR = 2
+
+ALL_NODES = "ff02::1"
+ALL_NODES_MAC = b"\x33\x33\x00\x00\x00\x01"
+UNSPECIFIED = b"\x00" * 16
+
+ETH_HEADER_LEN = 14
+IPV6_HEADER_LEN = 40
+ICMPV6_OFFSET = ETH_HEADER_LEN + IPV6_HEADER_LEN
+
+# Fixed part (after type/code/checksum) of each NDP message before its options.
+_ND_BODY_LEN = {
+    ND_ROUTER_SOLICIT: 4,
+    ND_ROUTER_ADVERT: 12,
+    ND_NEIGHBOR_SOLICIT: 20,
+    ND_NEIGHBOR_ADVERT: 20,
+}
+
+# packet(7) socket options, for receiving DAD probes sent to solicited-node groups.
+SOL_PACKET = 263
+PACKET_ADD_MEMBERSHIP = 1
+PACKET_MR_ALLMULTI = 2
+
+_ETH_HEADER = struct.Struct("!6s6sH")
+_IPV6_HEADER = struct.Struct("!IHBB16s16s")
+
+
+def multicast_mac(ip: bytes) -> bytes:
+    """Ethernet address for an IPv6 multicast group: 33:33 + the low 32 bits."""
+    return b"\x33\x33" + ip[12:]
+
+
+def solicited_node(ip: bytes) -> bytes:
+    """Solicited-node multicast group (ff02::1:ffXX:XXXX) of an IPv6 address."""
+    return b"\xff\x02" + b"\x00" * 9 + b"\x01\xff" + ip[13:]
+
+
+def icmpv6_checksum(src_ip: bytes, dst_ip: bytes, message: bytes) -> int:
+    """ICMPv6 checksum, which also covers the IPv6 pseudo-header."""
+    pseudo = src_ip + dst_ip + struct.pack("!I3xB", len(message), IPPROTO_ICMPV6)
+    return internet_checksum(pseudo + message)
+
+
+def build_icmpv6_frame(src_mac: bytes, dst_mac: bytes, src_ip: bytes, dst_ip: bytes,
+                       icmp_type: int, body: bytes, hop_limit: int = 255) -> bytes:
+    """Builds an Ethernet/IPv6/ICMPv6 frame with a valid checksum."""
+    message = bytearray(struct.pack("!BBH", icmp_type, 0, 0) + body)
+    struct.pack_into("!H", message, 2, icmpv6_checksum(src_ip, dst_ip, bytes(message)))
+
+    ip_header = _IPV6_HEADER.pack(6 << 28, len(message), IPPROTO_ICMPV6, hop_limit, src_ip, dst_ip)
+    return _ETH_HEADER.pack(dst_mac, src_mac, ETH_P_IPV6) + ip_header + bytes(message)
+
+
+def build_echo_request(src_mac: bytes, src_ip: bytes, ident: int, seq: int,
+                       dst_ip: bytes = socket.inet_pton(socket.AF_INET6, ALL_NODES)) -> bytes:
+    """ICMPv6 echo request, by default to all-nodes (every host on the link replies)."""
+    dst_mac = multicast_mac(dst_ip) if dst_ip[0] == 0xFF else ALL_NODES_MAC
+    body = struct.pack("!HH", ident, seq) + b"cerberus"
+    return build_icmpv6_frame(src_mac, dst_mac, src_ip, dst_ip, ICMPV6_ECHO_REQUEST, body, hop_limit=1)
+
+
+def build_neighbor_solicitation(src_mac: bytes, src_ip: bytes, target_ip: bytes) -> bytes:
+    """Neighbor solicitation for target_ip, sent to its solicited-node group."""
+    group = solicited_node(target_ip)
+    body = b"\x00" * 4 + target_ip + struct.pack("!BB", ND_OPT_SOURCE_LINKADDR, 1) + src_mac
+    return build_icmpv6_frame(src_mac, multicast_mac(group), src_ip, group, ND_NEIGHBOR_SOLICIT, body)
+
+# ========================= Parsing =========================
+
+def _link_addr_option(frame: bytes, offset: int, wanted: int) -> Optional[bytes]:
+    """Returns the link-layer address from an NDP option of type `wanted`, if present."""
+    while offset + 2 <= len(frame):
+        opt_type, opt_len = frame[offset], frame[offset + 1]
+        if opt_len == 0:
+            break    # Malformed, loop me phas jayenge warna
+        if opt_type == wanted and offset + 8 <= len(frame):
+            return frame[offset + 2:offset + 8]
+        offset += opt_len * 8
+    return None
+
+
+def _is_host_address(ip: bytes) -> bool:
+    return ip != UNSPECIFIED and ip[0] != 0xFF
+
+
+def _is_unicast_mac(mac: bytes) -> bool:
+    return not mac[0] & 0x01
+
+
+def parse_ndp_sighting(frame: bytes) -> Optional[dict]:
+    """
+    Extracts an (IPv6 address, MAC) sighting from an ICMPv6 frame.
+
+    Returns:
+        dict: {"ip", "mac", "source"} with source one of echo / ns / na / dad / rs / ra,
+              or None if the frame tells nothing about a neighbor.
+    """
+    if len(frame) < ICMPV6_OFFSET + 4:
+        return None
+
+    _dst, eth_src, ethertype = _ETH_HEADER.unpack_from(frame)
+    if ethertype != ETH_P_IPV6:
+        return None
+    _vtc, _length, next_header, hop_limit, src_ip, _dst_ip = _IPV6_HEADER.unpack_from(frame, ETH_HEADER_LEN)
+    # Extension headers (eg, MLD hop-by-hop) never carry NDP, unko skip karo.
+    if next_header != IPPROTO_ICMPV6:
+        return None
+
+    icmp_type = frame[ICMPV6_OFFSET]
+    body = ICMPV6_OFFSET + 4
+
+    if icmp_type == ICMPV6_ECHO_REPLY:
+        ip, mac, source = src_ip, eth_src, "echo"
+    elif icmp_type in _ND_BODY_LEN:
+        # NDP is link-local only, RFC 4861 says hop limit must still be 255.
+        if hop_limit != 255 or len(frame) < body + _ND_BODY_LEN[icmp_type]:
+            return None
+        options = body + _ND_BODY_LEN[icmp_type]
+
+        if icmp_type == ND_NEIGHBOR_ADVERT:
+            ip = frame[body + 4:body + 20]
+            mac = _link_addr_option(frame, options, ND_OPT_TARGET_LINKADDR) or eth_src
+            source = "na"
+        elif icmp_type == ND_NEIGHBOR_SOLICIT and src_ip == UNSPECIFIED:
+            # DAD: a host checking its new (tentative) address before using it.
+            ip, mac, source = frame[body + 4:body + 20], eth_src, "dad"
+        else:
+            ip = src_ip
+            mac = _link_addr_option(frame, options, ND_OPT_SOURCE_LINKADDR) or eth_src
+            source = {ND_NEIGHBOR_SOLICIT: "ns", ND_ROUTER_SOLICIT: "rs", ND_ROUTER_ADVERT: "ra"}[icmp_type]
+    else:
+        return None
+
+    if not _is_host_address(ip) or not _is_unicast_mac(mac):
+        return None
+
+    return {"ip": socket.inet_ntop(socket.AF_INET6, ip), "mac": bytes_to_mac(mac), "source": source}
+
+# ========================= Discovery Engine =========================
+
+class NdpDiscovery:
+    """
+    Active + passive IPv6 neighbor discovery on one interface. The number of packets
+    sent depends only on how many addresses we already know, never on the prefix size.
+    """
+
+    def __init__(self, interface: Optional[str], src_mac: str, src_ip: str, transport=None,
+                 on_device: Optional[Callable[[dict], None]] = None, ident: Optional[int] = None):
+        """
+        Args:
+            interface: Interface name, used in logs and sightings
+            src_mac: MAC address of the interface
+            src_ip: Link-local IPv6 address of the interface (fe80::...)
+            transport: Object with send(frame), recv(timeout) and close()
+            on_device: Called with {"ip", "mac", "source", "interface"} for every new address/MAC pair
+            ident: ICMPv6 echo identifier (default: derived from the PID)
+        """
+        self.interface = interface
+        self.src_mac = mac_to_bytes(src_mac)
+        self.src_ip = socket.inet_pton(socket.AF_INET6, src_ip.split("%")[0])
+        self.transport = transport
+        self.on_device = on_device
+        self.ident = (os.getpid() if ident is None else ident) & 0xFFFF
+
+        self.seen = set()
+        self.frames = 0
+        self.sent = 0
+        self._seq = 0
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_interface(cls, interface: str, on_device: Optional[Callable[[dict], None]] = None) -> "NdpDiscovery":
+        """
+        Creates an engine on a real interface (AF_PACKET, Linux only).
+
+        Raises:
+            OSError: If the interface has no link-local IPv6 address, or raw sockets are unavailable
+        """
+        import netifaces
+
+        addrs = netifaces.ifaddresses(interface)
+        link_local = [entry["addr"] for entry in addrs.get(netifaces.AF_INET6, [])
+                      if entry.get("addr", "").lower().startswith("fe80:")]
+        if not link_local:
+            raise OSError(f"no link-local IPv6 address on {interface}")
+        src_mac = addrs[netifaces.AF_LINK][0]["addr"]
+
+        transport = RawSocketTransport(interface, protocol=ETH_P_IPV6)
+        _join_all_multicast(transport, interface)
+        return cls(interface, src_mac, link_local[0], transport, on_device=on_device)
+
+    # ------------------------- Active Probing -------------------------
+
+    def probe(self, known_ips: Iterable[str] = ()) -> int:
+        """
+        Sends one all-nodes echo request plus a neighbor solicitation per known address.
+        Replies arrive through the capture thread (start()) or collect().
+
+        Returns:
+            int: Number of packets sent
+        """
+        self._seq = (self._seq + 1) & 0xFFFF
+        frames = [build_echo_request(self.src_mac, self.src_ip, self.ident, self._seq)]
+
+        for ip in known_ips:
+            try:
+                target = ipaddress.IPv6Address(ip.split("%")[0])
+            except ValueError:
+                continue
+            if not target.is_multicast and not target.is_unspecified:
+                frames.append(build_neighbor_solicitation(self.src_mac, self.src_ip, target.packed))
+
+        sent = 0
+        for frame in frames:
+            try:
+                self.transport.send(frame)
+                sent += 1
+            except OSError as e:
+                logger.debug(f"NDP send failed: {e}.")
+        self.sent += sent
+        return sent
+
+    def collect(self, timeout: float) -> List[dict]:
+        """Reads replies for `timeout` seconds (without the capture thread). Returns new sightings."""
+        found = []
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            frame = self.transport.recv(min(remaining, 0.1))
+            if frame is None:
+                continue
+            device = self.feed(frame)
+            if device is not None:
+                found.append(device)
+        return found
+
+    def discover(self, known_ips: Iterable[str] = (), timeout: float = 2.0) -> List[dict]:
+        """One-shot discovery: probe() then collect(). Used in learning mode."""
+        self.probe(known_ips)
+        return self.collect(timeout)
+
+    # ------------------------- Passive Capture -------------------------
+
+    def feed(self, frame: bytes) -> Optional[dict]:
+        """Processes one frame. Returns the sighting if the (address, MAC) pair is new."""
+        self.frames += 1
+        device = parse_ndp_sighting(frame)
+        if device is None or device["mac"] == bytes_to_mac(self.src_mac):
+            return None
+
+        key = (device["ip"], device["mac"])
+        with self._lock:
+            if key in self.seen:
+                return None
+            # Privacy addresses rotate forever - memory ko bounded rakho.
+            if len(self.seen) >= 65536:
+                self.seen.clear()
+            self.seen.add(key)
+
+        device["interface"] = self.interface
+        logger.debug("NDP %s: %s -> %s.", device['source'], device['ip'], device['mac'])
+        if self.on_device is not None:
+            try:
+                self.on_device(device)
+            except Exception as e:
+                logger.error(f"NDP callback failed: {e}.")
+        return device
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                frame = self.transport.recv(0.5)
+            except OSError as e:
+                logger.error(f"NDP capture failed: {e}.")
+                break
+            if frame is not None:
+                self.feed(frame)
+
+    def start(self) -> None:
+        """Starts the capture thread (passive NDP/RA/DAD plus replies to probe())."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cerberus-ndp", daemon=True)
+        self._thread.start()
+        logger.info(f"IPv6 neighbor discovery started on {self.interface}.")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.transport is not None:
+            self.transport.close()
+        logger.info(f"IPv6 discovery stopped after {self.frames} frames, {len(self.seen)} addresses.")
+
+
+def _join_all_multicast(transport: RawSocketTransport, interface: str) -> None:
+    """
+    DAD probes go to solicited-node groups we are not a member of, so the NIC drops
+    them unless it accepts all multicast. Best effort - without it we still see the rest.
+    """
+    try:
+        mreq = struct.pack("iHH8s", socket.if_nametoindex(interface), PACKET_MR_ALLMULTI, 0, b"")
+        transport.sock.setsockopt(SOL_PACKET, PACKET_ADD_MEMBERSHIP, mreq)
+    except OSError as e:
+        logger.debug(f"Could not enable all-multicast on {interface}: {e}.")
@@ -14,14 +14,12 @@ import os
 import sys
 import platform
 import subprocess
-import subprocess
-import requests
 import tempfile
 import time
 from typing import Optional, Tuple
-import winreg
-from scapy.all import conf
-import ctypes
+
+# winreg and ctypes.windll only exist on Windows, and requests / scapy are slow to
+# import, so all four are imported inside the functions that need them.
 
 try:
     import cerberus_logger
@@ -62,6 +60,7 @@ class NpcapInstaller:
         """
         # Method 1: Check Scapy functionality
         try:
+            from scapy.all import conf
             if hasattr(conf, 'L2listen'):
                 # Try to create a raw socket (actual functionality test)
                 test_socket = conf.L2listen()
@@ -74,6 +73,7 @@ class NpcapInstaller:
         # Method 2: Check Windows Registry
         try:
             if NpcapInstaller.is_windows():
+                import winreg
                 try:
                     key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, 
                                          r"SOFTWARE\Npcap", 
@@ -104,6 +104,7 @@ class NpcapInstaller:
     def check_admin_rights() -> bool:
         try:
             if NpcapInstaller.is_windows():
+                import ctypes
                 is_admin = ctypes.windll.shell32.IsUserAnAdmin() != 0
                 logger.debug(f"Admin rights check: {is_admin}.")
                 return is_admin
@@ -127,7 +128,8 @@ class NpcapInstaller:
         :destination: str: Where to save the file (type: string)
         -> bool: Returns a boolean (True = success, False = failure)
         """
-        
+        import requests
+
         try:
             logger.info(f"Downloading Npcap installer to: {destination}.")
             
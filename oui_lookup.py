@@ -0,0 +1,335 @@
+"""
+OUI Lookup Module
+
+This module tells the vendor of a MAC address (eg, "Apple, Inc." or "HP Inc."), fully
+offline, so alerts show at a glance whether an unknown device is a phone or a printer.
+
+The IEEE registries (MA-L /24, MA-M /28 and MA-S /36 assignments) are compiled once
+into a compact binary table - one sorted array of prefixes per assignment size plus a
+deduplicated vendor name blob. At runtime the file is memory-mapped and searched by
+bisection, so a lookup costs a few microseconds and only the touched pages become
+resident.
+
+Randomized MACs (locally administered bit set, used by phones for privacy) have no
+vendor, they are reported as such instead.
+
+A compiled table (oui.bin) ships next to the scripts; `update` rebuilds it from the
+current IEEE registries.
+
+Usage:
+    # Refresh the bundled table from the IEEE registries (needs internet once):
+    python oui_lookup.py update
+
+    # Or build it from CSVs downloaded by hand (https://regauth.standards.ieee.org/):
+    python oui_lookup.py compile oui.csv mam.csv oui36.csv -o oui.bin
+
+    from oui_lookup import describe_mac
+    describe_mac("3c:22:fb:12:34:56")    # 'Apple, Inc.'
+"""
+
+import argparse
+import csv
+import mmap
+import os
+import shutil
+import struct
+import sys
+import threading
+from typing import Dict, Iterable, Optional, Union
+
+import cerberus_logger
+
+logger = cerberus_logger.get_logger("cerberus.oui_lookup")
+
+DEFAULT_TABLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "oui.bin")
+
+RANDOMIZED = "Randomized (locally administered)"
+
+# ========================= File Format =========================
+#
+#   header:   magic "CERBOUI1", table count (u32)
+#   tables:   per table - prefix bits (u8), 3 pad, entry count (u32), entries offset (u32)
+#   entries:  sorted (prefix u64, name offset u32), big-endian, 12 bytes each
+#   names:    u8 length + UTF-8 bytes, every vendor stored once
+#
+# Tables are ordered most specific first (/36, /28, /24), so the first hit is the
+# longest prefix match.
+
+MAGIC = b"CERBOUI1"
+_HEADER = struct.Struct(">8sI")
+_TABLE = struct.Struct(">B3xII")
+_ENTRY = struct.Struct(">QI")
+
+REGISTRY_BITS = {"MA-L": 24, "MA-M": 28, "MA-S": 36}
+_HEX_DIGITS_BITS = {6: 24, 7: 28, 9: 36}
+
+# Public IEEE registry downloads (MA-L, MA-M, MA-S), see update_table.
+IEEE_REGISTRIES = (
+    "https://standards-oui.ieee.org/oui/oui.csv",
+    "https://standards-oui.ieee.org/oui28/mam.csv",
+    "https://standards-oui.ieee.org/oui36/oui36.csv",
+)
+
+MacLike = Union[str, int, bytes]
+
+
+def _mac_int(mac: MacLike) -> int:
+    if isinstance(mac, int):
+        return mac
+    if isinstance(mac, (bytes, bytearray)):
+        return int.from_bytes(mac, "big")
+    digits = mac.translate(str.maketrans("", "", ":-. "))
+    if len(digits) != 12:
+        raise ValueError(f"Invalid MAC address: {mac!r}")
+    return int(digits, 16)
+
+
+def is_locally_administered(mac: MacLike) -> bool:
+    """True for randomized / software assigned MACs (U/L bit of the first octet set)."""
+    return bool((_mac_int(mac) >> 40) & 0x02)
+
+
+def is_multicast(mac: MacLike) -> bool:
+    return bool((_mac_int(mac) >> 40) & 0x01)
+
+# ========================= Compiler =========================
+
+def read_ieee_csv(path: str) -> Dict[tuple, str]:
+    """
+    Reads one IEEE registry CSV (columns: Registry, Assignment, Organization Name, ...).
+
+    Returns:
+        dict: {(prefix_bits, prefix): vendor}
+    """
+    entries = {}
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            assignment = (row.get("Assignment") or "").strip().upper()
+            vendor = " ".join((row.get("Organization Name") or "").split())
+            bits = REGISTRY_BITS.get((row.get("Registry") or "").strip().upper())
+            if bits is None:
+                bits = _HEX_DIGITS_BITS.get(len(assignment))
+            if not assignment or not vendor or bits is None or len(assignment) * 4 != bits:
+                continue
+            try:
+                entries[(bits, int(assignment, 16))] = vendor
+            except ValueError:
+                continue
+    return entries
+
+
+def compile_table(csv_paths: Iterable[str], output: str) -> int:
+    """
+    Compiles IEEE CSVs into the binary lookup table. Written to a temp file first and
+    renamed, so a running Cerberus never maps a half written table.
+
+    Returns:
+        int: Number of prefixes written
+    """
+    entries = {}
+    for path in csv_paths:
+        entries.update(read_ieee_csv(path))
+
+    names, blob = {}, bytearray()
+    tables = {}
+    for (bits, prefix), vendor in entries.items():
+        offset = names.get(vendor)
+        if offset is None:
+            encoded = vendor.encode("utf-8")[:255]
+            offset = names[vendor] = len(blob)
+            blob += bytes([len(encoded)]) + encoded
+        tables.setdefault(bits, []).append((prefix, offset))
+
+    order = sorted(tables, reverse=True)
+    entries_start = _HEADER.size + _TABLE.size * len(order)
+    names_start = entries_start + _ENTRY.size * len(entries)
+
+    out = bytearray(_HEADER.pack(MAGIC, len(order)))
+    body = bytearray()
+    for bits in order:
+        rows = sorted(tables[bits])
+        out += _TABLE.pack(bits, len(rows), entries_start + len(body))
+        for prefix, offset in rows:
+            body += _ENTRY.pack(prefix, names_start + offset)
+
+    temp = output + ".tmp"
+    with open(temp, "wb") as f:
+        f.write(out + body + blob)
+    os.replace(temp, output)
+
+    logger.info(f"Compiled {len(entries)} OUI prefixes ({len(names)} vendors) into {output}.")
+    return len(entries)
+
+
+def update_table(output: str = DEFAULT_TABLE, urls: Iterable[str] = IEEE_REGISTRIES, timeout: float = 60.0) -> int:
+    """
+    Downloads the IEEE registry CSVs and compiles them into `output`. The old table stays
+    in place if any download fails.
+
+    Returns:
+        int: Number of prefixes written
+    """
+    # Sirf update pe chahiye, lookup path pe urllib load nahi hona chahiye.
+    import tempfile
+    import urllib.request
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for url in urls:
+            path = os.path.join(tmp, url.rsplit("/", 1)[-1])
+            # IEEE rejects urllib's default User-Agent.
+            request = urllib.request.Request(url, headers={"User-Agent": "cerberus-oui-update"})
+            logger.info(f"Downloading {url}")
+            with urllib.request.urlopen(request, timeout=timeout) as response, open(path, "wb") as f:
+                shutil.copyfileobj(response, f)
+            paths.append(path)
+        return compile_table(paths, output)
+
+# ========================= Lookup =========================
+
+class OuiTable:
+    """Read-only, memory-mapped view of a compiled OUI table."""
+
+    def __init__(self, path: str = DEFAULT_TABLE):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            self.tables = self._read_tables(path)
+        except ValueError:
+            self._mm.close()
+            raise
+        self.path = path
+
+    def _read_tables(self, path: str) -> list:
+        """Header and table directory, checked against the file size (truncated file = ValueError)."""
+        size = len(self._mm)
+        if size < _HEADER.size:
+            raise ValueError(f"{path} is truncated")
+        magic, count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a compiled OUI table")
+        if _HEADER.size + count * _TABLE.size > size:
+            raise ValueError(f"{path} is truncated")
+
+        tables = [_TABLE.unpack_from(self._mm, _HEADER.size + i * _TABLE.size) for i in range(count)]
+        for _bits, entries, start in tables:
+            if start + entries * _ENTRY.size > size:
+                raise ValueError(f"{path} is truncated")
+        return tables
+
+    def __len__(self) -> int:
+        return sum(count for _bits, count, _offset in self.tables)
+
+    def _name(self, offset: int) -> str:
+        length = self._mm[offset]
+        return self._mm[offset + 1:offset + 1 + length].decode("utf-8", "replace")
+
+    def lookup(self, mac: MacLike) -> Optional[str]:
+        """Vendor of the longest matching prefix, or None."""
+        value = _mac_int(mac)
+        mm, unpack = self._mm, _ENTRY.unpack_from
+
+        for bits, count, start in self.tables:
+            key = value >> (48 - bits)
+            lo, hi = 0, count
+            # Bisection directly over the mapped entries - kuch bhi memory me load nahi hota.
+            while lo < hi:
+                mid = (lo + hi) // 2
+                prefix, name_offset = unpack(mm, start + mid * _ENTRY.size)
+                if prefix < key:
+                    lo = mid + 1
+                elif prefix > key:
+                    hi = mid
+                else:
+                    return self._name(name_offset)
+        return None
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+_default_table = None
+_default_path = DEFAULT_TABLE
+_default_lock = threading.Lock()
+
+
+def set_table_path(path: str) -> None:
+    """Points the module level lookups at another compiled table (reopened on next use)."""
+    global _default_table, _default_path
+    with _default_lock:
+        if isinstance(_default_table, OuiTable):
+            _default_table.close()
+        _default_table, _default_path = None, path
+
+
+def _table() -> Optional[OuiTable]:
+    global _default_table
+    if _default_table is None:
+        with _default_lock:
+            if _default_table is None:
+                try:
+                    _default_table = OuiTable(_default_path)
+                except (OSError, ValueError) as e:
+                    logger.debug(f"OUI table unavailable ({e}), vendor lookup disabled.")
+                    _default_table = False
+    return _default_table if _default_table is not False else None
+
+
+def lookup_vendor(mac: MacLike) -> Optional[str]:
+    """Vendor from the default table, None if unknown or no table is installed."""
+    table = _table()
+    if table is None:
+        return None
+    try:
+        return table.lookup(mac)
+    except (ValueError, IndexError, struct.error):
+        return None    # Bad MAC, or a vendor name offset pointing outside a damaged table
+
+
+def describe_mac(mac: MacLike) -> Optional[str]:
+    """Vendor name, or RANDOMIZED for locally administered MACs, or None if unknown."""
+    try:
+        if is_locally_administered(mac):
+            return RANDOMIZED
+    except ValueError:
+        return None
+    return lookup_vendor(mac)
+
+# ========================= CLI =========================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline OUI vendor table.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("compile", help="Compile IEEE MA-L/MA-M/MA-S CSVs into a lookup table")
+    build.add_argument("csv", nargs="+", help="IEEE registry CSV files (oui.csv, mam.csv, oui36.csv)")
+    build.add_argument("-o", "--output", default=DEFAULT_TABLE, help="Output table (default: oui.bin)")
+
+    update = commands.add_parser("update", help="Download the IEEE registries and compile them")
+    update.add_argument("-o", "--output", default=DEFAULT_TABLE, help="Output table (default: oui.bin)")
+
+    find = commands.add_parser("lookup", help="Look up MAC addresses")
+    find.add_argument("mac", nargs="+")
+    find.add_argument("-t", "--table", default=DEFAULT_TABLE)
+
+    args = parser.parse_args(argv)
+    if args.command == "compile":
+        compile_table(args.csv, args.output)
+        return 0
+    if args.command == "update":
+        try:
+            update_table(args.output)
+        except OSError as e:
+            logger.error(f"OUI update failed ({e}), keeping the current table.")
+            return 1
+        return 0
+
+    set_table_path(args.table)
+    for mac in args.mac:
+        print(f"{mac}  {describe_mac(mac) or 'Unknown vendor'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+"""
+Passive Monitor Module
+
+This module listens (without sending anything) to ARP, gratuitous ARP and DHCP
+traffic on the monitored interface and reports every newly seen MAC address
+straight away. Active sweeps only run every SCAN_INTERVAL, so a device which joins
+and leaves between two sweeps would be missed - passive monitor usko turant pakad leta hai.
+
+Frames can also be fed by hand through `feed()` / `replay()`, which is how captured
+traffic is replayed through the same detection path.
+
+Usage:
+    from passive_monitor import PassiveMonitor
+
+    monitor = PassiveMonitor("eth0", on_device=print)
+    monitor.start()
+"""
+
+import socket
+import struct
+import threading
+from typing import Callable, Iterable, Optional
+
+import cerberus_logger
+from arp_sweeper import ETH_P_ALL, ETH_P_ARP, ETH_P_IP, RawSocketTransport, bytes_to_mac, parse_arp
+
+logger = cerberus_logger.get_logger("cerberus.passive_monitor")
+
+DHCP_SERVER_PORT = 67
+DHCP_CLIENT_PORT = 68
+DHCP_MAGIC_COOKIE = b"\x63\x82\x53\x63"
+
+DHCP_OPT_REQUESTED_IP = 50
+DHCP_OPT_MESSAGE_TYPE = 53
+DHCP_OPT_END = 255
+DHCP_OPT_PAD = 0
+
+DHCP_ACK = 5
+
+_ETH_HEADER = struct.Struct("!6s6sH")
+_UDP_PORTS = struct.Struct("!HH")
+
+_ARP_ETHERTYPE = struct.pack("!H", ETH_P_ARP)
+
+# Classic BPF: accept ARP, and IPv4 UDP to port 67/68 (unfragmented), drop everything
+# else in the kernel. The capture socket is ETH_P_ALL, without this every frame on the
+# link would be copied to userspace.
+ARP_DHCP_FILTER = [
+    (0x28, 0, 0, 12),                   # ldh [12]           ethertype
+    (0x15, 9, 0, ETH_P_ARP),            # jeq ARP            -> accept
+    (0x15, 0, 9, ETH_P_IP),             # jeq IPv4 else      -> drop
+    (0x30, 0, 0, 23),                   # ldb [23]           IP protocol
+    (0x15, 0, 7, socket.IPPROTO_UDP),   # jeq UDP else       -> drop
+    (0x28, 0, 0, 20),                   # ldh [20]           flags + fragment offset
+    (0x45, 5, 0, 0x1FFF),               # jset fragment      -> drop
+    (0xB1, 0, 0, 14),                   # ldxb 4*([14]&0xf)  IP header length
+    (0x48, 0, 0, 16),                   # ldh [x+16]         UDP destination port
+    (0x15, 1, 0, DHCP_SERVER_PORT),     # jeq 67             -> accept
+    (0x15, 0, 1, DHCP_CLIENT_PORT),     # jeq 68 else        -> drop
+    (0x06, 0, 0, 0x40000),              # accept
+    (0x06, 0, 0, 0),                    # drop
+]
+
+# ========================= Frame Parsers =========================
+
+def parse_arp_sighting(frame: bytes) -> Optional[dict]:
+    """
+    Extracts the sender of any ARP frame (request, reply or gratuitous).
+
+    Returns:
+        dict: {"ip", "mac", "source"} or None if the frame is not usable
+    """
+    arp = parse_arp(frame)
+    if arp is None:
+        return None
+
+    _op, sha, spa, _tha, tpa = arp
+    # ARP probes (RFC 5227) use 0.0.0.0 as sender - MAC toh mil gaya, IP abhi nahi hai.
+    ip = None if spa == b"\x00\x00\x00\x00" else socket.inet_ntoa(spa)
+    source = "garp" if spa == tpa else "arp"
+
+    return {"ip": ip, "mac": bytes_to_mac(sha), "source": source}
+
+
+def _dhcp_options(payload: bytes, offset: int) -> dict:
+    options = {}
+    end = len(payload)
+    while offset < end:
+        code = payload[offset]
+        if code == DHCP_OPT_END:
+            break
+        if code == DHCP_OPT_PAD:
+            offset += 1
+            continue
+        if offset + 1 >= end:
+            break
+        length = payload[offset + 1]
+        options[code] = payload[offset + 2:offset + 2 + length]
+        offset += 2 + length
+    return options
+
+
+def parse_dhcp_sighting(frame: bytes) -> Optional[dict]:
+    """
+    Extracts the client MAC and its (requested or assigned) IP from a DHCP frame.
+
+    Returns:
+        dict: {"ip", "mac", "source"} or None if the frame is not DHCP
+    """
+    if len(frame) < 14 + 20 + 8:
+        return None
+
+    ethertype = _ETH_HEADER.unpack_from(frame)[2]
+    if ethertype != ETH_P_IP or frame[23] != socket.IPPROTO_UDP:
+        return None
+
+    ihl = (frame[14] & 0x0F) * 4
+    udp = 14 + ihl
+    src_port, dst_port = _UDP_PORTS.unpack_from(frame, udp)
+    if {src_port, dst_port} != {DHCP_SERVER_PORT, DHCP_CLIENT_PORT}:
+        return None
+
+    bootp = udp + 8
+    # BOOTP fixed header is 236 bytes followed by the 4 byte magic cookie.
+    if len(frame) < bootp + 240 or frame[bootp + 236:bootp + 240] != DHCP_MAGIC_COOKIE:
+        return None
+    if frame[bootp + 1] != 1 or frame[bootp + 2] != 6:    # htype Ethernet, hlen 6
+        return None
+
+    chaddr = frame[bootp + 28:bootp + 34]
+    ciaddr = frame[bootp + 12:bootp + 16]
+    yiaddr = frame[bootp + 16:bootp + 20]
+    options = _dhcp_options(frame, bootp + 240)
+
+    message_type = options.get(DHCP_OPT_MESSAGE_TYPE, b"\x00")[0]
+    if message_type == DHCP_ACK:
+        ip_raw = yiaddr
+    else:
+        ip_raw = options.get(DHCP_OPT_REQUESTED_IP) or ciaddr
+
+    ip = None if len(ip_raw) != 4 or ip_raw == b"\x00\x00\x00\x00" else socket.inet_ntoa(ip_raw)
+    return {"ip": ip, "mac": bytes_to_mac(chaddr), "source": "dhcp"}
+
+
+def parse_sighting(frame: bytes) -> Optional[dict]:
+    """Dispatches a raw Ethernet frame to the ARP or DHCP parser."""
+    if len(frame) < 14:
+        return None
+    ethertype = _ETH_HEADER.unpack_from(frame)[2]
+    if ethertype == ETH_P_ARP:
+        return parse_arp_sighting(frame)
+    if ethertype == ETH_P_IP:
+        return parse_dhcp_sighting(frame)
+    return None
+
+# ========================= Passive Monitor =========================
+
+class PassiveMonitor:
+    """
+    Sniffs ARP/DHCP traffic in a background thread and calls `on_device(device)`
+    for every MAC address it has not seen before. `on_arp(ip, mac)` (raw bytes) gets
+    every ARP sender, for binding consistency checks.
+    """
+
+    def __init__(self, interface: Optional[str], on_device: Callable[[dict], None],
+                 transport=None, known_macs: Iterable[str] = (),
+                 on_arp: Optional[Callable[[bytes, bytes], None]] = None):
+        """
+        Args:
+            interface: Interface to sniff on (eg, eth0). Not needed when a transport is given.
+            on_device: Callback receiving {"ip", "mac", "source"} for each new MAC
+            transport: Object with recv(timeout) and close(). Default is an AF_PACKET socket.
+            known_macs: MACs which should not be reported again
+            on_arp: Optional callback receiving (sender_ip, sender_mac) bytes of every ARP frame
+        """
+        self.interface = interface
+        self.on_device = on_device
+        self.on_arp = on_arp
+        self.transport = transport
+        self.seen = set(mac.lower() for mac in known_macs)
+        self.frames = 0
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # ------------------------- Frame Handling -------------------------
+
+    def feed(self, frame: bytes) -> Optional[dict]:
+        """
+        Processes one Ethernet frame. Returns the device dict if it was a new MAC.
+        """
+        self.frames += 1
+        if self.on_arp is not None and frame[12:14] == _ARP_ETHERTYPE:
+            arp = parse_arp(frame)
+            if arp is not None:
+                try:
+                    self.on_arp(arp[2], arp[1])
+                except Exception as e:
+                    logger.error(f"ARP binding callback failed: {e}.")
+
+        device = parse_sighting(frame)
+        if device is None:
+            return None
+
+        with self._lock:
+            if device["mac"] in self.seen:
+                return None
+            self.seen.add(device["mac"])
+
+        logger.debug("Passive %s: new MAC %s (%s).", device['source'], device['mac'], device['ip'])
+        try:
+            self.on_device(device)
+        except Exception as e:
+            logger.error(f"Passive monitor callback failed: {e}.")
+        return device
+
+    def mark_seen(self, macs: Iterable[str]) -> None:
+        """Marks MACs already handled by an active sweep so they are not reported twice."""
+        with self._lock:
+            self.seen.update(mac.lower() for mac in macs)
+
+    def replay(self, frames: Iterable[bytes]) -> int:
+        """Feeds captured frames through the monitor. Returns number of new devices."""
+        return sum(1 for frame in frames if self.feed(frame) is not None)
+
+    # ------------------------- Capture Thread -------------------------
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                frame = self.transport.recv(0.5)
+            except OSError as e:
+                logger.error(f"Passive capture failed: {e}.")
+                break
+            if frame is not None:
+                self.feed(frame)
+
+    def start(self) -> None:
+        """Opens the capture socket (if needed) and starts the background thread."""
+        if self.transport is None:
+            self.transport = RawSocketTransport(self.interface, protocol=ETH_P_ALL)
+            self.transport.attach_filter(ARP_DHCP_FILTER)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cerberus-passive", daemon=True)
+        self._thread.start()
+        logger.info(f"Passive ARP/DHCP monitor started on {self.interface}.")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.transport is not None:
+            self.transport.close()
+        logger.info(f"Passive monitor stopped after {self.frames} frames.")
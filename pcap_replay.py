@@ -0,0 +1,410 @@
+"""
+Pcap Replay Module
+
+This module runs Cerberus's detection logic on captures taken elsewhere (tcpdump,
+Wireshark, a SPAN port recorder) - for incident forensics, regression tests and
+benchmarking without a live network.
+
+    - CaptureReader: memory-mapped pcap / pcapng parser. Frames are handed out as
+      memoryview slices of the mapping, nothing is copied, and pages already replayed
+      are dropped from the process again, so a multi-gigabyte capture replays in
+      constant memory. Ethernet, 802.1Q/802.1ad tagged and Linux cooked (`tcpdump -i
+      any`) captures are supported.
+    - CaptureReplay: feeds the ARP and DHCP frames through the passive monitor and the
+      ICMPv6 frames through the NDP engine - the exact parsers and callbacks of live
+      capture - either at maximum speed or with the original timing (optionally scaled).
+
+The command line tool wires the replay into the normal known-device / intruder path
+(check_devices, delta engine, binding tracker) against the trusted device store, opened
+read-only: it must exist, the legacy JSON is not imported and it is never compacted.
+Alert sinks are not started, events go to --events only; their "ts" is the capture time
+of the frame, "replayed_ts" the wall-clock time of the replay.
+
+Usage:
+    python pcap_replay.py incident.pcapng --events incident_events.jsonl
+    python pcap_replay.py office.pcap --realtime --speed 10
+
+    from pcap_replay import CaptureReplay
+
+    stats = CaptureReplay("capture.pcap", on_device=print).run()
+    print(stats["frames_per_second"])
+"""
+
+import argparse
+import mmap
+import struct
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Iterator, Optional, Tuple
+
+import cerberus_logger
+from arp_sweeper import BROADCAST_MAC, ETH_P_ARP, ETH_P_IP
+from ndp_discovery import ETH_P_IPV6, NdpDiscovery
+from passive_monitor import PassiveMonitor
+
+logger = cerberus_logger.get_logger("cerberus.pcap_replay")
+
+LINKTYPE_ETHERNET = 1
+LINKTYPE_LINUX_SLL = 113
+
+RELEASE_EVERY = 16 * 1024 * 1024    # Bytes replayed between dropping the mapped pages again
+
+# pcap global header magic -> (byte order, timestamp ticks per second)
+_PCAP_MAGIC = {
+    b"\xd4\xc3\xb2\xa1": ("<", 10 ** 6),
+    b"\xa1\xb2\xc3\xd4": (">", 10 ** 6),
+    b"\x4d\x3c\xb2\xa1": ("<", 10 ** 9),
+    b"\xa1\xb2\x3c\x4d": (">", 10 ** 9),
+}
+
+# pcapng block types
+PCAPNG_SHB = b"\x0a\x0d\x0d\x0a"    # Section header, same in both byte orders
+PCAPNG_IDB = 1    # Interface description
+PCAPNG_PB = 2    # Packet (obsolete)
+PCAPNG_SPB = 3    # Simple packet
+PCAPNG_EPB = 6    # Enhanced packet
+PCAPNG_LITTLE_ENDIAN = b"\x4d\x3c\x2b\x1a"
+IF_TSRESOL = 9
+
+_VLAN_TAGS = (b"\x81\x00", b"\x88\xa8")
+_ARP = struct.pack("!H", ETH_P_ARP)
+_IPV4 = struct.pack("!H", ETH_P_IP)
+_IPV6 = struct.pack("!H", ETH_P_IPV6)
+
+Frame = Tuple[float, memoryview]
+
+# ========================= Capture Reader =========================
+
+class CaptureReader:
+    """
+    Zero-copy reader of one pcap or pcapng file. frames() yields (timestamp, frame) with
+    every frame as an Ethernet frame.
+    """
+
+    def __init__(self, path: str, release_every: int = RELEASE_EVERY):
+        """
+        Args:
+            path: pcap or pcapng file
+            release_every: Bytes replayed between dropping the already replayed pages
+
+        Raises:
+            OSError: If the file can not be opened or mapped
+            ValueError: If it is neither pcap nor pcapng
+        """
+        self.path = path
+        self.release_every = release_every
+
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            self._mm.madvise(mmap.MADV_SEQUENTIAL)
+
+        head = self._mm[:4]
+        if head in _PCAP_MAGIC:
+            self.format = "pcap"
+        elif head == PCAPNG_SHB:
+            self.format = "pcapng"
+        else:
+            self._mm.close()
+            raise ValueError(f"{path} is not a pcap or pcapng capture")
+
+        self.size = len(self._mm)
+        self.frames_read = 0
+        self.skipped = 0    # Truncated frames and unsupported link types
+        self._released = 0
+
+    def __enter__(self) -> "CaptureReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        try:
+            self._mm.close()
+        except BufferError:
+            # Koi frame abhi bhi kisi ke paas hai - mapping GC ke saath band hogi.
+            logger.debug(f"Frames of {self.path} still referenced, mapping closed later.")
+
+    def frames(self) -> Iterator[Frame]:
+        """Yields (timestamp in seconds, Ethernet frame) for every supported frame."""
+        view = memoryview(self._mm)
+        records = self._pcap(view) if self.format == "pcap" else self._pcapng(view)
+        try:
+            for linktype, timestamp, frame in records:
+                frame = self._ethernet(linktype, frame)
+                if frame is None:
+                    self.skipped += 1
+                    continue
+                self.frames_read += 1
+                yield timestamp, frame
+        finally:
+            records.close()
+            view.release()
+
+    # ------------------------- Formats -------------------------
+
+    def _pcap(self, view: memoryview) -> Iterator[Tuple[int, float, memoryview]]:
+        mm, size = self._mm, self.size
+        endian, ticks = _PCAP_MAGIC[mm[:4]]
+        record = struct.Struct(endian + "IIII")
+        # Upper bits of the link type field carry FCS info, the type is in the low 28.
+        linktype = struct.unpack_from(endian + "I", mm, 20)[0] & 0x0FFFFFFF
+
+        offset = 24
+        while offset + record.size <= size:
+            seconds, fraction, captured, _original = record.unpack_from(mm, offset)
+            offset += record.size
+            if offset + captured > size:
+                self.skipped += 1    # Capture cut off mid-frame
+                break
+            yield linktype, seconds + fraction / ticks, view[offset:offset + captured]
+            offset += captured
+            if offset - self._released >= self.release_every:
+                self._release(offset)
+
+    def _pcapng(self, view: memoryview) -> Iterator[Tuple[int, float, memoryview]]:
+        mm, size = self._mm, self.size
+        endian = "<"
+        interfaces = []    # (linktype, timestamp ticks per second) per interface id of the current section
+        timestamp = 0.0
+
+        offset = 0
+        while offset + 12 <= size:
+            if mm[offset:offset + 4] == PCAPNG_SHB:
+                # Har section apna byte order aur apni interfaces list laata hai.
+                endian = "<" if mm[offset + 8:offset + 12] == PCAPNG_LITTLE_ENDIAN else ">"
+                interfaces = []
+            block_type, block_len = struct.unpack_from(endian + "II", mm, offset)
+            if block_len < 12 or offset + block_len > size:
+                self.skipped += 1    # Corrupt or cut off block, nothing after it is trustworthy
+                break
+            body = offset + 8
+
+            if block_type == PCAPNG_EPB or block_type == PCAPNG_PB:
+                if block_type == PCAPNG_EPB:
+                    interface, high, low, captured, _original = struct.unpack_from(endian + "IIIII", mm, body)
+                else:
+                    interface, _drops, high, low, captured, _original = struct.unpack_from(endian + "HHIIII", mm, body)
+                if interface < len(interfaces) and body + 20 + captured <= offset + block_len:
+                    linktype, ticks = interfaces[interface]
+                    timestamp = ((high << 32) | low) / ticks
+                    yield linktype, timestamp, view[body + 20:body + 20 + captured]
+                else:
+                    self.skipped += 1
+            elif block_type == PCAPNG_SPB:
+                # No timestamp in a simple packet - the previous one is the best guess.
+                original = struct.unpack_from(endian + "I", mm, body)[0]
+                captured = min(original, block_len - 16)
+                if interfaces:
+                    yield interfaces[0][0], timestamp, view[body + 4:body + 4 + captured]
+            elif block_type == PCAPNG_IDB:
+                linktype = struct.unpack_from(endian + "H", mm, body)[0]
+                interfaces.append((linktype, self._tsresol(endian, body + 8, offset + block_len - 4)))
+
+            offset += block_len
+            if offset - self._released >= self.release_every:
+                self._release(offset)
+
+    def _tsresol(self, endian: str, offset: int, end: int) -> int:
+        """Timestamp ticks per second from the if_tsresol option of an interface block (default microseconds)."""
+        mm = self._mm
+        option = struct.Struct(endian + "HH")
+        while offset + option.size <= end:
+            code, length = option.unpack_from(mm, offset)
+            if code == 0:
+                break
+            if code == IF_TSRESOL and length >= 1:
+                value = mm[offset + 4]
+                return 2 ** (value & 0x7F) if value & 0x80 else 10 ** value
+            offset += option.size + (length + 3) // 4 * 4
+        return 10 ** 6
+
+    # ------------------------- Frames -------------------------
+
+    @staticmethod
+    def _ethernet(linktype: int, frame: memoryview):
+        """
+        The frame as plain Ethernet: untouched for Ethernet captures, rebuilt (one small copy)
+        for VLAN tagged and Linux cooked frames. None for link types we can't use.
+        """
+        if linktype == LINKTYPE_ETHERNET:
+            if len(frame) >= 18 and frame[12:14] in _VLAN_TAGS:
+                return bytes(frame[:12]) + frame[16:]
+            return frame if len(frame) >= 14 else None
+
+        if linktype == LINKTYPE_LINUX_SLL and len(frame) >= 16:
+            # Cooked header: packet type, ARPHRD type, address length, address (8), protocol.
+            # The parsers only look at the sender address and the protocol.
+            return BROADCAST_MAC + bytes(frame[6:12]) + bytes(frame[14:16]) + frame[16:]
+
+        return None
+
+    def _release(self, offset: int) -> None:
+        """Drops the pages before `offset` from the process (they stay in the page cache)."""
+        boundary = offset - offset % mmap.PAGESIZE
+        if boundary > self._released and hasattr(mmap, "MADV_DONTNEED"):
+            self._mm.madvise(mmap.MADV_DONTNEED, 0, boundary)
+        self._released = boundary
+
+# ========================= Replay =========================
+
+class CaptureReplay:
+    """
+    Replays a capture through the live passive detection path: ARP and DHCP frames go to a
+    PassiveMonitor, ICMPv6 frames to an NdpDiscovery engine, both without sockets.
+    """
+
+    def __init__(self, path: str, on_device: Callable[[dict], None],
+                 on_arp: Optional[Callable[[bytes, bytes], None]] = None, known_macs=(),
+                 realtime: bool = False, speed: float = 1.0,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            path: pcap or pcapng file
+            on_device: Called with {"ip", "mac", "source", "capture_time"} for every new sighting
+            on_arp: Optional callback receiving (sender_ip, sender_mac) bytes of every ARP frame
+            known_macs: MACs the passive monitor should not report again (like live capture)
+            realtime: Keep the original gaps between frames instead of replaying at full speed
+            speed: Time scale for realtime replay, 10 = ten times faster than captured
+        """
+        self.path = path
+        self.on_device = on_device
+        self.on_arp = on_arp
+        self.known_macs = known_macs
+        self.realtime = realtime
+        self.speed = speed
+        self.clock = clock
+        self.sleep = sleep
+
+        self.now = None    # Capture timestamp of the frame being replayed
+        self.sightings = 0
+        self.last_stats = {}
+
+    def _sighting(self, device: dict) -> None:
+        self.sightings += 1
+        device["capture_time"] = self.now
+        self.on_device(device)
+
+    def run(self) -> dict:
+        """
+        Replays the whole capture.
+
+        Returns:
+            dict: frames, arp, ipv4, ipv6, other, skipped, sightings, bytes, seconds,
+                  frames_per_second, capture_seconds
+        """
+        monitor = PassiveMonitor(None, self._sighting, known_macs=self.known_macs, on_arp=self.on_arp)
+        ndp = NdpDiscovery(None, "00:00:00:00:00:00", "::", on_device=self._sighting)
+        counts = {"arp": 0, "ipv4": 0, "ipv6": 0, "other": 0}
+        first = None
+
+        started = self.clock()
+        with CaptureReader(self.path) as reader:
+            logger.info(f"Replaying {self.path} ({reader.format}, {reader.size / 1e6:.1f} MB).")
+            for timestamp, frame in reader.frames():
+                if first is None:
+                    first = timestamp
+                self.now = timestamp
+                if self.realtime:
+                    delay = (timestamp - first) / self.speed - (self.clock() - started)
+                    if delay > 0:
+                        self.sleep(delay)
+
+                ethertype = frame[12:14]
+                if ethertype == _ARP:
+                    counts["arp"] += 1
+                    monitor.feed(frame)
+                elif ethertype == _IPV4:
+                    counts["ipv4"] += 1
+                    monitor.feed(frame)
+                elif ethertype == _IPV6:
+                    counts["ipv6"] += 1
+                    ndp.feed(frame)
+                else:
+                    counts["other"] += 1
+            frames, skipped, size = reader.frames_read, reader.skipped, reader.size
+
+        elapsed = max(self.clock() - started, 1e-9)
+        self.last_stats = dict(counts, frames=frames, skipped=skipped, sightings=self.sightings, bytes=size,
+                               seconds=elapsed, frames_per_second=frames / elapsed,
+                               capture_seconds=(self.now - first) if first is not None else 0.0)
+        logger.info("Replayed %d frames (%d ARP, %d IPv4, %d IPv6) in %.2fs - %.0f frames/s, %d sightings.",
+                    frames, counts["arp"], counts["ipv4"], counts["ipv6"], elapsed,
+                    frames / elapsed, self.sightings)
+        return self.last_stats
+
+# ========================= CLI =========================
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Replay a pcap/pcapng capture through Cerberus's detection.")
+    parser.add_argument("capture", help="pcap or pcapng file")
+    parser.add_argument("--realtime", action="store_true", help="Keep the original timing between frames")
+    parser.add_argument("--speed", type=float, default=1.0, help="Time scale for --realtime (10 = 10x faster)")
+    parser.add_argument("--db", help="Trusted device store to check against (opened read-only, default: the live one)")
+    parser.add_argument("--events", help="Write the structured events of the replay to this JSON-lines file")
+    parser.add_argument("--gateway", help="Router IP for spoofing checks, pinned to its trusted MAC "
+                                          "(or its first sighting if unknown)")
+    args = parser.parse_args(argv)
+
+    # Detection path wahi hai jo live scan use karta hai.
+    import cerberus_scan as scan
+    import sqlite3
+    from binding_tracker import BindingTracker
+    from delta_engine import DeltaEngine
+    from device_registry import DeviceRegistry
+    from device_store import DeviceStore
+    import oui_lookup
+
+    if args.events:
+        cerberus_logger.setup_event_stream(args.events)
+    if scan.OUI_TABLE:
+        oui_lookup.set_table_path(scan.OUI_TABLE)
+
+    # Live store ko chhedna nahi hai: scan.load_known_devices() DB bana deta, JSON import karta aur close pe compact.
+    db = args.db or scan.KNOWN_DEVICES_DB
+    store = None
+    try:
+        store = DeviceStore(db, read_only=True)
+        registry = store.load_registry()
+        logger.info(f"Loaded {len(registry)} known devices from {db}.")
+    except sqlite3.Error as e:
+        logger.error(f"Can not read device store {db} ({e}), every device counts as unknown.")
+        registry = DeviceRegistry()
+    replay = None
+
+    def on_device(device):
+        # capture_time saath jaata hai, events ka "ts" capture ka time hoga, replay ka nahi.
+        when = datetime.fromtimestamp(device["capture_time"]).isoformat(sep=" ", timespec="milliseconds")
+        logger.info("[%s] %s sighting: %s -> %s", when, device['source'], device['ip'], device['mac'])
+        scan.check_devices([device], registry)
+
+    # Binding windows (duplicate IP, rapid rebind) capture ke time pe chalenge, replay speed pe nahi.
+    scan.DELTA_ENGINE = DeltaEngine(scan.MISS_TOLERANCE)
+    scan.BINDING_TRACKER = BindingTracker(scan.gateway_pins(registry, args.gateway),
+                                          on_alert=lambda alert: scan.report_binding_alert(
+                                              dict(alert, capture_time=replay.now)),
+                                          conflict_window=scan.CONFLICT_WINDOW, rebind_window=scan.REBIND_WINDOW,
+                                          rebind_limit=scan.REBIND_LIMIT, clock=lambda: replay.now or 0.0)
+
+    try:
+        replay = CaptureReplay(args.capture, on_device, on_arp=scan.BINDING_TRACKER.observe_raw,
+                               known_macs=registry.macs(), realtime=args.realtime, speed=args.speed)
+        stats = replay.run()
+    except (OSError, ValueError) as e:
+        logger.critical(f"Can not replay {args.capture}: {e}")
+        return 1
+    finally:
+        if store is not None:
+            store.close()
+        cerberus_logger.stop_event_stream()
+
+    print(f"{stats['frames']} frames in {stats['seconds']:.2f}s ({stats['frames_per_second']:.0f} frames/s), "
+          f"{stats['sightings']} sightings, {stats['skipped']} skipped, "
+          f"{stats['capture_seconds']:.1f}s of capture")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,700 @@
+"""
+Presence History Module
+
+This module remembers which devices were on the network when, so "when was this MAC
+here last week?" is a query instead of a grep through cerberus.log.
+
+Presence is kept as one bit per device per time slot (1 = seen in that slot by a sweep,
+a probe or a passive sighting). Bitmaps are grouped into chunks of CHUNK_SLOTS slots,
+one file per chunk:
+
+    - a sorted MAC index and a sorted IP index (bisection, no parsing of the whole file)
+    - one zlib compressed bitmap per device, so a lookup decompresses only that device
+    - a "scanned" bitmap of the slots a full sweep ran in, to tell "absent" from
+      "Cerberus was not running"
+
+Old data is downsampled: a chunk which ages out of its tier is OR-folded into the next,
+coarser one (1 minute -> 15 minutes -> 1 hour by default) and the coarsest tier is
+deleted after the retention period. Chunks always hold CHUNK_SLOTS slots, so coarser
+tiers cover longer spans with the same number of files and bits - a year of 1-minute
+scans for 5,000 devices stays in single digit MB.
+
+Usage:
+    from presence_history import PresenceHistory
+
+    history = PresenceHistory("cerberus_history")
+    history.record([{"ip": "192.168.1.5", "mac": "aa:bb:cc:dd:ee:ff"}], scanned=True)
+    history.flush()
+
+    history.intervals("aa:bb:cc:dd:ee:ff", since=time.time() - 7 * 86400)
+
+    # Or from the shell:
+    python presence_history.py mac aa:bb:cc:dd:ee:ff --since 2026-10-01
+"""
+
+import argparse
+import bisect
+import collections
+import os
+import re
+import socket
+import struct
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import cerberus_logger
+
+logger = cerberus_logger.get_logger("cerberus.presence_history")
+
+CHUNK_SLOTS = 1440    # Slots per chunk file: a day at 1 minute, 15 days at 15 minutes, 60 days at 1 hour
+
+# (slot seconds, kept for seconds) from finest to coarsest. Every slot size must be a
+# multiple of the previous one, data older than the last tier is deleted.
+DEFAULT_TIERS = ((60, 14 * 86400), (900, 90 * 86400), (3600, 365 * 86400))
+
+Interval = Tuple[float, float]
+
+# ========================= File Format =========================
+#
+#   header:   magic "CERBPRS1", chunk start (u64 epoch seconds), slot seconds (u32),
+#             slots (u32), devices (u32), IPs (u32), scanned bitmap length (u32)
+#   scanned:  bitmap of the slots a full sweep ran in (zlib or raw, see _pack)
+#   devices:  sorted (mac u64, bitmap offset u32, bitmap length u32)
+#   ips:      sorted (ip 16 bytes, device index u32), IPv4 as ::ffff:a.b.c.d
+#   bitmaps:  one per device, bit i of byte i // 8 (LSB first) = slot i
+#
+# A bitmap is stored zlib compressed only when that is smaller, so a stored length equal
+# to the raw length means "raw".
+
+MAGIC = b"CERBPRS1"
+_HEADER = struct.Struct(">8sQIIIII")
+_DEVICE = struct.Struct(">QII")
+_IP = struct.Struct(">16sI")
+
+_V4_PREFIX = b"\x00" * 10 + b"\xff\xff"
+_CHUNK_NAME = re.compile(r"^(\d+)-(\d+)\.pres$")
+
+
+def mac_int(mac: str) -> int:
+    return int(mac.replace(":", "").replace("-", ""), 16)
+
+
+def mac_str(value: int) -> str:
+    return value.to_bytes(6, "big").hex(":")
+
+
+def ip_key(ip: str) -> bytes:
+    """16 byte index key of an IPv4 or IPv6 address."""
+    if ":" in ip:
+        return socket.inet_pton(socket.AF_INET6, ip)
+    return _V4_PREFIX + socket.inet_aton(ip)
+
+
+def _pack(bitmap: bytes) -> bytes:
+    packed = zlib.compress(bytes(bitmap), 6)
+    return packed if len(packed) < len(bitmap) else bytes(bitmap)
+
+
+def _unpack(blob: bytes, raw_length: int) -> bytes:
+    return bytes(blob) if len(blob) == raw_length else zlib.decompress(blob)
+
+
+def _runs(bitmap: bytes) -> Iterable[Tuple[int, int]]:
+    """(first, end) slot runs of set bits, end exclusive."""
+    value = int.from_bytes(bitmap, "little")
+    position = 0
+    # Int ke bit tricks se - har set bit pe loop nahi, har run pe ek iteration.
+    while value:
+        zeros = (value & -value).bit_length() - 1
+        value >>= zeros
+        position += zeros
+        ones = (~value & (value + 1)).bit_length() - 1
+        yield position, position + ones
+        value >>= ones
+        position += ones
+
+
+def _set_range(bitmap: bytearray, first: int, end: int) -> None:
+    for slot in range(first, end):
+        bitmap[slot >> 3] |= 1 << (slot & 7)
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    """Union of (start, end) intervals, touching ones joined."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+# ========================= Chunks =========================
+
+class Chunk:
+    """Writable in-memory chunk: the one being recorded, or one being downsampled into."""
+
+    def __init__(self, start: int, slot_seconds: int, slots: int = CHUNK_SLOTS):
+        self.start = start
+        self.slot_seconds = slot_seconds
+        self.slots = slots
+        self.end = start + slot_seconds * slots
+        self.raw_length = (slots + 7) // 8
+
+        self.bitmaps: Dict[int, bytearray] = {}
+        self.ips: Dict[bytes, set] = {}
+        self.scanned = bytearray(self.raw_length)
+        self.dirty = False
+
+    # ------------------------- Recording -------------------------
+
+    def mark(self, slot: int, mac: int, ip: Optional[bytes]) -> None:
+        bitmap = self.bitmaps.get(mac)
+        if bitmap is None:
+            bitmap = self.bitmaps[mac] = bytearray(self.raw_length)
+        bitmap[slot >> 3] |= 1 << (slot & 7)
+        if ip is not None:
+            self.ips.setdefault(ip, set()).add(mac)
+        self.dirty = True
+
+    def mark_scanned(self, slot: int) -> None:
+        self.scanned[slot >> 3] |= 1 << (slot & 7)
+        self.dirty = True
+
+    def fold(self, finer) -> None:
+        """ORs a finer chunk (Chunk or ChunkFile) into this coarser one."""
+        factor = self.slot_seconds // finer.slot_seconds
+        offset = (finer.start - self.start) // finer.slot_seconds
+
+        def fold_into(target: bytearray, bitmap: bytes) -> None:
+            for first, end in _runs(bitmap):
+                _set_range(target, (offset + first) // factor, (offset + end - 1) // factor + 1)
+
+        for mac, bitmap in finer.items():
+            target = self.bitmaps.get(mac)
+            if target is None:
+                target = self.bitmaps[mac] = bytearray(self.raw_length)
+            fold_into(target, bitmap)
+        fold_into(self.scanned, finer.scanned_bitmap())
+        for ip, macs in finer.ip_items():
+            self.ips.setdefault(ip, set()).update(macs)
+        self.dirty = True
+
+    def copy(self) -> "Chunk":
+        chunk = Chunk(self.start, self.slot_seconds, self.slots)
+        chunk.bitmaps = {mac: bytearray(bitmap) for mac, bitmap in self.bitmaps.items()}
+        chunk.ips = {ip: set(macs) for ip, macs in self.ips.items()}
+        chunk.scanned = bytearray(self.scanned)
+        return chunk
+
+    # ------------------------- Reader Interface -------------------------
+
+    def bitmap(self, mac: int) -> Optional[bytes]:
+        return self.bitmaps.get(mac)
+
+    def items(self) -> Iterable[Tuple[int, bytes]]:
+        return self.bitmaps.items()
+
+    def macs_for_ip(self, ip: bytes) -> List[int]:
+        return sorted(self.ips.get(ip, ()))
+
+    def ip_items(self) -> Iterable[Tuple[bytes, set]]:
+        return self.ips.items()
+
+    def scanned_bitmap(self) -> bytes:
+        return self.scanned
+
+    # ------------------------- Serialization -------------------------
+
+    def to_bytes(self) -> bytes:
+        macs = sorted(self.bitmaps)
+        index = {mac: i for i, mac in enumerate(macs)}
+        blobs = [_pack(self.bitmaps[mac]) for mac in macs]
+        ips = sorted((ip, index[mac]) for ip, owners in self.ips.items() for mac in owners)
+        scanned = _pack(self.scanned)
+
+        out = bytearray(_HEADER.pack(MAGIC, self.start, self.slot_seconds, self.slots,
+                                     len(macs), len(ips), len(scanned)))
+        out += scanned
+        offset = len(out) + _DEVICE.size * len(macs) + _IP.size * len(ips)
+        for mac, blob in zip(macs, blobs):
+            out += _DEVICE.pack(mac, offset, len(blob))
+            offset += len(blob)
+        for ip, device in ips:
+            out += _IP.pack(ip, device)
+        for blob in blobs:
+            out += blob
+        return bytes(out)
+
+    @classmethod
+    def load(cls, path: str) -> "Chunk":
+        """Reads a chunk file back into a writable chunk (eg, after a restart mid-chunk)."""
+        source = ChunkFile(path)
+        chunk = cls(source.start, source.slot_seconds, source.slots)
+        chunk.bitmaps = {mac: bytearray(bitmap) for mac, bitmap in source.items()}
+        for ip, macs in source.ip_items():
+            chunk.ips[ip] = set(macs)
+        chunk.scanned = bytearray(source.scanned_bitmap())
+        return chunk
+
+
+class ChunkFile:
+    """Read-only view of one chunk file, looked up by bisection over the indexes."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._data = f.read()
+
+        (magic, self.start, self.slot_seconds, self.slots,
+         self._devices, self._ips, scanned_length) = _HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a presence chunk")
+
+        self.end = self.start + self.slot_seconds * self.slots
+        self.raw_length = (self.slots + 7) // 8
+        self._scanned = (_HEADER.size, scanned_length)
+        self._device_start = _HEADER.size + scanned_length
+        self._ip_start = self._device_start + _DEVICE.size * self._devices
+        self.path = path
+
+    def _device(self, index: int) -> Tuple[int, int, int]:
+        return _DEVICE.unpack_from(self._data, self._device_start + index * _DEVICE.size)
+
+    def _blob(self, offset: int, length: int) -> bytes:
+        return _unpack(self._data[offset:offset + length], self.raw_length)
+
+    def bitmap(self, mac: int) -> Optional[bytes]:
+        lo, hi = 0, self._devices
+        while lo < hi:
+            mid = (lo + hi) // 2
+            value, offset, length = self._device(mid)
+            if value < mac:
+                lo = mid + 1
+            elif value > mac:
+                hi = mid
+            else:
+                return self._blob(offset, length)
+        return None
+
+    def items(self) -> Iterable[Tuple[int, bytes]]:
+        for index in range(self._devices):
+            mac, offset, length = self._device(index)
+            yield mac, self._blob(offset, length)
+
+    def _ip(self, index: int) -> Tuple[bytes, int]:
+        return _IP.unpack_from(self._data, self._ip_start + index * _IP.size)
+
+    def macs_for_ip(self, ip: bytes) -> List[int]:
+        keys = _KeyView(self)
+        first = bisect.bisect_left(keys, ip)
+        macs = []
+        for index in range(first, self._ips):
+            key, device = self._ip(index)
+            if key != ip:
+                break
+            macs.append(self._device(device)[0])
+        return macs
+
+    def ip_items(self) -> Iterable[Tuple[bytes, List[int]]]:
+        grouped = collections.defaultdict(list)
+        for index in range(self._ips):
+            key, device = self._ip(index)
+            grouped[key].append(self._device(device)[0])
+        return grouped.items()
+
+    def scanned_bitmap(self) -> bytes:
+        offset, length = self._scanned
+        return self._blob(offset, length)
+
+
+class _KeyView:
+    """Sequence of a chunk file's IP keys, for bisect."""
+
+    def __init__(self, chunk: ChunkFile):
+        self._chunk = chunk
+
+    def __len__(self) -> int:
+        return self._chunk._ips
+
+    def __getitem__(self, index: int) -> bytes:
+        return self._chunk._ip(index)[0]
+
+# ========================= History Store =========================
+
+class PresenceHistory:
+    """
+    Chunked presence timeline of every device. record() is cheap and thread-safe (called
+    for every check), flush() writes the current chunk and runs the downsampling.
+    """
+
+    def __init__(self, directory: str, tiers: Tuple[Tuple[int, int], ...] = DEFAULT_TIERS,
+                 chunk_slots: int = CHUNK_SLOTS, cache_size: int = 32, clock: Callable[[], float] = time.time):
+        """
+        Args:
+            directory: Where the chunk files live (created if missing)
+            tiers: ((slot seconds, kept for seconds), ...) finest first, see DEFAULT_TIERS
+            chunk_slots: Slots per chunk file
+            cache_size: Chunk files kept parsed in memory for queries
+            clock: Wall clock (presence is about calendar time, not monotonic time)
+        """
+        for (finer, _), (coarser, _) in zip(tiers, tiers[1:]):
+            if coarser % finer:
+                raise ValueError(f"tier slot {coarser}s is not a multiple of {finer}s")
+
+        self.directory = directory
+        self.tiers = tuple(tiers)
+        self.chunk_slots = chunk_slots
+        self.cache_size = cache_size
+        self.clock = clock
+
+        os.makedirs(directory, exist_ok=True)
+
+        self._current: Optional[Chunk] = None
+        self._lock = threading.Lock()    # Current chunk
+        self._io_lock = threading.Lock()    # Chunk files, index and cache
+        self._files: Dict[Tuple[int, int], str] = {}
+        self._cache = collections.OrderedDict()
+        self._compact_due = True
+
+        for name in os.listdir(directory):
+            match = _CHUNK_NAME.match(name)
+            if match:
+                self._files[(int(match.group(1)), int(match.group(2)))] = os.path.join(directory, name)
+
+    def _span(self, slot_seconds: int) -> int:
+        return slot_seconds * self.chunk_slots
+
+    def _path(self, slot_seconds: int, start: int) -> str:
+        return os.path.join(self.directory, f"{slot_seconds}-{start}.pres")
+
+    # ------------------------- Recording -------------------------
+
+    def record(self, devices: Iterable[dict], scanned: bool = False, now: Optional[float] = None) -> None:
+        """
+        Marks the devices present in the current slot.
+
+        Args:
+            devices: Dicts with "mac" and optionally "ip"
+            scanned: True for full sweep results - the slot counts as covered
+        """
+        if now is None:
+            now = self.clock()
+        slot_seconds = self.tiers[0][0]
+        span = self._span(slot_seconds)
+        start = int(now - now % span)
+        slot = int((now - start) // slot_seconds)
+
+        with self._lock:
+            current = self._current
+            if current is None or current.start != start:
+                current = self._roll_over(start, slot_seconds)
+            for device in devices:
+                try:
+                    ip = device.get("ip")
+                    current.mark(slot, mac_int(device["mac"]), ip_key(ip) if ip else None)
+                except (KeyError, OSError, ValueError):
+                    continue
+            if scanned:
+                current.mark_scanned(slot)
+
+    def _roll_over(self, start: int, slot_seconds: int) -> Chunk:
+        """New chunk (or the saved one after a restart). Called with the lock held."""
+        previous = self._current
+        if previous is not None and previous.dirty:
+            self._write(previous.copy())
+            previous.dirty = False
+
+        path = self._files.get((slot_seconds, start))
+        chunk = None
+        if path is not None:
+            try:
+                chunk = Chunk.load(path)
+            except (OSError, ValueError, struct.error, zlib.error) as e:
+                logger.error(f"Presence chunk {path} unreadable ({e}), starting it over.")
+        self._current = chunk or Chunk(start, slot_seconds, self.chunk_slots)
+        # Naya chunk shuru hua matlab purane wale ab downsample ho sakte hai.
+        self._compact_due = True
+        return self._current
+
+    def flush(self) -> None:
+        """Writes the current chunk if it changed, and downsamples / expires old chunks when due."""
+        with self._lock:
+            current = self._current
+            snapshot = None
+            if current is not None and current.dirty:
+                snapshot = current.copy()
+                current.dirty = False
+            compact, self._compact_due = self._compact_due, False
+
+        if snapshot is not None:
+            self._write(snapshot)
+        if compact:
+            self.compact()
+
+    def close(self) -> None:
+        self.flush()
+
+    # ------------------------- Files -------------------------
+
+    def _write(self, chunk: Chunk) -> None:
+        path = self._path(chunk.slot_seconds, chunk.start)
+        temp = path + ".tmp"
+        data = chunk.to_bytes()
+        with self._io_lock:
+            with open(temp, "wb") as f:
+                f.write(data)
+            os.replace(temp, path)
+            self._files[(chunk.slot_seconds, chunk.start)] = path
+            self._cache.pop(path, None)
+
+    def _remove(self, key: Tuple[int, int]) -> None:
+        with self._io_lock:
+            path = self._files.pop(key, None)
+            if path is None:
+                return
+            self._cache.pop(path, None)
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.error(f"Could not remove presence chunk {path}: {e}.")
+
+    def _open(self, path: str) -> Optional[ChunkFile]:
+        with self._io_lock:
+            chunk = self._cache.get(path)
+            if chunk is not None:
+                self._cache.move_to_end(path)
+                return chunk
+        try:
+            chunk = ChunkFile(path)
+        except (OSError, ValueError, struct.error) as e:
+            logger.error(f"Presence chunk {path} unreadable: {e}.")
+            return None
+        with self._io_lock:
+            self._cache[path] = chunk
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return chunk
+
+    def compact(self, now: Optional[float] = None) -> Tuple[int, int]:
+        """
+        Folds chunks which aged out of their tier into the next coarser tier and deletes
+        the ones past the last tier.
+
+        Returns:
+            Tuple: (chunks downsampled, chunks expired)
+        """
+        if now is None:
+            now = self.clock()
+        with self._lock:
+            current = None if self._current is None else (self._current.slot_seconds, self._current.start)
+        folded = expired = 0
+
+        for index, (slot_seconds, keep) in enumerate(self.tiers):
+            with self._io_lock:
+                aged = sorted(key for key in self._files
+                              if key[0] == slot_seconds and key[1] + self._span(slot_seconds) <= now - keep)
+            if current is not None:
+                aged = [key for key in aged if key != current]
+            if not aged:
+                continue
+
+            if index + 1 == len(self.tiers):
+                for key in aged:
+                    self._remove(key)
+                expired += len(aged)
+                continue
+
+            # Ek coarse chunk ke saare fine chunks ek saath fold karo - coarse file ek hi baar likhi jaati hai.
+            coarse = self.tiers[index + 1][0]
+            span = self._span(coarse)
+            targets = collections.defaultdict(list)
+            for key in aged:
+                targets[key[1] - key[1] % span].append(key)
+
+            for target_start, keys in targets.items():
+                with self._io_lock:
+                    path = self._files.get((coarse, target_start))
+                target = None
+                if path is not None:
+                    try:
+                        target = Chunk.load(path)
+                    except (OSError, ValueError, struct.error, zlib.error) as e:
+                        logger.error(f"Presence chunk {path} unreadable ({e}), starting it over.")
+                if target is None:
+                    target = Chunk(target_start, coarse, self.chunk_slots)
+                for key in keys:
+                    source = self._open(self._files[key])
+                    if source is not None:
+                        target.fold(source)
+                self._write(target)
+                for key in keys:
+                    self._remove(key)
+                folded += len(keys)
+
+        if folded or expired:
+            logger.info(f"Presence history: {folded} chunks downsampled, {expired} expired.")
+        return folded, expired
+
+    # ------------------------- Queries -------------------------
+
+    def _chunks(self, since: Optional[float], until: Optional[float]) -> List[object]:
+        """Chunk files and the unsaved current chunk overlapping [since, until), oldest first."""
+        since = float("-inf") if since is None else since
+        until = float("inf") if until is None else until
+
+        with self._io_lock:
+            keys = sorted(self._files, key=lambda key: key[1])
+        with self._lock:
+            current = self._current.copy() if self._current is not None and self._current.dirty else None
+
+        chunks = []
+        for slot_seconds, start in keys:
+            if start >= until or start + self._span(slot_seconds) <= since:
+                continue
+            if current is not None and (slot_seconds, start) == (current.slot_seconds, current.start):
+                continue
+            chunk = self._open(self._files[(slot_seconds, start)])
+            if chunk is not None:
+                chunks.append(chunk)
+        if current is not None and current.start < until and current.end > since:
+            chunks.append(current)
+        return chunks
+
+    @staticmethod
+    def _bitmap_intervals(chunk, bitmap: bytes, since: Optional[float], until: Optional[float]) -> List[Interval]:
+        intervals = []
+        for first, end in _runs(bitmap):
+            start = chunk.start + first * chunk.slot_seconds
+            stop = chunk.start + end * chunk.slot_seconds
+            if since is not None:
+                start = max(start, since)
+            if until is not None:
+                stop = min(stop, until)
+            if start < stop:
+                intervals.append((start, stop))
+        return intervals
+
+    def intervals(self, mac: str, since: Optional[float] = None, until: Optional[float] = None) -> List[Interval]:
+        """(start, end) epoch intervals in which `mac` was present, at the resolution of the data."""
+        key = mac_int(mac)
+        intervals = []
+        for chunk in self._chunks(since, until):
+            bitmap = chunk.bitmap(key)
+            if bitmap is not None:
+                intervals.extend(self._bitmap_intervals(chunk, bitmap, since, until))
+        return merge_intervals(intervals)
+
+    def last_seen(self, mac: str, until: Optional[float] = None) -> Optional[float]:
+        """End of the last slot `mac` was present in (newest chunks first, stops at the first hit)."""
+        key = mac_int(mac)
+        for chunk in reversed(self._chunks(None, until)):
+            bitmap = chunk.bitmap(key)
+            if bitmap is not None:
+                intervals = self._bitmap_intervals(chunk, bitmap, None, until)
+                if intervals:
+                    return intervals[-1][1]
+        return None
+
+    def by_ip(self, ip: str, since: Optional[float] = None, until: Optional[float] = None) -> Dict[str, List[Interval]]:
+        """
+        {mac: intervals} of the devices which used `ip` in the window. IPs are indexed per
+        chunk, so a MAC's intervals cover the whole chunk it used the IP in.
+        """
+        key = ip_key(ip)
+        found = collections.defaultdict(list)
+        for chunk in self._chunks(since, until):
+            for mac in chunk.macs_for_ip(key):
+                bitmap = chunk.bitmap(mac)
+                if bitmap is not None:
+                    found[mac_str(mac)].extend(self._bitmap_intervals(chunk, bitmap, since, until))
+        return {mac: merge_intervals(intervals) for mac, intervals in found.items() if intervals}
+
+    def devices(self, since: Optional[float] = None, until: Optional[float] = None) -> Dict[str, float]:
+        """{mac: seconds present} of every device seen in the window."""
+        found = collections.defaultdict(list)
+        for chunk in self._chunks(since, until):
+            for mac, bitmap in chunk.items():
+                found[mac].extend(self._bitmap_intervals(chunk, bitmap, since, until))
+        return {mac_str(mac): sum(end - start for start, end in merge_intervals(intervals))
+                for mac, intervals in found.items() if intervals}
+
+    def coverage(self, since: Optional[float] = None, until: Optional[float] = None) -> List[Interval]:
+        """Intervals in which full sweeps ran - outside of them, absence means nothing."""
+        intervals = []
+        for chunk in self._chunks(since, until):
+            intervals.extend(self._bitmap_intervals(chunk, chunk.scanned_bitmap(), since, until))
+        return merge_intervals(intervals)
+
+    def size_bytes(self) -> int:
+        with self._io_lock:
+            paths = list(self._files.values())
+        return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+# ========================= CLI =========================
+
+def _parse_time(value: str) -> float:
+    """
+    ISO date/time ("2026-10-01", "2026-10-01 18:30") or relative to now ("7d", "12h", "30m"
+    ago - the leading dash of "-7d" is optional, argparse only takes it as "--since=-7d").
+    """
+    match = re.match(r"^-?(\d+(?:\.\d+)?)([dhm])$", value)
+    if match:
+        unit = {"d": 86400, "h": 3600, "m": 60}[match.group(2)]
+        return time.time() - float(match.group(1)) * unit
+    return datetime.fromisoformat(value).timestamp()
+
+
+def _format_time(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp).isoformat(sep=" ", timespec="minutes")
+
+
+def _print_intervals(intervals: List[Interval]) -> None:
+    for start, end in intervals:
+        print(f"  {_format_time(start)}  ->  {_format_time(end)}  ({(end - start) / 60:.0f} min)")
+
+
+def main(argv=None) -> int:
+    # Options har subcommand pe bhi chalne chahiye: "mac aa:bb:... --since 7d".
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--dir", default="cerberus_history", help="History directory (default: cerberus_history)")
+    common.add_argument("--since", default="7d", help="Window start, ISO time or relative like 7d (default: 7d)")
+    common.add_argument("--until", help="Window end, ISO time or relative (default: now)")
+
+    parser = argparse.ArgumentParser(description="Query the Cerberus presence history.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("mac", parents=[common], help="When was a MAC present").add_argument("mac")
+    commands.add_parser("ip", parents=[common], help="Which MACs used an IP, and when").add_argument("ip")
+    commands.add_parser("devices", parents=[common], help="Every device seen in the window")
+    commands.add_parser("coverage", parents=[common], help="When full sweeps ran")
+    args = parser.parse_args(argv)
+
+    since = _parse_time(args.since)
+    until = _parse_time(args.until) if args.until else None
+    history = PresenceHistory(args.dir)
+
+    if args.command == "mac":
+        intervals = history.intervals(args.mac, since, until)
+        print(f"{args.mac.lower()}: {len(intervals)} intervals")
+        _print_intervals(intervals)
+        last = history.last_seen(args.mac, until)
+        print(f"Last seen: {_format_time(last) if last else 'never'}")
+    elif args.command == "ip":
+        for mac, intervals in sorted(history.by_ip(args.ip, since, until).items()):
+            print(f"{mac}:")
+            _print_intervals(intervals)
+    elif args.command == "devices":
+        for mac, seconds in sorted(history.devices(since, until).items(), key=lambda item: -item[1]):
+            print(f"{mac}  {seconds / 3600:8.1f} h")
+    else:
+        _print_intervals(history.coverage(since, until))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,19 +4,135 @@ Router Detector Module
 This module is for detecting the router IP addresses and network information.
 This is a custom module which serves the main Cerberus module.
 
+Everything is read once into an immutable NetworkContext snapshot and cached. The
+cache is only dropped when the kernel reports an address, route or link change over
+rtnetlink (NetworkWatcher), so a DHCP renumbering or Wi-Fi roam is noticed right away
+without polling.
+
 Usage:
-    from router_detector import RouterDetector
+    from router_detector import RouterDetector, NetworkWatcher
     
     detector = RouterDetector()
+    context = detector.get_context()
+
+    watcher = NetworkWatcher(lambda old, new: print(new.cidr))
+    watcher.start()
 """
 
+import ipaddress
+import select
+import socket
+import struct
+import threading
+import time
+from typing import Callable, NamedTuple, Optional, Tuple
+
 import netifaces
 
+import cerberus_logger
+
+logger = cerberus_logger.get_logger("cerberus.router_detector")
+
+# ========================= Network Context =========================
+
+class NetworkSegment(NamedTuple):
+    """One IPv4 network this machine is attached to."""
+    interface: str
+    local_ip: str
+    cidr: str
+
+
+class NetworkContext(NamedTuple):
+    """
+    Immutable snapshot of the network setup. Two snapshots compare equal when nothing
+    that matters for scanning changed.
+    """
+    router_ip: Optional[str]
+    interface: Optional[str]
+    local_ip: Optional[str]
+    cidr: Optional[str]    # Network of the default route interface (eg, 192.168.1.0/24)
+    segments: Tuple[NetworkSegment, ...]
+
+
+def _read_context() -> NetworkContext:
+    """Builds a snapshot with one gateways() call and one ifaddresses() call per interface."""
+    gateways = netifaces.gateways()
+    default = gateways.get('default', {}).get(netifaces.AF_INET)
+    router_ip, default_interface = default[:2] if default else (None, None)
+
+    local_ip = cidr = None
+    segments = []
+    seen = set()
+
+    for interface in netifaces.interfaces():
+        try:
+            addrs = netifaces.ifaddresses(interface)
+        except ValueError:
+            continue
+
+        for addr_info in addrs.get(netifaces.AF_INET, []):
+            ip_address = addr_info.get('addr')
+            netmask = addr_info.get('netmask')
+            if not ip_address:
+                continue
+
+            network = None
+            if netmask:
+                try:
+                    network = ipaddress.ip_network(f"{ip_address}/{netmask}", strict=False)
+                except ValueError:
+                    # Kuch drivers ajeeb netmask dete hai (eg, "255.0.255.0"), woh entry chhod do.
+                    logger.debug(f"Skipping {ip_address}/{netmask} on {interface}: not a valid network.")
+                    continue
+
+            if interface == default_interface and local_ip is None:
+                local_ip = ip_address
+                if network is not None:
+                    cidr = str(network)
+            if network is None:
+                continue
+
+            # Loopback, link-local and single host (/32 tunnels) segments scan karne layak nahi hai.
+            if network.is_loopback or network.is_link_local or network.prefixlen >= 32:
+                continue
+            if (interface, network) in seen:
+                continue
+            seen.add((interface, network))
+            segments.append(NetworkSegment(interface, ip_address, str(network)))
+
+    return NetworkContext(router_ip, default_interface, local_ip, cidr, tuple(segments))
+
+
+_context = None
+_context_lock = threading.Lock()
+
+# ========================= Router Detector =========================
+
 class RouterDetector:
     """
     I made this class for detecting router and network information. So,
     This class will has methods that will retrieve the router's IP address(gateway) and network information including local IP and interface.
+    All of them read the same cached NetworkContext.
     """
+
+    @staticmethod
+    def get_context(refresh: bool = False) -> NetworkContext:
+        """
+        Returns the cached NetworkContext, reading the interfaces only the first time
+        (or after invalidate() / refresh=True).
+        """
+        global _context
+        with _context_lock:
+            if _context is None or refresh:
+                _context = _read_context()
+            return _context
+
+    @staticmethod
+    def invalidate() -> None:
+        """Drops the cached snapshot, the next get_context() reads the interfaces again."""
+        global _context
+        with _context_lock:
+            _context = None
     
     @staticmethod
     def get_router_ip():
@@ -33,23 +149,9 @@ class RouterDetector:
             '192.168.1.1'
         """
         try:
-            gateways = netifaces.gateways()
-            # ye just samjhne ke liye hai age ke code ke liye
-            # Example gateways structure:
-            # {
-            #     'default': {
-            #         2: ('192.168.1.1', 'eth0', True),   # AF_INET (IPv4)
-            #         10: ('fe80::1', 'eth0', True)       # AF_INET6 (IPv6)
-            #     }
-            # }
-            
-            if 'default' in gateways and netifaces.AF_INET in gateways['default']:
-                return gateways['default'][netifaces.AF_INET][0]
-                
+            return RouterDetector.get_context().router_ip
         except Exception:
-            pass
-            
-        return None
+            return None
 
 
     @staticmethod
@@ -64,39 +166,21 @@ class RouterDetector:
                   - interface: The network interface name
         """
         try:
-            gateways = netifaces.gateways()
-            
-            if 'default' not in gateways:
-                return None
-            
-            # Get default IPv4 gateway
-            if netifaces.AF_INET in gateways['default']:
-                gateway_ip, interface = gateways['default'][netifaces.AF_INET][:2]
-                
-                # Get local IP on that interface
-                try:
-                    addrs = netifaces.ifaddresses(interface)
-                    
-                    if netifaces.AF_INET in addrs:
-                        local_ip = addrs[netifaces.AF_INET][0].get('addr')
-                        
-                        return {
-                            'router_ip': gateway_ip,
-                            'local_ip': local_ip,
-                            'interface': interface
-                        }
-                        
-                except Exception:
-                    return {
-                        'router_ip': gateway_ip,
-                        'interface': interface
-                    }
-            
-            return None
-            
+            context = RouterDetector.get_context()
         except Exception as e:
             print(f"Network detection error: {e}")
             return None
+
+        if context.router_ip is None:
+            return None
+
+        info = {
+            'router_ip': context.router_ip,
+            'interface': context.interface
+        }
+        if context.local_ip:
+            info['local_ip'] = context.local_ip
+        return info
         
 
     @staticmethod
@@ -107,33 +191,144 @@ class RouterDetector:
             Network address in CIDR notation (eg, 192.168.1.0/24)
         """
         try:
-            gateways = netifaces.gateways()
-
-            if 'default' not in gateways or netifaces.AF_INET not in gateways['default']:
-                return None
-            
-            gateway_ip, interface = gateways['default'][netifaces.AF_INET][:2]
+            context = RouterDetector.get_context()
+        except Exception as e:
+            print(f"Network detection error: {e}")
+            return None
 
-            # It fetches network information for the interface
-            addrs = netifaces.ifaddresses(interface)
+        return context.cidr if context.router_ip else None
 
-            if netifaces.AF_INET in addrs:
-                addr_info = addrs[netifaces.AF_INET][0]
-                ip_address = addr_info['addr']
-                netmask = addr_info['netmask']
+    @staticmethod
+    def get_all_networks():
+        """
+        It will list every IPv4 network this machine is attached to, on every interface,
+        so multi-homed sentinels (LAN, IoT VLAN, guest network) can watch all of them.
 
-                ip_parts = [int(part) for part in ip_address.split('.')]
-                mask_parts = [int(part) for part in netmask.split('.')]
-            
-                network_parts = [ip_parts[i] & mask_parts[i] for i in range(4)]
-                network_addr = '.'.join(str(part) for part in network_parts)
-                
-                cidr = sum(bin(int(x)).count('1') for x in netmask.split('.'))
-                
-                return f"{network_addr}/{cidr}"
-                
+        Returns:
+            list: One dictionary per segment with key value pairs:
+                  - interface: The network interface name
+                  - local_ip: The local machine's IP address on that segment
+                  - cidr: Network address in CIDR notation (eg, 192.168.1.0/24)
+        """
+        try:
+            context = RouterDetector.get_context()
         except Exception as e:
             print(f"Network detection error: {e}")
-        
-        return None
+            return []
+
+        return [segment._asdict() for segment in context.segments]
+
+# ========================= Change Detection =========================
+
+NETLINK_ROUTE = 0
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV4_ROUTE = 0x40
+
+RTM_NEWLINK, RTM_DELLINK = 16, 17
+RTM_NEWADDR, RTM_DELADDR = 20, 21
+RTM_NEWROUTE, RTM_DELROUTE = 24, 25
+NETWORK_EVENTS = {RTM_NEWLINK, RTM_DELLINK, RTM_NEWADDR, RTM_DELADDR, RTM_NEWROUTE, RTM_DELROUTE}
+
+_NLMSGHDR = struct.Struct("=IHHII")    # length, type, flags, seq, pid
+
+
+def netlink_message_types(data: bytes):
+    """Yields the message type of every netlink message in one datagram."""
+    offset = 0
+    while offset + _NLMSGHDR.size <= len(data):
+        length, msg_type, _flags, _seq, _pid = _NLMSGHDR.unpack_from(data, offset)
+        if length < _NLMSGHDR.size:
+            break
+        yield msg_type
+        offset += (length + 3) & ~3    # NLMSG_ALIGN
+
+
+class NetworkWatcher:
+    """
+    Subscribes to rtnetlink link, IPv4 address and IPv4 route notifications (Linux only).
+    On a change the cached NetworkContext is re-read, and on_change(old, new) is called
+    only if the snapshot really differs.
+    """
+
+    def __init__(self, on_change: Callable[[NetworkContext, NetworkContext], None], settle: float = 0.5):
+        """
+        Args:
+            on_change: Called from the watcher thread as on_change(old_context, new_context)
+            settle: Seconds without further messages before re-reading, DHCP sends a burst of them
+        """
+        self.on_change = on_change
+        self.settle = settle
+
+        self._sock = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        """Opens the netlink socket and starts the watcher thread. Raises OSError if unsupported."""
+        if not hasattr(socket, "AF_NETLINK"):
+            raise OSError("rtnetlink is only available on Linux")
+
+        self._sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+        self._sock.bind((0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV4_ROUTE))
+
+        # Snapshot pehle le lo, warna pehla change compare kisse karenge.
+        RouterDetector.get_context()
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cerberus-netlink", daemon=True)
+        self._thread.start()
+        logger.debug("Watching rtnetlink for address/route changes.")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def _wait_for_change(self, timeout: float) -> bool:
+        """True if a relevant netlink message (or a buffer overrun) arrived within timeout."""
+        readable, _, _ = select.select([self._sock], [], [], timeout)
+        if not readable:
+            return False
+        try:
+            data = self._sock.recv(65535)
+        except OSError as e:
+            # ENOBUFS: kernel dropped messages, kuch toh badla hai - re-read anyway.
+            logger.debug(f"Netlink receive error: {e}.")
+            return True
+        return any(msg_type in NETWORK_EVENTS for msg_type in netlink_message_types(data))
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                if not self._wait_for_change(0.5):
+                    continue
+
+                # Burst khatam hone tak ruko, ek hi baar re-read karna hai.
+                quiet_until = time.monotonic() + self.settle
+                while not self._stop.is_set():
+                    remaining = quiet_until - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    if self._wait_for_change(remaining):
+                        quiet_until = time.monotonic() + self.settle
+
+                self.check()
+            except Exception:
+                logger.exception("Network watcher failed.")
+                self._stop.wait(self.settle)
+
+    def check(self) -> bool:
+        """Re-reads the context now, calls on_change if it differs. Returns True on change."""
+        old = RouterDetector.get_context()
+        new = RouterDetector.get_context(refresh=True)
+        if new == old:
+            return False
 
+        logger.info(f"Network context changed: {old.cidr} via {old.interface} -> {new.cidr} via {new.interface}.")
+        self.on_change(old, new)
+        return True
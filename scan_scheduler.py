@@ -0,0 +1,186 @@
+"""
+Scan Scheduler Module
+
+This module decides *when* Cerberus scans, replacing the fixed `time.sleep(SCAN_INTERVAL)`
+loop. Work is split into tiers:
+
+    - probe: cheap and frequent, only re-checks hosts already known to be live
+    - sweep: full-range sweep, less often
+    - event: extra sweep triggered by something happening (new MAC seen passively,
+             link change), debounced so a burst of events gives one sweep
+
+Every tier has its own deadline (the longest it may go without running) and its own
+budget (the most probes one run may send). Triggered tiers run as soon as their
+minimum gap allows, everything else runs when its deadline comes.
+
+Usage:
+    from scan_scheduler import ScanScheduler
+
+    scheduler = ScanScheduler()
+    scheduler.add_tier("sweep", full_sweep, deadline=300, budget=65536)
+    scheduler.run_forever()
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import cerberus_logger
+import cerberus_metrics as metrics
+
+logger = cerberus_logger.get_logger("cerberus.scan_scheduler")
+
+TIER_RUNS = metrics.counter("cerberus_tier_runs_total", "Scheduler tier runs.")
+TIER_PROBES = metrics.counter("cerberus_tier_probes_total", "Probes sent per scheduler tier.")
+TIER_SECONDS = metrics.histogram("cerberus_tier_seconds", "Duration of one scheduler tier run.")
+TIER_LAG = metrics.histogram("cerberus_tier_lag_seconds", "How late a tier started after it was due.")
+
+
+class ScanTier:
+    """One kind of scheduled work with its own deadline and probe budget."""
+
+    def __init__(self, name: str, action: Callable[[int], int], deadline: Optional[float],
+                 budget: int, min_gap: float = 0.0):
+        """
+        Args:
+            name: Tier name, used for triggers and logs
+            action: Called as action(budget), must return the number of probes it sent
+            deadline: Max seconds between two runs. None means the tier only runs when triggered.
+            budget: Max probes one run is allowed to send
+            min_gap: Min seconds between two runs, so triggers get debounced
+        """
+        self.name = name
+        self.action = action
+        self.deadline = deadline
+        self.budget = budget
+        self.min_gap = min_gap
+
+        self.last_run = None
+        self.next_run = None
+        self.triggered = None
+        self.runs = 0
+        self.probes = 0
+
+
+class ScanScheduler:
+    """
+    Runs scan tiers by deadline, and triggered tiers as soon as possible.
+    trigger() is thread-safe so passive capture threads can call it directly.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.tiers: Dict[str, ScanTier] = {}
+        self.clock = clock
+
+        self._wakeup = threading.Condition()
+        self._stopped = False
+
+    # ------------------------- Configuration -------------------------
+
+    def add_tier(self, name: str, action: Callable[[int], int], deadline: Optional[float],
+                 budget: int, min_gap: float = 0.0, run_now: bool = False) -> ScanTier:
+        """Registers a tier. With run_now=True its first run is due immediately."""
+        tier = ScanTier(name, action, deadline, budget, min_gap)
+        now = self.clock()
+        if run_now:
+            tier.next_run = now
+        elif deadline is not None:
+            tier.next_run = now + deadline
+
+        with self._wakeup:
+            self.tiers[name] = tier
+            self._wakeup.notify()
+        return tier
+
+    # ------------------------- Triggers -------------------------
+
+    def trigger(self, name: str, reason: str = "") -> None:
+        """Asks for an early run of a tier (eg, new MAC seen, link changed)."""
+        with self._wakeup:
+            tier = self.tiers.get(name)
+            if tier is None:
+                logger.debug(f"Trigger for unknown tier '{name}' ignored.")
+                return
+            if tier.triggered is None:
+                tier.triggered = reason or "triggered"
+                logger.debug(f"Tier '{name}' triggered: {tier.triggered}.")
+            self._wakeup.notify()
+
+    def reschedule(self, name: str) -> None:
+        """Pushes a tier's deadline out, eg because another tier already covered its work."""
+        with self._wakeup:
+            tier = self.tiers.get(name)
+            if tier is not None and tier.deadline is not None:
+                tier.next_run = self.clock() + tier.deadline
+
+    def stop(self) -> None:
+        with self._wakeup:
+            self._stopped = True
+            self._wakeup.notify()
+
+    # ------------------------- Scheduling -------------------------
+
+    def _due_at(self, tier: ScanTier) -> Optional[float]:
+        due = tier.next_run
+        if tier.triggered is not None:
+            earliest = tier.last_run + tier.min_gap if tier.last_run is not None else self.clock()
+            due = earliest if due is None else min(due, earliest)
+        return due
+
+    def _next_due(self):
+        """Returns (tier, due_time) of the tier which must run first."""
+        best, best_due = None, None
+        for tier in self.tiers.values():
+            due = self._due_at(tier)
+            if due is not None and (best_due is None or due < best_due):
+                best, best_due = tier, due
+        return best, best_due
+
+    def run_pending(self) -> Optional[ScanTier]:
+        """Runs the most overdue tier if one is due now. Returns it, or None."""
+        with self._wakeup:
+            tier, due = self._next_due()
+            if tier is None or due > self.clock():
+                return None
+            reason = tier.triggered or "deadline"
+            tier.triggered = None
+
+        started = self.clock()
+        TIER_LAG.observe(max(started - due, 0.0), tier=tier.name)
+        try:
+            probes = tier.action(tier.budget) or 0
+        except Exception:
+            logger.exception(f"Scan tier '{tier.name}' failed.")
+            probes = 0
+        finished = self.clock()
+
+        with self._wakeup:
+            tier.last_run = finished
+            tier.runs += 1
+            tier.probes += probes
+            if tier.deadline is not None:
+                tier.next_run = finished + tier.deadline
+
+        TIER_RUNS.inc(tier=tier.name)
+        TIER_PROBES.inc(probes, tier=tier.name)
+        TIER_SECONDS.observe(finished - started, tier=tier.name)
+        logger.debug(f"Tier '{tier.name}' ({reason}) sent {probes} probes in {finished - started:.3f}s.")
+        return tier
+
+    def run_forever(self) -> None:
+        """Blocks, running tiers when they are due, until stop() is called."""
+        while True:
+            with self._wakeup:
+                if self._stopped:
+                    return
+                _tier, due = self._next_due()
+                wait = None if due is None else due - self.clock()
+                if wait is None or wait > 0:
+                    self._wakeup.wait(wait)
+                    continue
+            self.run_pending()
+
+    def stats(self) -> Dict[str, dict]:
+        """Runs and probes sent so far, per tier."""
+        with self._wakeup:
+            return {name: {"runs": tier.runs, "probes": tier.probes} for name, tier in self.tiers.items()}
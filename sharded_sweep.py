@@ -0,0 +1,275 @@
+"""
+Sharded Sweep Module
+
+This module splits the ARP sweep of a large segment (a flat /16 or /20) across a pool of
+worker processes, because a single sweeper is bound to one core by Python packet handling.
+
+    - the host range is cut into one contiguous slice per worker
+    - every worker opens its own AF_PACKET socket with a classic BPF filter which only
+      passes ARP replies from its own slice, so the kernel does the demultiplexing and no
+      worker parses another one's replies
+    - results are streamed back in small batches over one queue and merged by the caller
+      while the sweep is still running
+    - the total send rate cap is split evenly, so N workers never send faster than one
+      rate-capped sweeper would
+
+The pool is started once (forkserver, so workers don't inherit the daemon's threads) and
+reused by every later sweep. Only one sharded sweep runs at a time - it already uses
+every core.
+
+Usage:
+    from sharded_sweep import ShardedSweeper
+
+    sweeper = ShardedSweeper.for_interface("eth0", "10.20.0.0/16", workers=4, rate=20000)
+    for ip, mac in sweeper.sweep():
+        print(ip, mac)
+"""
+
+import ipaddress
+import os
+import queue
+import threading
+import time
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import cerberus_logger
+from arp_sweeper import ArpSweeper, RawSocketTransport, interface_addresses, network_host_range, rtt_estimator
+
+logger = cerberus_logger.get_logger("cerberus.sharded_sweep")
+
+MIN_SHARD_HOSTS = 1024    # Smaller slices are not worth a process
+RESULT_BATCH = 256    # Replies per message from a worker
+RESULT_FLUSH = 0.05    # Max seconds a worker holds a partial batch
+
+# ========================= Sharding =========================
+
+def shard_range(first: int, last: int, shards: int) -> List[Tuple[int, int]]:
+    """Cuts [first, last] into `shards` contiguous, nearly equal (first, last) slices."""
+    total = last - first + 1
+    shards = max(1, min(shards, total))
+    size, extra = divmod(total, shards)
+
+    slices, start = [], first
+    for index in range(shards):
+        end = start + size + (1 if index < extra else 0) - 1
+        slices.append((start, end))
+        start = end + 1
+    return slices
+
+
+def default_workers(hosts: int) -> int:
+    """One worker per core, but no slice smaller than MIN_SHARD_HOSTS."""
+    return max(1, min(os.cpu_count() or 1, hosts // MIN_SHARD_HOSTS))
+
+
+def shard_filter(first: int, last: int):
+    """
+    Classic BPF program: accept ARP replies whose sender IP is in [first, last], drop
+    everything else (other shards' replies, requests, our own transmitted frames).
+    """
+    return [
+        (0x28, 0, 0, 12),          # ldh [12]        ethertype
+        (0x15, 0, 6, 0x0806),      # jeq ARP         else drop
+        (0x28, 0, 0, 20),          # ldh [20]        opcode
+        (0x15, 0, 4, 2),           # jeq reply       else drop
+        (0x20, 0, 0, 28),          # ld [28]         sender IP
+        (0x35, 0, 2, first),       # jge first       else drop
+        (0x25, 1, 0, last),        # jgt last        -> drop
+        (0x06, 0, 0, 0xFFFF),      # ret accept
+        (0x06, 0, 0, 0),           # ret drop
+    ]
+
+# ========================= Worker Process =========================
+
+_RESULTS = None
+
+
+def _init_worker(results) -> None:
+    global _RESULTS
+    _RESULTS = results
+
+
+def _sweep_shard(sweep_id: int, shard: int, interface: str, network: str, src_mac: str, src_ip: str,
+                 first: int, last: int, timeout: float, rate: Optional[float], burst: Optional[float],
+                 min_quiet: Optional[float] = None) -> None:
+    """Runs in a worker process: sweeps one slice and streams (ip, mac) batches back."""
+    results = _RESULTS
+    transport = None
+    stats = {}
+    try:
+        transport = RawSocketTransport(interface)
+        stats["filtered"] = transport.attach_filter(shard_filter(first, last))
+        # Worker process pool me zinda rehta hai, toh RTT estimate bhi agle sweep tak rehta hai.
+        sweeper = ArpSweeper(network, src_mac, src_ip, transport, timeout=timeout, rate=rate, burst=burst,
+                             rtt=rtt_estimator(interface, min_quiet))
+
+        batch, flushed = [], time.monotonic()
+        for reply in sweeper.sweep(host_range=(first, last)):
+            batch.append(reply)
+            if len(batch) >= RESULT_BATCH or time.monotonic() - flushed >= RESULT_FLUSH:
+                results.put((sweep_id, shard, batch, None))
+                batch, flushed = [], time.monotonic()
+        if batch:
+            results.put((sweep_id, shard, batch, None))
+        stats.update(sweeper.last_stats)
+    except Exception as e:
+        stats["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        if transport is not None:
+            transport.close()
+        results.put((sweep_id, shard, None, stats))
+
+
+_pool = None
+_pool_workers = 0
+_pool_results = None
+_pool_lock = threading.Lock()
+_sweep_lock = threading.Lock()
+_sweep_ids = iter(range(1, 1 << 62))
+
+
+def _get_pool(workers: int):
+    """The shared worker pool, (re)started when a larger one is needed."""
+    global _pool, _pool_workers, _pool_results
+    # multiprocessing sirf pehle sharded sweep pe load hota hai, startup pe nahi.
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    with _pool_lock:
+        if _pool is None or _pool_workers < workers:
+            if _pool is not None:
+                _pool.shutdown(wait=True)
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            _pool_results = context.Queue()
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                        initializer=_init_worker, initargs=(_pool_results,))
+            _pool_workers = workers
+            logger.debug(f"Started sharded sweep pool with {workers} workers.")
+        return _pool, _pool_results
+
+
+def shutdown_pool() -> None:
+    """Stops the worker processes (they are restarted on the next sharded sweep)."""
+    global _pool, _pool_workers, _pool_results
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+        _pool, _pool_workers, _pool_results = None, 0, None
+
+# ========================= Sweep =========================
+
+class ShardedSweeper:
+    """
+    Drop-in for ArpSweeper.sweep() on big segments: same (ip, mac) stream and last_stats,
+    the work done by `workers` processes in parallel.
+    """
+
+    def __init__(self, interface: str, network: str, src_mac: str, src_ip: str, workers: Optional[int] = None,
+                 rate: Optional[float] = None, burst: Optional[float] = None, timeout: float = 3.0,
+                 min_quiet: Optional[float] = None):
+        """
+        Args:
+            interface: Interface every worker binds its socket to
+            network: Network to sweep in CIDR notation
+            src_mac / src_ip: Addresses of the interface (looked up once, not per worker)
+            workers: Number of shards, default one per core (see default_workers)
+            rate: Max requests per second of the whole sweep, split across the workers
+            burst: Back to back requests of the whole sweep before `rate` applies, split as well
+            timeout: Seconds every worker keeps listening after its last request
+            min_quiet: Floor of every worker's RTT quiet interval (default arp_sweeper.MIN_QUIET)
+        """
+        self.interface = interface
+        self.network = ipaddress.ip_network(network, strict=False)
+        self.src_mac = src_mac
+        self.src_ip = src_ip
+        self.rate = rate
+        self.burst = burst
+        self.timeout = timeout
+        self.min_quiet = min_quiet
+
+        first, last = network_host_range(self.network)
+        self.host_count = last - first + 1
+        self.workers = workers or default_workers(self.host_count)
+        self.shards = shard_range(first, last, self.workers)
+
+        self.last_stats = {}
+
+    @classmethod
+    def for_interface(cls, interface: str, network: str, workers: Optional[int] = None,
+                      rate: Optional[float] = None, burst: Optional[float] = None,
+                      timeout: float = 3.0, min_quiet: Optional[float] = None) -> "ShardedSweeper":
+        src_mac, src_ip = interface_addresses(interface)
+        return cls(interface, network, src_mac, src_ip, workers=workers, rate=rate, burst=burst, timeout=timeout,
+                   min_quiet=min_quiet)
+
+    def close(self) -> None:
+        """Nothing to release per sweep, the pool is shared (see shutdown_pool)."""
+
+    def sweep(self, targets: Optional[Iterable[str]] = None) -> Iterator[Tuple[str, str]]:
+        """
+        Sweeps every shard in parallel and yields (ip, mac) as the workers stream them in.
+
+        Args:
+            targets: Must be None - same signature as ArpSweeper.sweep(), but only a full
+                     sweep is sharded (targeted probes are small, see make_sweeper)
+        """
+        if targets is not None:
+            raise ValueError("A sharded sweep covers the whole network, targeted probes use ArpSweeper.")
+        with _sweep_lock:
+            yield from self._sweep()
+
+    def _sweep(self) -> Iterator[Tuple[str, str]]:
+        pool, results = _get_pool(len(self.shards))
+        sweep_id = next(_sweep_ids)
+        shard_rate = self.rate / len(self.shards) if self.rate else None
+        shard_burst = max(1.0, self.burst / len(self.shards)) if self.burst else None
+        network = str(self.network)
+
+        started = time.monotonic()
+        futures = [pool.submit(_sweep_shard, sweep_id, index, self.interface, network, self.src_mac, self.src_ip,
+                               first, last, self.timeout, shard_rate, shard_burst, self.min_quiet)
+                   for index, (first, last) in enumerate(self.shards)]
+
+        pending = set(range(len(self.shards)))
+        shard_stats = {}
+        found = 0
+        try:
+            while pending:
+                try:
+                    message_id, shard, batch, stats = results.get(timeout=0.5)
+                except queue.Empty:
+                    # Worker crash ho gaya toh uska "done" kabhi nahi aayega.
+                    for index in list(pending):
+                        future = futures[index]
+                        if future.done() and future.exception() is not None:
+                            logger.error(f"Sweep shard {index} of {network} died: {future.exception()}.")
+                            pending.discard(index)
+                    continue
+
+                if message_id != sweep_id:
+                    continue    # Leftover of an aborted earlier sweep
+                if batch is not None:
+                    found += len(batch)
+                    yield from batch
+                    continue
+
+                pending.discard(shard)
+                shard_stats[shard] = stats
+                if "error" in stats:
+                    logger.error(f"Sweep shard {shard} of {network} failed: {stats['error']}.")
+        finally:
+            finished = time.monotonic()
+            good = [stats for stats in shard_stats.values() if "error" not in stats]
+            self.last_stats = {
+                "sent": sum(stats.get("sent", 0) for stats in good),
+                "replies": found,
+                "tx_seconds": max((stats.get("tx_seconds", 0.0) for stats in good), default=0.0),
+                "rx_seconds": max((stats.get("rx_seconds", 0.0) for stats in good), default=0.0),
+                "total_seconds": finished - started,
+                "srtt": max((stats["srtt"] for stats in good if stats.get("srtt") is not None), default=None),
+                "shards": len(self.shards),
+                "failed_shards": len(self.shards) - len(good),
+            }
+            logger.debug("Sharded ARP sweep of %s: %d shards, %d requests, %d replies in %.3fs.",
+                         network, len(self.shards), self.last_stats["sent"], found, finished - started)
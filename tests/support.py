@@ -0,0 +1,18 @@
+"""
+Helpers shared by the test modules.
+
+Run the suite from the repository root:
+    python -m unittest discover -s tests
+"""
+
+import time
+
+
+def wait_until(predicate, timeout=5.0):
+    """Polls `predicate` until it is true or `timeout` seconds have passed, returns its last value."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
@@ -0,0 +1,93 @@
+"""Alert dispatcher delivery against a local HTTP stub standing in for the webhook."""
+
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from alert_dispatcher import AlertDispatcher, WebhookSink
+from support import wait_until
+
+
+class WebhookStub:
+    """Records every POSTed batch; answers HTTP 500 to the first `fail_first` requests."""
+
+    def __init__(self, fail_first=0):
+        self.batches = []
+        self.attempts = 0
+        self.fail_first = fail_first
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                stub.attempts += 1
+                if stub.attempts <= stub.fail_first:
+                    self.send_response(500)
+                else:
+                    stub.batches.append(json.loads(body))
+                    self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/hook"
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+
+    def alerts(self):
+        return [alert for batch in self.batches for alert in batch["alerts"]]
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class WebhookDeliveryTest(unittest.TestCase):
+
+    def start(self, fail_first=0, **kwargs):
+        self.stub = WebhookStub(fail_first)
+        self.addCleanup(self.stub.stop)
+        options = dict(window=0.1, backoff=0.05, max_backoff=0.2)
+        options.update(kwargs)
+        dispatcher = AlertDispatcher([WebhookSink(self.stub.url, timeout=2.0)], **options).start()
+        self.addCleanup(dispatcher.close)
+        return dispatcher
+
+    def test_alerts_are_batched_and_deduplicated(self):
+        dispatcher = self.start()
+        for _ in range(3):
+            dispatcher.emit("intruder", ip="10.0.0.66", mac="de:ad:be:ef:00:01")
+        dispatcher.emit("duplicate_ip", ip="10.0.0.7", mac="aa:bb:cc:00:00:07")
+        dispatcher.emit("scan_completed", scan=1)    # Not an alert
+
+        self.assertTrue(wait_until(lambda: len(self.stub.alerts()) == 2))
+        self.assertEqual(len(self.stub.batches), 1)
+        batch = self.stub.batches[0]
+        self.assertEqual(batch["source"], "cerberus")
+        self.assertEqual(sorted(alert["event"] for alert in batch["alerts"]), ["duplicate_ip", "intruder"])
+        # The stub records a batch before it answers, the dispatcher counts it after.
+        self.assertTrue(wait_until(lambda: dispatcher.stats()["webhook"]["sent"] == 2))
+
+    def test_failed_delivery_is_retried(self):
+        dispatcher = self.start(fail_first=2)
+        dispatcher.emit("gateway_impersonation", ip="10.0.0.1", mac="de:ad:be:ef:00:02")
+
+        self.assertTrue(wait_until(lambda: len(self.stub.alerts()) == 1))
+        self.assertEqual(self.stub.attempts, 3)
+        self.assertEqual(self.stub.alerts()[0]["severity"], "critical")
+        self.assertTrue(wait_until(lambda: dispatcher.stats()["webhook"]["sent"] == 1))
+        stats = dispatcher.stats()["webhook"]
+        self.assertEqual((stats["sent"], stats["failures"], stats["pending"]), (1, 0, 0))
+
+    def test_close_flushes_pending_alerts(self):
+        dispatcher = self.start(window=60.0)
+        dispatcher.emit("mac_flood", mac="de:ad:be:ef:00:03")
+        dispatcher.close()
+        self.assertEqual([alert["event"] for alert in self.stub.alerts()], ["mac_flood"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,190 @@
+"""Fleet reporter <-> collector round trips, both ends on localhost."""
+
+import asyncio
+import os
+import socket
+import tempfile
+import threading
+import unittest
+
+import fleet
+from support import wait_until
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class CollectorThread:
+    """A FleetCollector on its own event loop thread, like `python fleet.py collector`."""
+
+    def __init__(self, port=0, **kwargs):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        # inventory=None: the collector makes its own and restores it from snapshot_path.
+        inventory = kwargs.pop("inventory", fleet.FleetInventory(vendor_lookup=lambda mac: None))
+        self.collector = fleet.FleetCollector(inventory, host="127.0.0.1", port=port, **kwargs)
+        self.call(self.collector.start())
+        self.address = ("127.0.0.1", self.collector.port)
+
+    def call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(10)
+
+    def query(self, token=None, **request):
+        return fleet.query(self.address, request, token=token)
+
+    def stop(self):
+        self.call(self.collector.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+        self.loop.close()
+
+
+def make_reporter(address, spool_path=None, **kwargs):
+    options = dict(sentinel="site-a", site="lab", interval=0.05, backoff=0.05, max_backoff=0.2, timeout=2.0)
+    options.update(kwargs)
+    return fleet.FleetReporter(address, spool_path=spool_path, **options).start()
+
+
+class FleetRoundTripTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.spool = os.path.join(self.tmp.name, "fleet.spool")
+        self.collectors = []
+        self.reporters = []
+
+    def tearDown(self):
+        for reporter in self.reporters:
+            reporter.close()
+        for collector in self.collectors:
+            collector.stop()
+        self.tmp.cleanup()
+
+    def start_collector(self, **kwargs):
+        collector = CollectorThread(**kwargs)
+        self.collectors.append(collector)
+        return collector
+
+    def start_reporter(self, address, **kwargs):
+        reporter = make_reporter(address, spool_path=self.spool, **kwargs)
+        self.reporters.append(reporter)
+        return reporter
+
+    def test_sightings_and_events_reach_the_inventory(self):
+        collector = self.start_collector()
+        reporter = self.start_reporter(collector.address)
+
+        devices = [{"ip": "10.0.0.1", "mac": "aa:bb:cc:00:00:01"}, {"ip": "10.0.0.66", "mac": "de:ad:be:ef:00:01"}]
+        self.assertEqual(reporter.sighting(devices), 2)
+        self.assertEqual(reporter.sighting(devices), 0)    # Unchanged: delta filtered
+        reporter.emit("intruder", ip="10.0.0.66", mac="de:ad:be:ef:00:01")
+        reporter.emit("scan_completed", scan=1, devices=2, unknown=1)
+
+        self.assertTrue(wait_until(lambda: collector.query()["summary"]["alerts"] == 1))
+        summary = collector.query()["summary"]
+        self.assertEqual(summary["devices"], 2)
+        self.assertEqual(summary["connected"], 1)
+        self.assertTrue(collector.query(mac="DE:AD:BE:EF:00:01")["device"]["intruder"])
+        self.assertEqual([d["mac"] for d in collector.query(ip="10.0.0.1")["devices"]], ["aa:bb:cc:00:00:01"])
+        site = collector.query(sentinel="site-a")
+        self.assertEqual(site["sentinel"]["site"], "lab")
+        self.assertEqual(site["sentinel"]["last_scan"]["devices"], 2)
+
+        # IP change is sent again and re-indexed.
+        self.assertEqual(reporter.sighting([{"ip": "10.0.0.9", "mac": "aa:bb:cc:00:00:01"}]), 1)
+        self.assertTrue(wait_until(lambda: collector.query(ip="10.0.0.9")["devices"]))
+        self.assertEqual(collector.query(ip="10.0.0.1")["devices"], [])
+
+    def test_bad_token_is_rejected(self):
+        collector = self.start_collector(token="s3cret")
+        with self.assertRaises(fleet.FleetError):
+            collector.query(token="wrong")
+        self.assertEqual(collector.query(token="s3cret")["summary"]["devices"], 0)
+
+        reporter = self.start_reporter(collector.address, token="wrong")
+        reporter.emit("intruder", ip="10.0.0.66", mac="de:ad:be:ef:00:01")
+        self.assertTrue(wait_until(lambda: reporter.stats()["spooled"] == 1))
+        self.assertFalse(reporter.stats()["connected"])
+        self.assertEqual(collector.query(token="s3cret")["summary"]["sentinels"], 0)
+
+    def test_spooled_while_down_and_replayed(self):
+        port = free_port()
+        reporter = self.start_reporter(("127.0.0.1", port))
+        reporter.sighting([{"ip": f"10.0.1.{i}", "mac": f"aa:bb:cc:00:01:{i:02x}"} for i in range(1, 101)])
+        self.assertTrue(wait_until(lambda: reporter.stats()["spooled"] >= 1))
+        reporter.emit("intruder", ip="10.0.1.200", mac="de:ad:be:ef:00:02")
+        self.assertTrue(wait_until(lambda: reporter.stats()["spooled"] >= 2))
+        self.assertTrue(os.path.getsize(self.spool) > 0)
+
+        collector = self.start_collector(port=port)
+        self.assertTrue(wait_until(lambda: not os.path.exists(self.spool)))
+        self.assertTrue(wait_until(lambda: collector.query()["summary"]["alerts"] == 1))
+        self.assertEqual(collector.query()["summary"]["devices"], 100)
+        self.assertEqual(reporter.stats()["dropped"], 0)
+
+    def test_resent_batches_are_applied_once(self):
+        collector = self.start_collector()
+        alert = {"event": "intruder", "mac": "de:ad:be:ef:00:03", "ts": 1.0}
+
+        with socket.create_connection(collector.address, timeout=5) as sock:
+            sock.sendall(fleet.encode_frame({"type": "hello", "sentinel": "raw", "version": fleet.PROTOCOL_VERSION}))
+            self.assertEqual(fleet.recv_frame(sock)["type"], "welcome")
+            # Seq 1..3 of one run, then a replay of 1..2 (interrupted spool replay) - every one is acked.
+            for seq in (1, 2, 3, 1, 2):
+                sock.sendall(fleet.encode_frame({"type": "batch", "id": [7, seq], "sightings": [],
+                                                 "events": [dict(alert, seq=seq)]}))
+                self.assertEqual(fleet.recv_frame(sock), {"type": "ack", "id": [7, seq]})
+            # A new reporter run (other epoch) starts at seq 1 again.
+            sock.sendall(fleet.encode_frame({"type": "batch", "id": [8, 1], "sightings": [],
+                                             "events": [dict(alert, seq=4)]}))
+            fleet.recv_frame(sock)
+
+        alerts = collector.query(alerts=True)["alerts"]
+        self.assertEqual([a["seq"] for a in alerts], [1, 2, 3, 4])
+
+    def test_dedupe_survives_collector_restart(self):
+        snapshot = os.path.join(self.tmp.name, "inventory.json")
+        collector = self.start_collector(snapshot_path=snapshot)
+        inventory = collector.collector.inventory
+
+        frame = {"type": "batch", "id": [5, 1], "sightings": [{"mac": "aa:bb:cc:00:00:05", "ip": "10.0.0.5"}],
+                 "events": [{"event": "intruder", "mac": "aa:bb:cc:00:00:05"}]}
+        with socket.create_connection(collector.address, timeout=5) as sock:
+            sock.sendall(fleet.encode_frame({"type": "hello", "sentinel": "raw"}))
+            fleet.recv_frame(sock)
+            sock.sendall(fleet.encode_frame(frame))
+            fleet.recv_frame(sock)
+        collector.stop()
+        self.collectors.remove(collector)
+        self.assertEqual(len(inventory.alerts), 1)
+
+        restarted = self.start_collector(snapshot_path=snapshot, inventory=None)
+        self.assertEqual(restarted.query()["summary"]["devices"], 1)
+        with socket.create_connection(restarted.address, timeout=5) as sock:
+            sock.sendall(fleet.encode_frame({"type": "hello", "sentinel": "raw"}))
+            fleet.recv_frame(sock)
+            sock.sendall(fleet.encode_frame(frame))
+            self.assertEqual(fleet.recv_frame(sock)["type"], "ack")
+        self.assertEqual(restarted.query()["summary"]["alerts"], 1)
+
+
+class FleetInventoryTest(unittest.TestCase):
+
+    def test_reconnect_keeps_sentinel_online(self):
+        inventory = fleet.FleetInventory(vendor_lookup=lambda mac: None)
+        inventory.connected("site-a", None, "10.0.0.1:4000")
+        inventory.connected("site-a", None, "10.0.0.1:4001")    # New socket, old one still half-open
+        inventory.disconnected("site-a")
+        self.assertTrue(inventory.sentinels["site-a"]["connected"])
+        self.assertEqual(inventory.summary()["connected"], 1)
+        inventory.disconnected("site-a")
+        self.assertFalse(inventory.sentinels["site-a"]["connected"])
+        self.assertEqual(inventory.summary()["connected"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
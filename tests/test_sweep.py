@@ -0,0 +1,68 @@
+"""Sharded sweep plumbing: cerberus_scan drives ShardedSweeper exactly like ArpSweeper."""
+
+import importlib.util
+import socket
+import unittest
+from unittest import mock
+
+import sharded_sweep
+from arp_sweeper import ArpSweeper
+from lan_simulator import SimulatedLan
+from sharded_sweep import ShardedSweeper
+
+# cerberus_scan needs netifaces (via router_detector), and the raw-socket path only exists on Linux.
+SCAN_AVAILABLE = importlib.util.find_spec("netifaces") is not None and hasattr(socket, "AF_PACKET")
+
+NETWORK = "10.20.0.0/20"
+
+
+def in_process_sweep(lan):
+    """Replacement for ShardedSweeper._sweep: every shard on `lan`, in this process instead of the pool."""
+
+    def sweep(self):
+        sent = replies = 0
+        for first, last in self.shards:
+            sweeper = ArpSweeper(str(self.network), self.src_mac, self.src_ip, lan, timeout=0.25)
+            for reply in sweeper.sweep(host_range=(first, last)):
+                replies += 1
+                yield reply
+            sent += sweeper.last_stats["sent"]
+        self.last_stats = {"sent": sent, "replies": replies, "tx_seconds": 0.0, "rx_seconds": 0.0,
+                           "total_seconds": 0.0, "srtt": None, "shards": len(self.shards), "failed_shards": 0}
+
+    return sweep
+
+
+class ShardedSweeperTest(unittest.TestCase):
+
+    def setUp(self):
+        self.lan = SimulatedLan(NETWORK, live_fraction=0.02, latency=0.0005, jitter=0.0005)
+        self.addCleanup(self.lan.close)
+        patcher = mock.patch.object(ShardedSweeper, "_sweep", in_process_sweep(self.lan))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make(self):
+        return ShardedSweeper("eth0", NETWORK, self.lan.gateway_mac, self.lan.gateway_ip, workers=2)
+
+    def test_sweep_takes_the_arp_sweeper_arguments(self):
+        sweeper = self.make()
+        self.assertEqual(dict(sweeper.sweep(None)), self.lan.live_hosts)
+        self.assertEqual(sweeper.last_stats["shards"], 2)
+        with self.assertRaises(ValueError):
+            list(sweeper.sweep(["10.20.0.5"]))
+
+    @unittest.skipUnless(SCAN_AVAILABLE, "cerberus_scan needs netifaces and AF_PACKET")
+    def test_arp_sweep_goes_through_the_sharded_sweeper(self):
+        import cerberus_scan
+
+        addresses = (self.lan.gateway_mac, self.lan.gateway_ip)
+        with mock.patch.object(sharded_sweep, "interface_addresses", return_value=addresses), \
+                mock.patch.object(cerberus_scan, "SWEEP_WORKERS", 2):
+            self.assertIsInstance(cerberus_scan.make_sweeper(NETWORK, "eth0", None, 0.25), ShardedSweeper)
+            found = dict(cerberus_scan.arp_sweep(NETWORK, "eth0", timeout=0.25))
+        self.assertEqual(found, self.lan.live_hosts)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,213 @@
+"""
+Wake-up Stage Module
+
+Sleeping phones and IoT devices often ignore the first ARP request, so Cerberus sends
+them an ICMP echo first to wake them up. This module is that wake-up, as a pipeline
+stage which runs at the same time as the ARP transmit instead of before it (no more
+fixed one second sleep on every scan).
+
+It sends:
+    - one echo to the real directed broadcast of the network (correct for any prefix,
+      not only /24)
+    - optional unicast echoes to IPs we have seen before, for devices which ignore
+      broadcast pings
+
+Usage:
+    from wakeup_stage import WakeupStage
+
+    stage = WakeupStage.for_interface("eth0")
+    stage.start("192.168.1.0/24", known_ips=["192.168.1.20"])
+    ...  # ARP sweep runs here
+    stage.join()
+"""
+
+import ipaddress
+import os
+import socket
+import struct
+import threading
+import time
+from typing import Iterable, List, Optional
+
+import cerberus_logger
+
+logger = cerberus_logger.get_logger("cerberus.wakeup_stage")
+
+ICMP_ECHO_REQUEST = 8
+
+_ICMP_HEADER = struct.Struct("!BBHHH")
+
+# ========================= Helpers =========================
+
+def directed_broadcast(network: str) -> Optional[str]:
+    """
+    Returns the directed broadcast address of a network in CIDR notation,
+    or None for /31 and /32 which do not have one.
+
+    Example:
+        directed_broadcast("10.1.0.0/20")
+        '10.1.15.255'
+    """
+    net = ipaddress.ip_network(network, strict=False)
+    if net.prefixlen >= 31:
+        return None
+    return str(net.broadcast_address)
+
+
+def internet_checksum(data: bytes) -> int:
+    """RFC 1071 ones' complement checksum."""
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+
+def build_icmp_echo(ident: int, sequence: int, payload: bytes = b"cerberus") -> bytes:
+    """Builds an ICMP echo request (header + payload) with a valid checksum."""
+    header = _ICMP_HEADER.pack(ICMP_ECHO_REQUEST, 0, 0, ident, sequence)
+    checksum = internet_checksum(header + payload)
+    return _ICMP_HEADER.pack(ICMP_ECHO_REQUEST, 0, checksum, ident, sequence) + payload
+
+# ========================= Transport =========================
+
+class IcmpTransport:
+    """Raw ICMP socket allowed to send to broadcast addresses."""
+
+    def __init__(self, interface: Optional[str] = None):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        if interface and hasattr(socket, "SO_BINDTODEVICE"):
+            # Multi-homed machine pe broadcast sahi interface se hi nikalna chahiye.
+            try:
+                self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BINDTODEVICE, interface.encode())
+            except OSError as e:
+                logger.debug(f"Could not bind wake-up socket to {interface}: {e}.")
+
+    def send(self, packet: bytes, ip: str) -> None:
+        self.sock.sendto(packet, (ip, 0))
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+class ScapyIcmpTransport:
+    """Fallback for platforms (or users) without raw ICMP sockets - scapy does the sending."""
+
+    def __init__(self, interface: Optional[str] = None):
+        # scapy.all har protocol load karta hai (seconds), sirf ye teen chahiye.
+        from scapy.layers.inet import IP
+        from scapy.packet import Raw
+        from scapy.sendrecv import send
+
+        self._ip, self._raw, self._send = IP, Raw, send
+        self.interface = interface
+
+    def send(self, packet: bytes, ip: str) -> None:
+        self._send(self._ip(dst=ip, proto=socket.IPPROTO_ICMP) / self._raw(load=packet), verbose=0)
+
+    def close(self) -> None:
+        pass
+
+
+_transport_types = {}
+_transport_lock = threading.Lock()
+
+# ========================= Wake-up Stage =========================
+
+class WakeupStage:
+    """
+    Sends the wake-up echoes from a background thread so the caller can start
+    the ARP sweep immediately.
+    """
+
+    def __init__(self, transport, ident: Optional[int] = None):
+        """
+        Args:
+            transport: Object with send(packet, ip) and close()
+            ident: ICMP identifier (default: derived from the process id)
+        """
+        self.transport = transport
+        self.ident = (os.getpid() if ident is None else ident) & 0xFFFF
+        self.sequence = 0
+        self._thread = None
+        self._sent = 0
+        self.last_seconds = 0.0
+
+    @classmethod
+    def for_interface(cls, interface: Optional[str] = None) -> "WakeupStage":
+        """
+        Raw ICMP socket if we are allowed one, scapy otherwise. The choice is remembered per
+        interface, so later scans don't try (and fail) the raw socket again.
+        """
+        with _transport_lock:
+            transport_type = _transport_types.get(interface)
+        if transport_type is not None:
+            return cls(transport_type(interface))
+
+        try:
+            transport = IcmpTransport(interface)
+        except OSError as e:
+            logger.debug(f"Raw ICMP socket unavailable ({e}), using scapy for wake-up.")
+            transport = ScapyIcmpTransport(interface)
+        with _transport_lock:
+            _transport_types[interface] = type(transport)
+        return cls(transport)
+
+    def targets(self, network: str, known_ips: Iterable[str] = ()) -> List[str]:
+        """Directed broadcast first, then every known IP which belongs to the network."""
+        net = ipaddress.ip_network(network, strict=False)
+        targets = []
+
+        broadcast = directed_broadcast(network)
+        if broadcast:
+            targets.append(broadcast)
+
+        seen = set(targets)
+        for ip in known_ips:
+            if ip in seen:
+                continue
+            try:
+                if ipaddress.ip_address(ip) not in net:
+                    continue
+            except ValueError:
+                continue
+            seen.add(ip)
+            targets.append(ip)
+        return targets
+
+    def send(self, network: str, known_ips: Iterable[str] = ()) -> int:
+        """Sends the wake-up echoes right now. Returns number of echoes sent."""
+        sent = 0
+        for ip in self.targets(network, known_ips):
+            self.sequence = (self.sequence + 1) & 0xFFFF
+            try:
+                self.transport.send(build_icmp_echo(self.ident, self.sequence), ip)
+                sent += 1
+            except OSError as e:
+                logger.debug(f"Wake-up echo to {ip} failed (non-critical): {e}.")
+        return sent
+
+    def start(self, network: str, known_ips: Iterable[str] = ()) -> None:
+        """Starts sending in the background and returns immediately."""
+        known_ips = list(known_ips)
+
+        def run():
+            started = time.monotonic()
+            self._sent = self.send(network, known_ips)
+            self.last_seconds = time.monotonic() - started
+
+        self._thread = threading.Thread(target=run, name="cerberus-wakeup", daemon=True)
+        self._thread.start()
+
+    def join(self) -> int:
+        """Waits for the background send to finish. Returns number of echoes sent."""
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self._sent
+
+    def close(self) -> None:
+        self.join()
+        self.transport.close()